@@ -0,0 +1,249 @@
+"""
+ASGI entry point.
+
+The upstream-bound routes (/generate-question, /generate-questions,
+/talking-service, /compare) are served by async handlers, so an in-flight LLM or
+Hugging Face call waits on the event loop instead of holding a thread. Every
+other route is served by the Flask app mounted underneath.
+
+Run with:
+    uvicorn asgi_app:app --host 0.0.0.0 --port 5000
+"""
+import asyncio
+from contextlib import asynccontextmanager
+
+from a2wsgi import WSGIMiddleware
+from starlette.applications import Starlette
+from starlette.middleware import Middleware
+from starlette.middleware.cors import CORSMiddleware
+from starlette.responses import JSONResponse, StreamingResponse
+from starlette.routing import Mount, Route
+
+import metrics
+from model_provider import start_preload
+from question_generator import agenerate_question, agenerate_questions
+from question_bank import question_bank
+from server import QUESTION_BATCH_MAX, app as flask_app, format_stream_event, with_audio_url
+from similarity_service import acompare_sentences
+from talking_service import aiter_talking_events, atalkingService
+
+class RequestMetricsMiddleware:
+    """
+    Times an async route and tags its response with the request's trace ID, as
+    the mounted Flask app does for its own routes
+    """
+
+    def __init__(self, app, route):
+        self.app = app
+        self.route = route
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        requested = dict(scope["headers"]).get(metrics.TRACE_HEADER.lower().encode(), b"").decode("latin-1")
+        trace = metrics.start_request(self.route, scope["method"], requested)
+        status = 500
+
+        async def send_with_trace_id(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+                message["headers"] = [*message.get("headers", []), (metrics.TRACE_HEADER.lower().encode(), trace.trace_id.encode())]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_trace_id)
+        finally:
+            # Streamed responses return only after their last chunk is sent
+            metrics.finish_request(trace, status)
+
+
+def route_middleware(path):
+    # Flask-CORS covers the mounted app; the async routes get the same permissive policy
+    return [
+        Middleware(RequestMetricsMiddleware, route=path),
+        Middleware(CORSMiddleware, allow_origins=["*"], allow_methods=["*"], allow_headers=["*"]),
+    ]
+
+
+def error_response(e):
+    metrics.record_error(e)
+    return JSONResponse({"error": str(e)}, status_code=500)
+
+
+async def read_json(request):
+    try:
+        data = await request.json()
+    except ValueError:
+        return None
+    return data if isinstance(data, dict) else None
+
+
+def get_stream_format(request):
+    """Same selection as the Flask app: ?stream=ndjson|sse or the Accept header"""
+    stream = request.query_params.get("stream", "").lower()
+    accept = request.headers.get("accept", "")
+    if stream in ("ndjson", "sse"):
+        return stream
+    if stream in ("1", "true"):
+        return "sse" if "text/event-stream" in accept else "ndjson"
+    if "text/event-stream" in accept:
+        return "sse"
+    if "application/x-ndjson" in accept:
+        return "ndjson"
+    return None
+
+
+def stream_events(events, stream_format):
+    async def generate():
+        try:
+            async for event in events:
+                yield format_stream_event(event, stream_format)
+        except Exception as e:
+            metrics.record_error(e)
+            yield format_stream_event({"type": "error", "error": str(e), "success": False}, stream_format)
+
+    media_type = "text/event-stream" if stream_format == "sse" else "application/x-ndjson"
+    return StreamingResponse(generate(), media_type=media_type, headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
+
+
+async def generate_question_api(request):
+    data = await read_json(request)
+    if data is None:
+        return JSONResponse({"error": "No JSON data provided"}, status_code=400)
+
+    word = data.get("word")
+    question_type = data.get("question_type")
+    topic = data.get("topic")
+
+    if not word and not topic:
+        return JSONResponse({"error": "Missing 'word' or 'topic'"}, status_code=400)
+    if not question_type:
+        return JSONResponse({"error": "Missing 'question_type'"}, status_code=400)
+
+    params = dict(
+        word=word,
+        qtype=question_type,
+        topic=topic,
+        previous_question=data.get("previous_question"),
+        language_in=data.get("language_in", "English"),
+        language_out=data.get("language_out", "Vietnamese"),
+    )
+    try:
+        # Banked questions are a quick SQLite lookup; only a miss waits on the LLM
+        result = await asyncio.to_thread(question_bank.serve, **params)
+        if result is None:
+            result = await agenerate_question(**params)
+        await asyncio.to_thread(question_bank.refill_if_low, **params)
+        return JSONResponse(result)
+    except Exception as e:
+        return error_response(e)
+
+
+async def generate_questions_api(request):
+    data = await read_json(request)
+    if data is None:
+        return JSONResponse({"error": "No JSON data provided"}, status_code=400)
+
+    words = data.get("words")
+    question_type = data.get("question_type")
+    topic = data.get("topic")
+    count = data.get("count")
+
+    if words is not None and (not isinstance(words, list) or not all(isinstance(word, str) and word.strip() for word in words)):
+        return JSONResponse({"error": "'words' must be a list of non-empty strings"}, status_code=400)
+    if not words and not topic:
+        return JSONResponse({"error": "Missing 'words' or 'topic'"}, status_code=400)
+    if not words and (not isinstance(count, int) or count < 1):
+        return JSONResponse({"error": "Missing 'count' (expected a positive integer) for a topic lesson"}, status_code=400)
+    if not question_type:
+        return JSONResponse({"error": "Missing 'question_type'"}, status_code=400)
+    if len(words or []) > QUESTION_BATCH_MAX or (not words and count > QUESTION_BATCH_MAX):
+        return JSONResponse({"error": f"Too many questions (max {QUESTION_BATCH_MAX})"}, status_code=400)
+
+    try:
+        questions = await agenerate_questions(
+            words=words,
+            qtype=question_type,
+            topic=topic,
+            count=count,
+            previous_questions=data.get("previous_questions") or [],
+            language_in=data.get("language_in", "English"),
+            language_out=data.get("language_out", "Vietnamese"),
+        )
+        return JSONResponse({"questions": questions})
+    except Exception as e:
+        return error_response(e)
+
+
+async def compare(request):
+    data = await read_json(request)
+    if data is None:
+        return JSONResponse({"error": "No JSON data provided"}, status_code=400)
+
+    sentence1 = data.get("sentence1")
+    sentence2 = data.get("sentence2")
+
+    if not sentence1 or not sentence2:
+        return JSONResponse({"error": "Missing 'sentence1' or 'sentence2'"}, status_code=400)
+
+    try:
+        score = await acompare_sentences(sentence1, sentence2)
+        return JSONResponse({"similarity_score": score})
+    except Exception as e:
+        return error_response(e)
+
+
+async def talking_service_api(request):
+    data = await read_json(request)
+    if data is None:
+        return JSONResponse({"error": "No JSON data provided"}, status_code=400)
+
+    message = data.get("message")
+    language = data.get("language")
+    topic = data.get("topic")
+
+    if not message or not language or not topic:
+        return JSONResponse({"error": "Missing 'message', 'language', or 'topic'"}, status_code=400)
+
+    session_id = data.get("session_id") or request.headers.get("X-Session-Id")
+    if not session_id:
+        return JSONResponse({"error": "Missing 'session_id' (or an X-Session-Id header)"}, status_code=400)
+
+    try:
+        base_url = str(request.base_url).rstrip('/')
+
+        stream_format = get_stream_format(request)
+        if stream_format:
+            events = aiter_talking_events(message, language, topic, session_id)
+            return stream_events((with_audio_url(event, base_url) async for event in events), stream_format)
+
+        result = await atalkingService(message, language, topic, session_id)
+
+        # Return full URL with protocol that clients can access
+        return JSONResponse({
+            "message": result["message"],
+            "audio": f"{base_url}/{result['audio']}",
+            "session_id": result["session_id"]
+        })
+    except Exception as e:
+        return error_response(e)
+
+
+@asynccontextmanager
+async def lifespan(app):
+    # Models load in a background thread, so the server starts accepting
+    # requests right away; /ready reports when they are done
+    start_preload()
+    yield
+
+
+app = Starlette(lifespan=lifespan, routes=[
+    Route("/generate-question", generate_question_api, methods=["POST", "OPTIONS"], middleware=route_middleware("/generate-question")),
+    Route("/generate-questions", generate_questions_api, methods=["POST", "OPTIONS"], middleware=route_middleware("/generate-questions")),
+    Route("/compare", compare, methods=["POST", "OPTIONS"], middleware=route_middleware("/compare")),
+    Route("/talking-service", talking_service_api, methods=["POST", "OPTIONS"], middleware=route_middleware("/talking-service")),
+    Mount("/", app=WSGIMiddleware(flask_app)),
+])
@@ -0,0 +1,241 @@
+import json
+import os
+import re
+import tempfile
+import threading
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+
+try:
+    import fcntl
+except ImportError:  # Windows: the index is only shared by the threads of one process
+    fcntl = None
+
+# Directory of generated audio files, served by /audio
+AUDIO_DIR = os.getenv("AUDIO_DIR", os.path.join(os.path.dirname(os.path.abspath(__file__)), "audio"))
+
+# Names of files produced by the TTS service: legacy uuid4 names and sha256 cache keys
+GENERATED_FILENAME_PATTERN = re.compile(
+    r"^([0-9a-f]{8}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{12}|[0-9a-f]{64})\.\w+$"
+)
+
+# Names of files written by the cache itself; only these are ever evicted
+CACHE_FILENAME_PATTERN = re.compile(r"^[0-9a-f]{64}\.\w+$")
+
+
+class AudioCache:
+    """
+    Content-addressed index over the generated audio files.
+
+    Files are stored as `<key>.<ext>` inside `audio_dir`, where the key is a hash of
+    everything that determines the synthesized audio. The index keeps the files in
+    least-recently-used order and deletes the oldest ones once the directory goes
+    over `max_bytes` or `max_entries`. It is persisted next to the files so a restart
+    keeps the warm cache, and shared by every worker process serving the directory:
+    each change is merged into the index on disk under a file lock, so the size
+    budget holds for the directory as a whole.
+    """
+
+    INDEX_FILENAME = ".cache_index.json"
+    LOCK_FILENAME = ".cache_index.lock"
+
+    def __init__(self, audio_dir, max_bytes=512 * 1024 * 1024, max_entries=None):
+        self.audio_dir = audio_dir
+        self.max_bytes = max_bytes
+        self.max_entries = max_entries
+        self.index_path = os.path.join(audio_dir, self.INDEX_FILENAME)
+        self.lock_path = os.path.join(audio_dir, self.LOCK_FILENAME)
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._entries = OrderedDict()  # key -> {"filename": str, "size": int, "last_used": float}
+        self._touched = set()  # keys hit since the index was last merged
+        self._total_bytes = 0
+        self._index_mtime = None
+        self._lock = threading.Lock()
+
+        os.makedirs(audio_dir, exist_ok=True)
+        with self._lock, self._index_lock():
+            self._sync_locked()
+            self._adopt_untracked_locked()
+            self._evict_locked()
+            self._save_index_locked()
+
+    @contextmanager
+    def _index_lock(self):
+        # Serializes index updates between worker processes
+        if fcntl is None:
+            yield
+            return
+        with open(self.lock_path, "a") as f:
+            fcntl.flock(f, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(f, fcntl.LOCK_UN)
+
+    def _read_index(self):
+        entries = []
+        try:
+            self._index_mtime = os.path.getmtime(self.index_path)
+            with open(self.index_path, "r", encoding="utf-8") as f:
+                entries = json.load(f)
+        except (OSError, ValueError):
+            pass
+
+        index = OrderedDict()
+        for entry in entries:
+            path = os.path.join(self.audio_dir, entry["filename"])
+            if os.path.isfile(path):
+                index[entry["key"]] = {
+                    "filename": entry["filename"],
+                    "size": os.path.getsize(path),
+                    # Indexes written before timestamps existed are already in LRU order
+                    "last_used": entry.get("last_used", 0.0),
+                }
+        return index
+
+    def _sync_locked(self):
+        """Replace the in-memory index with the one on disk, keeping this process's recent hits"""
+        index = self._read_index()
+        for key in self._touched:
+            if key in index and key in self._entries:
+                index[key]["last_used"] = max(index[key]["last_used"], self._entries[key]["last_used"])
+        self._touched.clear()
+        self._entries = OrderedDict(sorted(index.items(), key=lambda item: item[1]["last_used"]))
+        self._total_bytes = sum(entry["size"] for entry in self._entries.values())
+
+    def _adopt_untracked_locked(self):
+        # Adopt cache files written before the index existed (or lost from it),
+        # so they take part in eviction instead of growing the directory forever.
+        # Other files, such as legacy uuid-named audio, are left alone.
+        tracked = {entry["filename"] for entry in self._entries.values()}
+        for filename in os.listdir(self.audio_dir):
+            path = os.path.join(self.audio_dir, filename)
+            if filename in tracked or not CACHE_FILENAME_PATTERN.match(filename) or not os.path.isfile(path):
+                continue
+            key = os.path.splitext(filename)[0]
+            self._entries[key] = {"filename": filename, "size": os.path.getsize(path), "last_used": os.path.getmtime(path)}
+            self._total_bytes += self._entries[key]["size"]
+        self._entries = OrderedDict(sorted(self._entries.items(), key=lambda item: item[1]["last_used"]))
+
+    def _save_index_locked(self):
+        data = [{"key": key, **entry} for key, entry in self._entries.items()]
+        # A unique temporary file per write: concurrent writers never share one
+        fd, tmp_path = tempfile.mkstemp(prefix=f"{self.INDEX_FILENAME}.", suffix=".tmp", dir=self.audio_dir)
+        try:
+            with os.fdopen(fd, "w", encoding="utf-8") as f:
+                json.dump(data, f)
+            os.replace(tmp_path, self.index_path)
+            self._index_mtime = os.path.getmtime(self.index_path)
+        except OSError:
+            try:
+                os.remove(tmp_path)
+            except OSError:
+                pass
+            raise
+
+    def path_for(self, key, ext="wav"):
+        """Return the filename and absolute path a new entry should be written to"""
+        filename = f"{key}.{ext}"
+        return filename, os.path.join(self.audio_dir, filename)
+
+    def get(self, key):
+        """
+        Look up a cached audio file
+
+        Args:
+            key (str): Cache key of the audio
+
+        Returns:
+            str | None: Filename inside audio_dir, or None on a miss
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None and self._index_changed():
+                # Another worker may have synthesized it
+                with self._index_lock():
+                    self._sync_locked()
+                entry = self._entries.get(key)
+            if entry is not None and os.path.isfile(os.path.join(self.audio_dir, entry["filename"])):
+                entry["last_used"] = time.time()
+                self._entries.move_to_end(key)
+                self._touched.add(key)
+                self.hits += 1
+                return entry["filename"]
+
+            if entry is not None:
+                # File was removed behind our back
+                del self._entries[key]
+                self._total_bytes -= entry["size"]
+            self.misses += 1
+            return None
+
+    def put(self, key, filename):
+        """
+        Register a freshly written audio file and evict old entries if needed
+
+        Args:
+            key (str): Cache key of the audio
+            filename (str): Filename inside audio_dir
+        """
+        size = os.path.getsize(os.path.join(self.audio_dir, filename))
+        with self._lock:
+            try:
+                with self._index_lock():
+                    self._sync_locked()
+                    self._add_locked(key, filename, size)
+                    self._evict_locked(keep=key)
+                    self._save_index_locked()
+            except OSError as e:
+                # The audio is already written; a stale index only delays eviction
+                print(f"Warning: Failed to update the audio cache index: {e}")
+                if key not in self._entries:
+                    self._add_locked(key, filename, size)
+
+    def _add_locked(self, key, filename, size):
+        previous = self._entries.pop(key, None)
+        if previous is not None:
+            self._total_bytes -= previous["size"]
+        self._entries[key] = {"filename": filename, "size": size, "last_used": time.time()}
+        self._total_bytes += size
+
+    def _index_changed(self):
+        try:
+            return os.path.getmtime(self.index_path) != self._index_mtime
+        except OSError:
+            return False
+
+    def _evict_locked(self, keep=None):
+        while self._entries and (
+            self._total_bytes > self.max_bytes
+            or (self.max_entries is not None and len(self._entries) > self.max_entries)
+        ):
+            key = next(iter(self._entries))
+            if key == keep:
+                break
+            entry = self._entries.pop(key)
+            self._total_bytes -= entry["size"]
+            self.evictions += 1
+            try:
+                os.remove(os.path.join(self.audio_dir, entry["filename"]))
+            except OSError as e:
+                print(f"Warning: Failed to remove cached audio {entry['filename']}: {e}")
+
+    def stats(self):
+        """
+        Returns:
+            dict: Hit/miss/eviction counters and current size of the cache
+        """
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+                "evictions": self.evictions,
+                "entries": len(self._entries),
+                "bytes": self._total_bytes,
+                "max_bytes": self.max_bytes,
+            }
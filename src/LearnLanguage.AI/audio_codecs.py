@@ -0,0 +1,142 @@
+import io
+import os
+from functools import lru_cache
+import numpy as np
+
+# Output encodings of synthesized speech: format -> (mimetype, FFmpeg container, FFmpeg encoder)
+AUDIO_FORMATS = {
+    "wav": ("audio/wav", None, None),
+    "ogg": ("audio/ogg", "ogg", "libopus"),
+    "mp3": ("audio/mpeg", "mp3", "libmp3lame"),
+}
+
+MIMETYPE_ALIASES = {
+    "audio/wav": "wav",
+    "audio/wave": "wav",
+    "audio/x-wav": "wav",
+    "audio/ogg": "ogg",
+    "audio/opus": "ogg",
+    "audio/mpeg": "mp3",
+    "audio/mp3": "mp3",
+}
+
+# Encoding of generated speech when the request does not choose one
+TTS_AUDIO_FORMAT = os.getenv("TTS_AUDIO_FORMAT", "wav")
+
+# Bit rate of compressed speech (mono, 16 kHz)
+AUDIO_BIT_RATE = int(os.getenv("AUDIO_BIT_RATE_KBPS", "32")) * 1000
+
+
+class UnsupportedAudioFormatError(ValueError):
+    """The requested audio format is unknown or has no encoder on this machine"""
+
+
+@lru_cache(maxsize=None)
+def available_audio_formats():
+    """
+    Formats that can be produced here: int16 WAV always, Opus/OGG and MP3 when
+    PyAV has the encoders
+
+    Returns:
+        tuple: Format names
+    """
+    try:
+        import av  # PyAV ships with faster-whisper and bundles FFmpeg's encoders
+    except ImportError:
+        return ("wav",)
+
+    formats = ["wav"]
+    for name, (_, _, encoder) in AUDIO_FORMATS.items():
+        if encoder is None:
+            continue
+        try:
+            av.codec.Codec(encoder, "w")
+        except Exception:
+            continue
+        formats.append(name)
+    return tuple(formats)
+
+
+def mimetype_for(filename):
+    """Mimetype of an audio file from its extension"""
+    ext = os.path.splitext(filename)[1].lstrip(".").lower()
+    return AUDIO_FORMATS.get(ext, ("application/octet-stream",))[0]
+
+
+def negotiate_audio_format(accept=None, requested=None, default="wav"):
+    """
+    Pick the output format of synthesized speech
+
+    Args:
+        accept (str): Accept header of the request; only audio types are considered
+        requested (str): Format asked for explicitly (wins over the Accept header)
+        default (str): Format used when neither selects one
+
+    Returns:
+        str: A format of available_audio_formats()
+
+    Raises:
+        UnsupportedAudioFormatError: If `requested` cannot be produced
+    """
+    available = available_audio_formats()
+    if requested:
+        requested = MIMETYPE_ALIASES.get(requested.lower(), requested.lower())
+        if requested not in available:
+            raise UnsupportedAudioFormatError(f"Unsupported audio format '{requested}' (available: {', '.join(available)})")
+        return requested
+
+    preferences = []
+    for position, part in enumerate((accept or "").split(",")):
+        mimetype, *params = [item.strip() for item in part.split(";")]
+        quality = 1.0
+        for param in params:
+            if param.startswith("q="):
+                try:
+                    quality = float(param[2:])
+                except ValueError:
+                    quality = 0.0
+        fmt = MIMETYPE_ALIASES.get(mimetype.lower())
+        if fmt in available and quality > 0:
+            preferences.append((-quality, position, fmt))
+
+    return min(preferences)[2] if preferences else default
+
+
+def encode_audio(waveform, sample_rate, audio_format="wav"):
+    """
+    Encode a mono float waveform
+
+    Args:
+        waveform (np.ndarray): Samples in [-1, 1]
+        sample_rate (int): Sampling rate of the waveform
+        audio_format (str): One of available_audio_formats()
+
+    Returns:
+        bytes: The encoded file
+    """
+    waveform = np.clip(np.asarray(waveform, dtype=np.float32), -1.0, 1.0)
+    buffer = io.BytesIO()
+
+    if audio_format == "wav":
+        import scipy.io.wavfile
+
+        # 16-bit PCM is all speech needs and half the size of float32
+        scipy.io.wavfile.write(buffer, rate=sample_rate, data=(waveform * 32767).astype(np.int16))
+        return buffer.getvalue()
+
+    if audio_format not in available_audio_formats():
+        raise UnsupportedAudioFormatError(f"Unsupported audio format '{audio_format}'")
+
+    import av
+
+    _, container_format, encoder = AUDIO_FORMATS[audio_format]
+    with av.open(buffer, mode="w", format=container_format) as container:
+        stream = container.add_stream(encoder, rate=sample_rate, layout="mono")
+        stream.bit_rate = AUDIO_BIT_RATE
+        frame = av.AudioFrame.from_ndarray(waveform[np.newaxis, :], format="flt", layout="mono")
+        frame.sample_rate = sample_rate
+        for packet in stream.encode(frame):
+            container.mux(packet)
+        for packet in stream.encode(None):
+            container.mux(packet)
+    return buffer.getvalue()
@@ -0,0 +1,149 @@
+import base64
+import binascii
+import io
+import os
+import requests
+from metrics import stage
+
+# Sampling rate expected by Whisper
+WHISPER_SAMPLING_RATE = 16000
+
+# Largest encoded audio accepted from an upload, a base64 payload or a URL
+AUDIO_MAX_BYTES = int(float(os.getenv("AUDIO_MAX_UPLOAD_MB", "25")) * 1024 * 1024)
+
+DOWNLOAD_CHUNK_SIZE = 64 * 1024
+
+
+class AudioIngestError(ValueError):
+    """Raised when the provided audio cannot be read or decoded"""
+    status_code = 400
+
+
+class AudioTooLargeError(AudioIngestError):
+    status_code = 413
+
+
+def _too_large(max_bytes):
+    return AudioTooLargeError(f"Audio is larger than the {max_bytes // (1024 * 1024)} MB limit")
+
+
+def decode_audio_buffer(buffer):
+    """
+    Decode an in-memory encoded audio file (wav, mp3, m4a, webm...) into the
+    float32 mono 16 kHz array that faster-whisper accepts
+
+    Args:
+        buffer (bytes | BinaryIO): Encoded audio
+
+    Returns:
+        numpy.ndarray: float32 PCM samples
+
+    Raises:
+        AudioIngestError: If the data is not decodable audio
+    """
+    from faster_whisper import decode_audio
+
+    if isinstance(buffer, (bytes, bytearray)):
+        buffer = io.BytesIO(buffer)
+    try:
+        with stage("decode_upload", "stt"):
+            audio = decode_audio(buffer, sampling_rate=WHISPER_SAMPLING_RATE)
+    except Exception as e:
+        raise AudioIngestError(f"Could not decode audio: {str(e)}")
+    if audio.size == 0:
+        raise AudioIngestError("Audio contains no samples")
+    return audio
+
+
+def read_stream_limited(stream, max_bytes=AUDIO_MAX_BYTES):
+    """
+    Read a file-like object into memory, refusing anything over max_bytes
+
+    Raises:
+        AudioTooLargeError: If the stream is larger than max_bytes
+    """
+    data = stream.read(max_bytes + 1)
+    if len(data) > max_bytes:
+        raise _too_large(max_bytes)
+    return data
+
+
+def audio_from_upload(file_storage, max_bytes=AUDIO_MAX_BYTES):
+    """
+    Decode a multipart upload without writing it to disk
+
+    Args:
+        file_storage (werkzeug.datastructures.FileStorage): The uploaded file
+
+    Returns:
+        numpy.ndarray: float32 PCM samples
+    """
+    return decode_audio_buffer(read_stream_limited(file_storage.stream, max_bytes))
+
+
+def audio_from_data_url(data_url, max_bytes=AUDIO_MAX_BYTES):
+    """
+    Decode a base64 `data:` URL without writing it to disk
+
+    Args:
+        data_url (str): e.g. 'data:audio/wav;base64,UklGR...'
+
+    Returns:
+        numpy.ndarray: float32 PCM samples
+    """
+    try:
+        _, encoded = data_url.split(',', 1)
+    except ValueError:
+        raise AudioIngestError("Invalid data URL. Expected 'data:<mime>;base64,<data>'.")
+
+    # Check the decoded size before allocating it
+    if len(encoded) * 3 // 4 > max_bytes:
+        raise _too_large(max_bytes)
+
+    try:
+        decoded = base64.b64decode(encoded)
+    except (binascii.Error, ValueError) as e:
+        raise AudioIngestError(f"Invalid base64 audio data: {str(e)}")
+    return decode_audio_buffer(decoded)
+
+
+def audio_from_url(url, max_bytes=AUDIO_MAX_BYTES, timeout=30):
+    """
+    Stream an audio file from a URL into memory and decode it
+
+    Args:
+        url (str): URL of the audio file
+
+    Returns:
+        numpy.ndarray: float32 PCM samples
+
+    Raises:
+        AudioIngestError: If the URL is a blob URL or the download fails
+        AudioTooLargeError: If the file is larger than max_bytes
+    """
+    if url.startswith('blob:'):
+        raise AudioIngestError("Blob URLs cannot be downloaded by server. Use base64 audio data instead.")
+
+    # Add headers to mimic a browser request
+    headers = {
+        'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36'
+    }
+
+    buffer = io.BytesIO()
+    try:
+        with requests.get(url, headers=headers, timeout=timeout, stream=True) as response:
+            response.raise_for_status()
+
+            content_length = response.headers.get('Content-Length')
+            if content_length and content_length.isdigit() and int(content_length) > max_bytes:
+                raise _too_large(max_bytes)
+
+            for chunk in response.iter_content(chunk_size=DOWNLOAD_CHUNK_SIZE):
+                buffer.write(chunk)
+                if buffer.tell() > max_bytes:
+                    raise _too_large(max_bytes)
+    except requests.RequestException as e:
+        raise AudioIngestError(f"Failed to download audio from URL: {str(e)}")
+
+    buffer.seek(0)
+    return decode_audio_buffer(buffer)
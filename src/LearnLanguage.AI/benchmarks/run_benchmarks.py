@@ -0,0 +1,454 @@
+#!/usr/bin/env python3
+"""
+Offline benchmark suite for the LearnLanguage.AI services.
+
+Runs the translation, speech synthesis and transcription services and the
+Flask routes over the fixed corpora in benchmarks/corpus, with OpenRouter and
+the Hugging Face API replaced by a local stub (stub_upstream.py), and reports
+per scenario:
+
+- warm: p50/p95/p99 latency, throughput and peak RSS over the corpus, in a
+  process where the scenario's models are already loaded
+- cold: a fresh process doing the scenario's setup (imports, model loading)
+  and its first call
+
+Models are taken from the local Hugging Face cache (or downloaded once);
+scenarios whose models cannot be loaded are reported as errors and skipped.
+
+Usage:
+    python benchmarks/run_benchmarks.py --output results.json
+    python benchmarks/run_benchmarks.py --suites routes --concurrency 4
+    python benchmarks/run_benchmarks.py --compare baseline.json --output results.json
+"""
+import argparse
+import io
+import json
+import os
+import platform
+import resource
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+BENCHMARK_DIR = os.path.dirname(os.path.abspath(__file__))
+SERVICE_DIR = os.path.dirname(BENCHMARK_DIR)
+CORPUS_DIR = os.path.join(BENCHMARK_DIR, "corpus")
+sys.path.append(SERVICE_DIR)
+
+from stub_upstream import StubUpstream
+from translation_cache import read_word_list
+
+SUITES = ("translate", "tts", "stt", "routes")
+SIMILARITY_MODEL_NAME = "sentence-transformers/paraphrase-multilingual-MiniLM-L12-v2"
+
+
+def load_corpus():
+    """
+    Returns:
+        dict: "words", "sentences" and "clips" (name, float32 samples, WAV bytes)
+    """
+    import scipy.io.wavfile
+
+    clips = []
+    clip_dir = os.path.join(CORPUS_DIR, "clips")
+    for filename in sorted(os.listdir(clip_dir)):
+        if not filename.endswith(".wav"):
+            continue
+        path = os.path.join(clip_dir, filename)
+        _, samples = scipy.io.wavfile.read(path)
+        with open(path, "rb") as f:
+            clips.append((filename, samples.astype(np.float32) / 32768, f.read()))
+    return {
+        "words": read_word_list(os.path.join(CORPUS_DIR, "words.txt")),
+        "sentences": read_word_list(os.path.join(CORPUS_DIR, "sentences.txt")),
+        "clips": clips,
+    }
+
+
+class Scenario:
+    """
+    One benchmarked operation: `setup()` imports and loads what it needs and
+    returns the callable measured on every corpus item
+    """
+
+    def __init__(self, name, suite, setup, items, note=None):
+        self.name = name
+        self.suite = suite
+        self.setup = setup
+        self.items = items
+        self.note = note
+
+
+def _check_response(response):
+    if response.status_code >= 400:
+        raise RuntimeError(f"HTTP {response.status_code}: {response.get_data(as_text=True)[:200]}")
+    response.close()
+
+
+def build_scenarios(corpus, whisper_model="small"):
+    words, sentences, clips = corpus["words"], corpus["sentences"], corpus["clips"]
+
+    def translate_word_setup():
+        from translation_service import translate_word
+        return lambda word: translate_word(word, "en", "vi")
+
+    def translate_model_setup():
+        from model_provider import get_translation_model
+        from translation_service import generate_translations
+        tokenizer, model = get_translation_model("en", "vi")
+        return lambda word: generate_translations(tokenizer, model, [word])
+
+    def tts_setup():
+        from model_provider import get_tts_service
+        service = get_tts_service()
+        return lambda sentence: service.generate_speech(sentence, "wav")
+
+    def stt_setup():
+        from model_provider import get_whisper_model
+        from stt_service import transcribe_audio
+        get_whisper_model(whisper_model)
+
+        def transcribe(clip):
+            segments, _ = transcribe_audio(audio_path=clip[1], model_size=whisper_model, language="en")
+            return list(segments)
+        return transcribe
+
+    def route_setup(method, path, payload):
+        def setup():
+            from server import app
+            client = app.test_client()
+
+            def call(item):
+                _check_response(getattr(client, method)(path, **payload(item)))
+            return call
+        return setup
+
+    chunks = [words[i:i + 5] for i in range(0, len(words), 5)]
+    pairs = list(zip(sentences, sentences[1:] + sentences[:1]))
+
+    return [
+        Scenario("translate_word", "translate", translate_word_setup, words,
+                 note="translate_word() as served: after the first pass words come from the translation cache"),
+        Scenario("translate_model", "translate", translate_model_setup, words,
+                 note="MarianMT en->vi generate() for one word, bypassing the cache"),
+        Scenario("tts_generate_speech", "tts", tts_setup, sentences),
+        Scenario("stt_transcribe_audio", "stt", stt_setup, clips, note=f"Whisper {whisper_model}, int8"),
+        Scenario("route_generate_question", "routes", route_setup("post", "/generate-question", lambda word: {
+            "json": {"word": word, "question_type": "multiple_choice", "topic": "daily life"}}), words),
+        Scenario("route_generate_questions", "routes", route_setup("post", "/generate-questions", lambda chunk: {
+            "json": {"words": chunk, "question_type": "fill_in_blank"}}), chunks),
+        Scenario("route_translate", "routes", route_setup("post", "/translate", lambda word: {
+            "json": {"word": word, "src_lang": "en", "tgt_lang": "vi"}}), words),
+        Scenario("route_compare", "routes", route_setup("post", "/compare", lambda pair: {
+            "json": {"sentence1": pair[0], "sentence2": pair[1]}}), pairs),
+        Scenario("route_text_to_speech", "routes", route_setup("post", "/text-to-speech", lambda sentence: {
+            "json": {"text": sentence}}), sentences,
+                 note="Repeated sentences are served from the audio cache after the first pass"),
+        Scenario("route_speech_to_text", "routes", route_setup("post", "/speech-to-text", lambda clip: {
+            "data": {"audio": (io.BytesIO(clip[2]), clip[0]), "language": "en"},
+            "content_type": "multipart/form-data"}), clips),
+        Scenario("route_talking_service", "routes", route_setup("post", "/talking-service", lambda sentence: {
+            "json": {"message": sentence, "language": "Vietnamese", "topic": "daily life", "session_id": "benchmark"}}), sentences),
+    ]
+
+
+def get_rss_bytes():
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError):
+        return None
+
+
+def get_peak_rss_bytes():
+    # ru_maxrss is in kilobytes on Linux and in bytes on macOS
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak if sys.platform == "darwin" else peak * 1024
+
+
+class RssSampler:
+    """Highest resident set size seen while a scenario runs"""
+
+    def __init__(self, interval=0.005):
+        self.interval = interval
+        self.peak = get_rss_bytes()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            rss = get_rss_bytes()
+            if rss is not None and (self.peak is None or rss > self.peak):
+                self.peak = rss
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._stop.set()
+        self._thread.join()
+
+
+def summarize(latencies, wall_seconds, errors):
+    """
+    Args:
+        latencies (list): Seconds taken by each successful call
+        wall_seconds (float): Time taken by all calls together
+        errors (list): Error messages of the failed calls
+
+    Returns:
+        dict: Latency percentiles (ms), throughput (calls per second) and counts
+    """
+    summary = {
+        "calls": len(latencies) + len(errors),
+        "errors": len(errors),
+        "throughput_per_s": round(len(latencies) / wall_seconds, 3) if wall_seconds > 0 else 0.0,
+        "wall_seconds": round(wall_seconds, 3),
+    }
+    if latencies:
+        values = np.asarray(latencies) * 1000
+        summary.update({
+            "p50_ms": round(float(np.percentile(values, 50)), 3),
+            "p95_ms": round(float(np.percentile(values, 95)), 3),
+            "p99_ms": round(float(np.percentile(values, 99)), 3),
+            "mean_ms": round(float(values.mean()), 3),
+            "min_ms": round(float(values.min()), 3),
+            "max_ms": round(float(values.max()), 3),
+        })
+    if errors:
+        summary["first_error"] = errors[0]
+    return summary
+
+
+def run_warm(scenario, iterations, warmup, concurrency):
+    """Load the scenario once, then time every corpus item `iterations` times"""
+    started = time.perf_counter()
+    operation = scenario.setup()
+    setup_seconds = time.perf_counter() - started
+
+    for item in scenario.items[:warmup]:
+        operation(item)
+
+    errors = []
+
+    def timed(item):
+        started = time.perf_counter()
+        try:
+            operation(item)
+        except Exception as e:
+            errors.append(f"{type(e).__name__}: {e}")
+            return None
+        return time.perf_counter() - started
+
+    work = scenario.items * iterations
+    rss_before = get_rss_bytes()
+    with RssSampler() as sampler:
+        started = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=concurrency) as pool:
+            latencies = [latency for latency in pool.map(timed, work) if latency is not None]
+        wall_seconds = time.perf_counter() - started
+
+    summary = summarize(latencies, wall_seconds, errors)
+    summary.update({
+        "setup_seconds": round(setup_seconds, 3),
+        "rss_before_bytes": rss_before,
+        "rss_peak_bytes": sampler.peak,
+    })
+    return summary
+
+
+def run_cold(name, whisper_model):
+    """Set up one scenario in a fresh interpreter and time its first call"""
+    started = time.perf_counter()
+    process = subprocess.run(
+        [sys.executable, os.path.abspath(__file__), "--cold-child", name, "--whisper-model", whisper_model],
+        capture_output=True, text=True,
+    )
+    process_seconds = time.perf_counter() - started
+    lines = process.stdout.strip().splitlines()
+    try:
+        result = json.loads(lines[-1])
+    except (IndexError, ValueError):
+        return {"error": (process.stderr.strip().splitlines() or ["cold run produced no result"])[-1]}
+    result["process_seconds"] = round(process_seconds, 3)
+    return result
+
+
+def cold_child(name, whisper_model):
+    # Runs in the fresh interpreter started by run_cold
+    scenario = {s.name: s for s in build_scenarios(load_corpus(), whisper_model)}[name]
+    result = {}
+    try:
+        started = time.perf_counter()
+        operation = scenario.setup()
+        result["setup_seconds"] = round(time.perf_counter() - started, 3)
+        started = time.perf_counter()
+        operation(scenario.items[0])
+        result["first_call_seconds"] = round(time.perf_counter() - started, 3)
+    except Exception as e:
+        result["error"] = f"{type(e).__name__}: {e}"
+    result["peak_rss_bytes"] = get_peak_rss_bytes()
+    print(json.dumps(result))
+
+
+def configure_environment(stub, workdir, similarity_backend):
+    """Point the services at the stub and keep their files out of the source tree"""
+    os.environ.update({
+        "OPENROUTER_BASE_URL": stub.openrouter_url,
+        "OPENROUTER_API_KEY": "benchmark",
+        "HUGGINGFACE_API_KEY": "benchmark",
+        "SIMILARITY_BACKEND": similarity_backend,
+        "SIMILARITY_REMOTE_MODEL": stub.similarity_url(SIMILARITY_MODEL_NAME),
+        "AUDIO_DIR": os.path.join(workdir, "audio"),
+        "TRANSLATION_CACHE_PATH": os.path.join(workdir, "translations.sqlite3"),
+        "QUESTION_BANK_PATH": os.path.join(workdir, "question_bank.sqlite3"),
+        "CONVERSATION_BACKEND": "memory",
+        "PRELOAD_MODELS": "",
+        "REQUEST_LOG": "0",
+    })
+
+
+def git_commit():
+    try:
+        return subprocess.check_output(["git", "rev-parse", "HEAD"], cwd=SERVICE_DIR, text=True, stderr=subprocess.DEVNULL).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def compare_results(baseline, current, threshold):
+    """
+    Print the change of every warm metric against a baseline run
+
+    Returns:
+        list: Names of scenarios whose p95 latency or throughput regressed by more than `threshold` (a fraction)
+    """
+    regressions = []
+    print(f"\n{'scenario':<26}{'p50':>18}{'p95':>18}{'p99':>18}{'throughput':>18}")
+    for name, result in current["scenarios"].items():
+        before = baseline.get("scenarios", {}).get(name, {}).get("warm")
+        after = result.get("warm")
+        if not before or not after or "p50_ms" not in before or "p50_ms" not in after:
+            continue
+
+        cells = []
+        for key in ("p50_ms", "p95_ms", "p99_ms", "throughput_per_s"):
+            change = (after[key] - before[key]) / before[key] if before[key] else 0.0
+            cells.append(f"{after[key]:>9.1f} ({change:+.0%})")
+        print(f"{name:<26}" + "".join(f"{cell:>18}" for cell in cells))
+
+        slower = before["p95_ms"] and (after["p95_ms"] - before["p95_ms"]) / before["p95_ms"] > threshold
+        fewer = before["throughput_per_s"] and (before["throughput_per_s"] - after["throughput_per_s"]) / before["throughput_per_s"] > threshold
+        if slower or fewer:
+            regressions.append(name)
+    return regressions
+
+
+def print_results(results):
+    print(f"\n{'scenario':<26}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'ops/s':>10}{'peak MB':>10}{'cold s':>10}  status")
+    for name, result in results["scenarios"].items():
+        warm = result.get("warm") or {}
+        cold = result.get("cold") or {}
+        peak = warm.get("rss_peak_bytes")
+        cold_seconds = cold.get("setup_seconds", 0) + cold.get("first_call_seconds", 0) if "first_call_seconds" in cold else None
+        print(
+            f"{name:<26}"
+            f"{warm.get('p50_ms', float('nan')):>10.1f}"
+            f"{warm.get('p95_ms', float('nan')):>10.1f}"
+            f"{warm.get('p99_ms', float('nan')):>10.1f}"
+            f"{warm.get('throughput_per_s', float('nan')):>10.2f}"
+            f"{(peak or float('nan')) / 2 ** 20:>10.0f}"
+            f"{cold_seconds if cold_seconds is not None else float('nan'):>10.2f}"
+            f"  {result['status']}"
+        )
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Offline benchmarks of the LearnLanguage.AI services")
+    parser.add_argument("--suites", default=",".join(SUITES), help=f"Comma-separated suites to run (default: {','.join(SUITES)})")
+    parser.add_argument("--scenarios", help="Comma-separated scenario names to run (default: all of the selected suites)")
+    parser.add_argument("--iterations", type=int, default=3, help="Passes over the corpus per scenario (default: 3)")
+    parser.add_argument("--warmup", type=int, default=2, help="Untimed calls before measuring (default: 2)")
+    parser.add_argument("--concurrency", type=int, default=1, help="Calls in flight at once (default: 1)")
+    parser.add_argument("--no-cold", action="store_true", help="Skip the cold start runs (one fresh process per scenario)")
+    parser.add_argument("--whisper-model", default="small", help="Whisper size of the transcription scenarios (default: small)")
+    parser.add_argument("--similarity-backend", default="remote", choices=("remote", "local"),
+                        help="remote scores sentences on the stub, local runs the embedding model (default: remote)")
+    parser.add_argument("--upstream-latency-ms", type=float, default=100, help="Round trip of the stubbed APIs (default: 100)")
+    parser.add_argument("--chunk-delay-ms", type=float, default=10, help="Delay between streamed completion chunks (default: 10)")
+    parser.add_argument("--output", help="Write the results as JSON to this file")
+    parser.add_argument("--compare", help="Baseline JSON results to compare against")
+    parser.add_argument("--threshold", type=float, default=0.1, help="Relative p95/throughput change counted as a regression (default: 0.1)")
+    parser.add_argument("--cold-child", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.cold_child:
+        cold_child(args.cold_child, args.whisper_model)
+        return 0
+
+    suites = [suite.strip() for suite in args.suites.split(",") if suite.strip()]
+    names = [name.strip() for name in args.scenarios.split(",")] if args.scenarios else None
+
+    with StubUpstream(latency_ms=args.upstream_latency_ms, chunk_delay_ms=args.chunk_delay_ms) as stub, \
+            tempfile.TemporaryDirectory(prefix="learnlanguage-bench-") as workdir:
+        configure_environment(stub, workdir, args.similarity_backend)
+        scenarios = [
+            scenario for scenario in build_scenarios(load_corpus(), args.whisper_model)
+            if scenario.suite in suites and (names is None or scenario.name in names)
+        ]
+
+        results = {
+            "meta": {
+                "timestamp": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+                "git_commit": git_commit(),
+                "python": platform.python_version(),
+                "platform": platform.platform(),
+                "cpu_count": os.cpu_count(),
+            },
+            "config": {key: value for key, value in vars(args).items() if key not in ("output", "compare", "cold_child")},
+            "scenarios": {},
+        }
+
+        for scenario in scenarios:
+            print(f"Running {scenario.name}...", flush=True)
+            result = {"suite": scenario.suite, "items": len(scenario.items), "status": "ok"}
+            if scenario.note:
+                result["note"] = scenario.note
+            # Cold first: a fresh process, before this one has loaded anything for the scenario
+            if not args.no_cold:
+                result["cold"] = run_cold(scenario.name, args.whisper_model)
+            try:
+                result["warm"] = run_warm(scenario, args.iterations, args.warmup, args.concurrency)
+                if result["warm"]["errors"]:
+                    result["status"] = "errors"
+            except Exception as e:
+                result["status"] = "error"
+                result["error"] = f"{type(e).__name__}: {e}"
+            results["scenarios"][scenario.name] = result
+
+        results["meta"]["peak_rss_bytes"] = get_peak_rss_bytes()
+        results["meta"]["upstream_requests"] = stub.requests
+
+    print_results(results)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+        print(f"\nResults written to {args.output}")
+
+    if args.compare:
+        with open(args.compare, "r", encoding="utf-8") as f:
+            baseline = json.load(f)
+        regressions = compare_results(baseline, results, args.threshold)
+        if regressions:
+            print(f"\nRegressions beyond {args.threshold:.0%}: {', '.join(regressions)}")
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
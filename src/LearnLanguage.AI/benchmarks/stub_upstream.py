@@ -0,0 +1,210 @@
+"""
+Local stand-ins for the OpenRouter and Hugging Face APIs, for benchmarks.
+
+Answers the OpenAI-compatible chat completions endpoint (streamed or not) with
+canned but valid replies: quizzes that pass the question schema for the
+requested type and count, and short conversational replies for the talking
+service. Sentence similarity requests get a word-overlap score. A fixed round
+trip latency and a delay per streamed chunk stand in for the network and the
+model, so that runs are comparable without depending on either.
+"""
+import itertools
+import json
+import re
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+TALKING_REPLIES = [
+    "That sounds wonderful! What did you enjoy the most about it?",
+    "Good question. In Vietnamese we usually say it more simply. Try again with a shorter sentence.",
+    "I see. Do you often go there with your family, or do you prefer to go alone?",
+    "Great job! Your sentence is correct. Now tell me about your plans for the weekend.",
+]
+
+# Filler words make each generated question distinct enough for the question bank
+FILLER_WORDS = [
+    "garden", "winter", "music", "letter", "island", "market", "teacher", "bridge",
+    "candle", "forest", "pocket", "mirror", "ticket", "jacket", "planet", "basket",
+    "castle", "engine", "silver", "meadow", "harbor", "lantern", "pepper", "ribbon",
+]
+
+SIMILARITY_PATH = re.compile(r"/models/.+/pipeline/sentence-similarity$")
+
+
+def _quiz(qtype, word, topic, n):
+    fillers = [FILLER_WORDS[(n * 3 + i) % len(FILLER_WORDS)] for i in range(4)]
+    word = word or fillers.pop()
+    quiz = {
+        "topic": topic,
+        "word": word,
+        "question_type": qtype,
+        "question": f"Question {n}: which word means '{word}' next to the {' and the '.join(fillers[:3])}?",
+    }
+    if qtype == "match":
+        quiz["answer"] = [{word: f"{word}-vi"}, {fillers[1]: f"{fillers[1]}-vi"}]
+        quiz["options"] = {"English": [word, fillers[1]], "Vietnamese": [f"{word}-vi", f"{fillers[1]}-vi"]}
+    elif qtype == "translation":
+        quiz["answer"] = f"bản dịch của {word} số {n}"
+        quiz["options"] = []
+    else:
+        quiz["answer"] = f"{word}-vi"
+        quiz["options"] = [f"{word}-vi"] + [f"{filler}-vi" for filler in fillers[:3]]
+    return quiz
+
+
+def _match(pattern, text, default=None):
+    match = re.search(pattern, text)
+    return match.group(1).strip() if match else default
+
+
+def _word_overlap(a, b):
+    a, b = set(re.findall(r"\w+", a.lower())), set(re.findall(r"\w+", b.lower()))
+    return len(a & b) / len(a | b) if a | b else 1.0
+
+
+class StubUpstream:
+    """
+    Threaded HTTP server answering like OpenRouter and the HF Inference API
+
+    Args:
+        latency_ms (float): Delay before the first byte of every response
+        chunk_delay_ms (float): Delay between the chunks of a streamed completion
+    """
+
+    def __init__(self, latency_ms=100, chunk_delay_ms=10, host="127.0.0.1", port=0):
+        self.latency = latency_ms / 1000
+        self.chunk_delay = chunk_delay_ms / 1000
+        self.requests = 0
+        self._counter = itertools.count(1)
+        self._lock = threading.Lock()
+        self._server = ThreadingHTTPServer((host, port), self._handler_class())
+        self._server.daemon_threads = True
+        self._thread = None
+
+    @property
+    def base_url(self):
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    @property
+    def openrouter_url(self):
+        return f"{self.base_url}/v1"
+
+    def similarity_url(self, model_name):
+        return f"{self.base_url}/models/{model_name}/pipeline/sentence-similarity"
+
+    def start(self):
+        self._thread = threading.Thread(target=self._server.serve_forever, name="stub-upstream", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        if self._thread is not None:
+            self._server.shutdown()
+            self._thread = None
+        self._server.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+    def completion_text(self, body):
+        """Reply of the stubbed model to a chat completion request"""
+        messages = body.get("messages") or []
+        prompt = "\n".join(str(message.get("content", "")) for message in messages)
+
+        if "bilingual language learning quizzes" in prompt:
+            qtype = _match(r"Question type: (\w+)", prompt, "multiple_choice")
+            topic = _match(r"Topic: (.+)", prompt)
+            topic = None if topic in (None, "null") else topic
+            count = _match(r"Now generate (\d+) quizzes", prompt)
+            if count is None:
+                word = _match(r"- Word: (.+)", prompt)
+                word = None if word == "choose one from topic" else word
+                return json.dumps(_quiz(qtype, word, topic, next(self._counter)), ensure_ascii=False)
+
+            words = re.findall(r"^\s*\d+\. Word: (.+)$", prompt, flags=re.M)
+            words = [None if word.strip() == "choose one from topic" else word.strip() for word in words]
+            return json.dumps([_quiz(qtype, word, topic, next(self._counter)) for word in words], ensure_ascii=False)
+
+        return TALKING_REPLIES[next(self._counter) % len(TALKING_REPLIES)]
+
+    def _handler_class(self):
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def log_message(self, format, *args):
+                pass
+
+            def _read_json(self):
+                length = int(self.headers.get("Content-Length") or 0)
+                return json.loads(self.rfile.read(length) or b"{}")
+
+            def _send_json(self, payload, status=200):
+                data = json.dumps(payload).encode("utf-8")
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+            def do_POST(self):
+                with stub._lock:
+                    stub.requests += 1
+                body = self._read_json()
+                time.sleep(stub.latency)
+
+                if self.path.endswith("/chat/completions"):
+                    text = stub.completion_text(body)
+                    if body.get("stream"):
+                        self._stream_completion(body, text)
+                    else:
+                        self._send_json({
+                            "id": "stub",
+                            "object": "chat.completion",
+                            "created": int(time.time()),
+                            "model": body.get("model", "stub"),
+                            "choices": [{"index": 0, "finish_reason": "stop", "message": {"role": "assistant", "content": text}}],
+                            "usage": {"prompt_tokens": 0, "completion_tokens": 0, "total_tokens": 0},
+                        })
+                elif SIMILARITY_PATH.search(self.path):
+                    inputs = body.get("inputs") or {}
+                    source = inputs.get("source_sentence", "")
+                    self._send_json([_word_overlap(source, sentence) for sentence in inputs.get("sentences", [])])
+                else:
+                    self._send_json({"error": f"Unknown stub endpoint {self.path}"}, status=404)
+
+            def _stream_completion(self, body, text):
+                self.send_response(200)
+                self.send_header("Content-Type", "text/event-stream")
+                self.send_header("Cache-Control", "no-cache")
+                self.send_header("Connection", "close")
+                self.end_headers()
+
+                # About four characters per token, a few tokens per chunk
+                pieces = [text[i:i + 16] for i in range(0, len(text), 16)]
+                try:
+                    for piece in pieces:
+                        chunk = {
+                            "id": "stub",
+                            "object": "chat.completion.chunk",
+                            "created": int(time.time()),
+                            "model": body.get("model", "stub"),
+                            "choices": [{"index": 0, "delta": {"content": piece}, "finish_reason": None}],
+                        }
+                        self.wfile.write(f"data: {json.dumps(chunk)}\n\n".encode("utf-8"))
+                        self.wfile.flush()
+                        time.sleep(stub.chunk_delay)
+                    self.wfile.write(b"data: [DONE]\n\n")
+                    self.wfile.flush()
+                except (BrokenPipeError, ConnectionResetError):
+                    # The client closed the stream early (e.g. a malformed quiz was detected)
+                    pass
+                self.close_connection = True
+
+        return Handler
@@ -0,0 +1,233 @@
+import os
+import sqlite3
+import threading
+import time
+import uuid
+from collections import OrderedDict, deque
+
+DEFAULT_CONVERSATION_DB_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "cache", "conversations.sqlite3")
+
+
+def new_session_id():
+    return uuid.uuid4().hex
+
+
+def render_message(role, content):
+    """Transcript line of one message, as it appears in the talking prompt"""
+    return f"{role.capitalize()}: {content}"
+
+
+class _Session:
+    __slots__ = ("lines", "bytes", "last_used")
+
+    def __init__(self, max_messages):
+        self.lines = deque(maxlen=max_messages)
+        self.bytes = 0
+        self.last_used = time.monotonic()
+
+
+class MemoryConversationStore:
+    """
+    Conversation history per session, kept in process memory.
+
+    Each session is a ring buffer of its last `max_messages` messages, stored
+    already rendered so the prompt transcript is a join of a bounded list.
+    Sessions idle for `ttl_seconds` are dropped, and the least recently used
+    sessions are dropped once all transcripts exceed `max_bytes`.
+    """
+
+    def __init__(self, max_messages=10, ttl_seconds=3600, max_bytes=64 * 1024 * 1024):
+        self.max_messages = max_messages
+        self.ttl_seconds = ttl_seconds
+        self.max_bytes = max_bytes
+        self.total_bytes = 0
+        self.evictions = 0
+        self._sessions = OrderedDict()
+        self._lock = threading.Lock()
+
+    def append(self, session_id, role, content):
+        line = render_message(role, content)
+        size = len(line.encode("utf-8"))
+        with self._lock:
+            session = self._sessions.get(session_id)
+            if session is not None and self._expired(session):
+                # An idle-expired history must not come back with the next message
+                self._drop(session_id)
+                session = None
+            if session is None:
+                session = self._sessions[session_id] = _Session(self.max_messages)
+            if len(session.lines) == session.lines.maxlen:
+                dropped = len(session.lines[0].encode("utf-8"))
+                session.bytes -= dropped
+                self.total_bytes -= dropped
+            session.lines.append(line)
+            session.bytes += size
+            session.last_used = time.monotonic()
+            self.total_bytes += size
+            self._sessions.move_to_end(session_id)
+            self._evict(keep=session_id)
+
+    def transcript(self, session_id):
+        """
+        Rendered conversation history of a session, oldest message first
+
+        Returns:
+            str: One "Role: content" line per message ("" for an unknown session)
+        """
+        with self._lock:
+            session = self._sessions.get(session_id)
+            if session is None:
+                return ""
+            if self._expired(session):
+                self._drop(session_id)
+                return ""
+            session.last_used = time.monotonic()
+            self._sessions.move_to_end(session_id)
+            return "\n".join(session.lines)
+
+    def clear(self, session_id):
+        with self._lock:
+            if session_id in self._sessions:
+                self._drop(session_id)
+
+    def _expired(self, session):
+        return self.ttl_seconds > 0 and time.monotonic() - session.last_used > self.ttl_seconds
+
+    def _drop(self, session_id):
+        session = self._sessions.pop(session_id)
+        self.total_bytes -= session.bytes
+
+    def _evict(self, keep):
+        # Sessions are ordered by last use, so expired ones are at the front
+        while self._sessions:
+            session_id, session = next(iter(self._sessions.items()))
+            over_budget = self.total_bytes > self.max_bytes and session_id != keep
+            if not (self._expired(session) or over_budget):
+                break
+            self._drop(session_id)
+            self.evictions += 1
+
+    def stats(self):
+        with self._lock:
+            return {
+                "backend": "memory",
+                "sessions": len(self._sessions),
+                "bytes": self.total_bytes,
+                "max_bytes": self.max_bytes,
+                "evictions": self.evictions,
+            }
+
+
+class SqliteConversationStore:
+    """
+    Conversation history per session in a SQLite file, so that several worker
+    processes serving the same clients see the same conversations.
+    Keeps the last `max_messages` messages of each session and deletes
+    sessions idle for `ttl_seconds`.
+    """
+
+    def __init__(self, path=DEFAULT_CONVERSATION_DB_PATH, max_messages=10, ttl_seconds=3600, purge_interval=60):
+        self.path = path
+        self.max_messages = max_messages
+        self.ttl_seconds = ttl_seconds
+        self.purge_interval = purge_interval
+        self._last_purge = 0.0
+        self._local = threading.local()
+
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        with self._connection() as conn:
+            conn.execute(
+                """
+                CREATE TABLE IF NOT EXISTS messages (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    session_id TEXT NOT NULL,
+                    line TEXT NOT NULL,
+                    created_at REAL NOT NULL
+                )
+                """
+            )
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_messages_session ON messages (session_id, id)")
+
+    def _connection(self):
+        # sqlite3 connections cannot be shared between threads (or forked processes)
+        conn = getattr(self._local, "conn", None)
+        if conn is None or self._local.pid != os.getpid():
+            conn = sqlite3.connect(self.path, timeout=10)
+            conn.execute("PRAGMA journal_mode=WAL")
+            self._local.conn = conn
+            self._local.pid = os.getpid()
+        return conn
+
+    def append(self, session_id, role, content):
+        conn = self._connection()
+        now = time.time()
+        with conn:
+            if self.ttl_seconds > 0:
+                # An idle-expired history must not come back with the next message
+                conn.execute(
+                    "DELETE FROM messages WHERE session_id = ? AND "
+                    "(SELECT MAX(created_at) FROM messages WHERE session_id = ?) < ?",
+                    (session_id, session_id, now - self.ttl_seconds),
+                )
+            conn.execute(
+                "INSERT INTO messages (session_id, line, created_at) VALUES (?, ?, ?)",
+                (session_id, render_message(role, content), now),
+            )
+            conn.execute(
+                "DELETE FROM messages WHERE session_id = ? AND id NOT IN "
+                "(SELECT id FROM messages WHERE session_id = ? ORDER BY id DESC LIMIT ?)",
+                (session_id, session_id, self.max_messages),
+            )
+            if self.ttl_seconds > 0 and now - self._last_purge > self.purge_interval:
+                self._last_purge = now
+                conn.execute(
+                    "DELETE FROM messages WHERE session_id IN "
+                    "(SELECT session_id FROM messages GROUP BY session_id HAVING MAX(created_at) < ?)",
+                    (now - self.ttl_seconds,),
+                )
+
+    def transcript(self, session_id):
+        rows = self._connection().execute(
+            "SELECT line, created_at FROM messages WHERE session_id = ? ORDER BY id",
+            (session_id,),
+        ).fetchall()
+        if not rows or (self.ttl_seconds > 0 and time.time() - rows[-1][1] > self.ttl_seconds):
+            return ""
+        return "\n".join(line for line, _ in rows)
+
+    def clear(self, session_id):
+        with self._connection() as conn:
+            conn.execute("DELETE FROM messages WHERE session_id = ?", (session_id,))
+
+    def stats(self):
+        sessions, size = self._connection().execute(
+            "SELECT COUNT(DISTINCT session_id), COALESCE(SUM(LENGTH(line)), 0) FROM messages"
+        ).fetchone()
+        return {"backend": "sqlite", "sessions": sessions, "bytes": size}
+
+
+def create_conversation_store(backend=None):
+    """
+    Build the conversation store selected by CONVERSATION_BACKEND
+    (`memory`, the default, or `sqlite`)
+    """
+    backend = (backend or os.getenv("CONVERSATION_BACKEND", "memory")).lower()
+    max_messages = int(os.getenv("CONVERSATION_MAX_MESSAGES", "10"))
+    ttl_seconds = float(os.getenv("CONVERSATION_TTL_SECONDS", "3600"))
+
+    if backend == "sqlite":
+        return SqliteConversationStore(
+            path=os.getenv("CONVERSATION_DB_PATH", DEFAULT_CONVERSATION_DB_PATH),
+            max_messages=max_messages,
+            ttl_seconds=ttl_seconds,
+        )
+    if backend != "memory":
+        print(f"Warning: Unknown CONVERSATION_BACKEND '{backend}', using memory")
+    return MemoryConversationStore(
+        max_messages=max_messages,
+        ttl_seconds=ttl_seconds,
+        max_bytes=int(float(os.getenv("CONVERSATION_MAX_MB", "64")) * 1024 * 1024),
+    )
+
+
+conversation_store = create_conversation_store()
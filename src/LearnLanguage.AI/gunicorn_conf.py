@@ -0,0 +1,77 @@
+"""
+Production serving configuration.
+
+Run with:
+    gunicorn -c gunicorn_conf.py
+
+The app is imported once in the master process and the models listed in
+PRELOAD_MODELS are loaded there before the workers are forked, so every worker
+shares the same model weights copy-on-write instead of loading its own copy.
+Models that cannot be shared across a fork (Whisper) are loaded by each worker
+after it starts.
+"""
+import gc
+import os
+import sys
+
+# Exported before the inference executor is imported, so that it splits the
+# cores between the same number of worker processes as gunicorn starts
+os.environ.setdefault("WEB_CONCURRENCY", "2")
+
+from inference_executor import inference_executor
+from model_provider import FORK_SAFE_MODELS, PRELOAD_MODELS, preload_models, start_preload
+
+# "wsgi" serves the Flask app with threaded workers; "asgi" serves asgi_app with
+# uvicorn workers (async upstream-bound routes, Flask for the rest)
+SERVER_MODE = os.getenv("SERVER_MODE", "wsgi")
+
+bind = os.getenv("SERVER_BIND", f"0.0.0.0:{os.getenv('PORT', '5000')}")
+workers = int(os.environ["WEB_CONCURRENCY"])
+# Request threads per worker (wsgi mode); model calls release the GIL, so threads
+# give concurrency without another copy of the process
+threads = int(os.getenv("SERVER_THREADS", "8"))
+
+if SERVER_MODE == "asgi":
+    wsgi_app = "asgi_app:app"
+    worker_class = "uvicorn_worker.UvicornWorker"
+else:
+    wsgi_app = "server:app"
+    worker_class = "gthread"
+
+# Transcriptions of long audio and cold model loads can take a while
+timeout = int(os.getenv("SERVER_TIMEOUT_SECONDS", "120"))
+graceful_timeout = 30
+keepalive = 5
+
+# Load the app (and the shareable models) in the master before forking
+preload_app = True
+
+def when_ready(server):
+    # Runs in the master after the app is imported and before workers are forked
+    shared = [name for name in PRELOAD_MODELS if name in FORK_SAFE_MODELS]
+    if shared:
+        # No PyTorch thread pool may be running when the master forks
+        import torch
+        torch.set_num_threads(1)
+
+        server.log.info(f"Loading shared models before forking: {', '.join(shared)}")
+        preload_models(shared)
+
+    # Keep the objects built so far out of the garbage collector, so that
+    # collections in the workers do not write to (and copy) the shared pages
+    gc.freeze()
+
+
+def post_fork(server, worker):
+    # Intra-op threads per worker come from the inference executor's budget
+    # (TORCH_NUM_THREADS, or the cores split between all workers' inference slots);
+    # the environment variable covers PyTorch imported later by this worker
+    os.environ.setdefault("OMP_NUM_THREADS", str(inference_executor.torch_threads))
+    if "torch" in sys.modules:
+        import torch
+        torch.set_num_threads(inference_executor.torch_threads)
+
+    # Shared models are already loaded; this loads the rest and fills /ready.
+    # (ASGI workers do the same from the app's lifespan hook.)
+    if SERVER_MODE != "asgi":
+        start_preload()
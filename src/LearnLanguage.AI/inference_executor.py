@@ -0,0 +1,166 @@
+import heapq
+import itertools
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+# Priority classes: lower runs first when requests wait for the same model family
+INTERACTIVE = 0  # a learner is waiting on it mid-conversation
+DEFAULT = 1
+BULK = 2  # batch endpoints, cache warming
+
+PRIORITY_NAMES = {INTERACTIVE: "interactive", DEFAULT: "default", BULK: "bulk"}
+
+_current = threading.local()
+
+
+def current_priority():
+    """Priority class of the work running on this thread (DEFAULT outside priority_scope)"""
+    return getattr(_current, "priority", DEFAULT)
+
+
+@contextmanager
+def priority_scope(priority):
+    """Run the enclosed model calls of this thread with the given priority class"""
+    previous = current_priority()
+    _current.priority = priority
+    try:
+        yield
+    finally:
+        _current.priority = previous
+
+
+class InferencePool:
+    """
+    Bounded set of slots for one model family.
+
+    At most `slots` inferences of the family run at once, each using `threads`
+    intra-op threads. Callers beyond that wait, and a freed slot goes to the
+    waiter with the best priority class (first come, first served within a class).
+    """
+
+    def __init__(self, name, slots, threads):
+        self.name = name
+        self.slots = slots
+        self.threads = threads
+        self.active = 0
+        self.completed = 0
+        self.wait_seconds = 0.0
+        self._waiters = []  # heap of (priority, sequence, event)
+        self._sequence = itertools.count()
+        self._lock = threading.Lock()
+
+    @contextmanager
+    def slot(self, priority=None):
+        priority = current_priority() if priority is None else priority
+        started = time.monotonic()
+        with self._lock:
+            if self.active < self.slots and not self._waiters:
+                self.active += 1
+                event = None
+            else:
+                event = threading.Event()
+                heapq.heappush(self._waiters, (priority, next(self._sequence), event))
+        if event is not None:
+            # The releasing thread hands its slot over directly
+            event.wait()
+
+        waited = time.monotonic() - started
+        try:
+            yield
+        finally:
+            with self._lock:
+                self.completed += 1
+                self.wait_seconds += waited
+                if self._waiters:
+                    heapq.heappop(self._waiters)[2].set()
+                else:
+                    self.active -= 1
+
+    def stats(self):
+        with self._lock:
+            waiting = {name: 0 for name in PRIORITY_NAMES.values()}
+            for priority, _, _ in self._waiters:
+                waiting[PRIORITY_NAMES.get(priority, str(priority))] += 1
+            return {
+                "slots": self.slots,
+                "threads": self.threads,
+                "active": self.active,
+                "waiting": waiting,
+                "queue_depth": len(self._waiters),
+                "completed": self.completed,
+                "avg_wait_ms": round(1000 * self.wait_seconds / self.completed, 2) if self.completed else 0.0,
+            }
+
+
+class InferenceExecutor:
+    """
+    Central admission control for local model inference.
+
+    Each model family (tts, stt, mt, similarity) has its own InferencePool, so
+    concurrent requests of different families do not oversubscribe the cores:
+    the configured slots x threads of all pools add up to the CPU budget.
+    PyTorch's intra-op thread count is process-wide, so the PyTorch families
+    share `torch_threads`; Whisper's threads are given to CTranslate2 per model.
+    """
+
+    TORCH_FAMILIES = ("tts", "mt", "similarity")
+
+    def __init__(self, slots, torch_threads, stt_threads):
+        self.torch_threads = torch_threads
+        self.pools = {
+            family: InferencePool(family, count, stt_threads if family == "stt" else torch_threads)
+            for family, count in slots.items()
+        }
+        self._torch_configured_pid = None
+
+    @contextmanager
+    def slot(self, family, priority=None):
+        """
+        Hold a slot of a model family's pool around a model call
+
+        Args:
+            family (str): tts, stt, mt or similarity
+            priority (int): Priority class (default: the thread's current_priority())
+        """
+        if family in self.TORCH_FAMILIES:
+            self._configure_torch()
+        with self.pools[family].slot(priority):
+            yield
+
+    def _configure_torch(self):
+        # Applied once per process (workers forked after loading included)
+        if self._torch_configured_pid == os.getpid():
+            return
+        self._torch_configured_pid = os.getpid()
+        import torch
+        torch.set_num_threads(self.torch_threads)
+
+    def stats(self):
+        return {family: pool.stats() for family, pool in self.pools.items()}
+
+
+def _default_threads(total_slots):
+    # Split the cores between every slot of every worker process that can run at the same time
+    # (gunicorn_conf exports its worker count; a directly run server is one process)
+    workers = int(os.getenv("WEB_CONCURRENCY", "1"))
+    return max(1, (os.cpu_count() or 1) // max(1, total_slots * workers))
+
+
+def create_inference_executor():
+    slots = {
+        "tts": int(os.getenv("INFERENCE_TTS_SLOTS", "1")),
+        "stt": int(os.getenv("INFERENCE_STT_SLOTS", os.getenv("STT_WORKERS", os.getenv("WHISPER_NUM_WORKERS", "2")))),
+        "mt": int(os.getenv("INFERENCE_MT_SLOTS", "1")),
+        "similarity": int(os.getenv("INFERENCE_SIMILARITY_SLOTS", "1")),
+    }
+    default_threads = _default_threads(sum(slots.values()))
+    return InferenceExecutor(
+        slots,
+        torch_threads=int(os.getenv("TORCH_NUM_THREADS") or default_threads),
+        stt_threads=int(os.getenv("WHISPER_CPU_THREADS") or default_threads),
+    )
+
+
+inference_executor = create_inference_executor()
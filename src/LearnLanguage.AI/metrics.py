@@ -0,0 +1,309 @@
+"""
+Request and model metrics in the Prometheus text format, and structured
+request logs.
+
+Routes are timed as a whole (`request_seconds`) and by stage (`stage_seconds`:
+decode_upload, model_load, tokenize, generate, vocoder, encode, file_write,
+upstream). Stages that run on a request's thread, or in a task started from it,
+are also added to that request's trace, which is logged as one JSON line when
+the request ends. Values such as cache counters, queue depths and resident
+memory are read from the services when /metrics is scraped.
+
+Metrics are kept per process: with several gunicorn workers each scrape
+reports the worker that answered it.
+"""
+import bisect
+import contextvars
+import json
+import math
+import os
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+
+METRICS_PREFIX = "learnlanguage"
+
+# Print one JSON line per request (and per logged event) with its trace ID
+REQUEST_LOG = os.getenv("REQUEST_LOG", "1").lower() not in ("0", "false", "no")
+
+# Header a client (or proxy) may set to choose the trace ID of its request
+TRACE_HEADER = "X-Request-Id"
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(labels):
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{name}="{_escape(value)}"' for name, value in labels) + "}"
+
+
+def _format_value(value):
+    if value == math.inf:
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Counter:
+    """Monotonic count per label set"""
+
+    type = "counter"
+
+    def __init__(self, name, documentation, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount=1, **labels):
+        key = tuple(labels.get(name, "") for name in self.labelnames)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def samples(self):
+        with self._lock:
+            return [(self.name + "_total", list(zip(self.labelnames, key)), value) for key, value in self._values.items()]
+
+
+class Histogram:
+    """Distribution of observed values (seconds) in cumulative buckets per label set"""
+
+    type = "histogram"
+
+    def __init__(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(sorted(buckets))
+        self._values = {}  # labels -> [bucket counts..., +Inf count, sum]
+        self._lock = threading.Lock()
+
+    def observe(self, value, **labels):
+        key = tuple(labels.get(name, "") for name in self.labelnames)
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            counts = self._values.get(key)
+            if counts is None:
+                counts = self._values[key] = [0] * (len(self.buckets) + 1) + [0.0]
+            counts[index] += 1
+            counts[-1] += value
+
+    def samples(self):
+        samples = []
+        with self._lock:
+            items = [(key, list(counts)) for key, counts in self._values.items()]
+        for key, counts in items:
+            labels = list(zip(self.labelnames, key))
+            cumulative = 0
+            for bound, count in zip(self.buckets + (math.inf,), counts):
+                cumulative += count
+                samples.append((self.name + "_bucket", labels + [("le", _format_value(float(bound)))], cumulative))
+            samples.append((self.name + "_count", labels, cumulative))
+            samples.append((self.name + "_sum", labels, counts[-1]))
+        return samples
+
+
+class CallbackMetric:
+    """
+    Metric whose values are read when it is collected.
+    `callback()` returns a number, or a list of (labels dict, value) pairs.
+    """
+
+    def __init__(self, name, documentation, metric_type, callback):
+        self.name = name
+        self.documentation = documentation
+        self.type = metric_type
+        self.callback = callback
+
+    def samples(self):
+        values = self.callback()
+        if not isinstance(values, list):
+            values = [({}, values)]
+        sample_name = self.name + "_total" if self.type == "counter" else self.name
+        return [(sample_name, sorted(labels.items()), value) for labels, value in values if value is not None]
+
+
+class MetricsRegistry:
+    def __init__(self, prefix=METRICS_PREFIX):
+        self.prefix = prefix
+        self._metrics = []
+        self._lock = threading.Lock()
+
+    def _add(self, metric):
+        with self._lock:
+            self._metrics.append(metric)
+        return metric
+
+    def counter(self, name, documentation, labelnames=()):
+        return self._add(Counter(f"{self.prefix}_{name}", documentation, labelnames))
+
+    def histogram(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS):
+        return self._add(Histogram(f"{self.prefix}_{name}", documentation, labelnames, buckets))
+
+    def gauge_callback(self, name, documentation, callback):
+        return self._add(CallbackMetric(f"{self.prefix}_{name}", documentation, "gauge", callback))
+
+    def counter_callback(self, name, documentation, callback):
+        return self._add(CallbackMetric(f"{self.prefix}_{name}", documentation, "counter", callback))
+
+    def render(self):
+        """
+        Returns:
+            str: Every metric in the Prometheus text exposition format
+        """
+        with self._lock:
+            metrics = list(self._metrics)
+
+        lines = []
+        for metric in metrics:
+            try:
+                samples = metric.samples()
+            except Exception as e:
+                # A failing source must not take the whole scrape down
+                print(f"Warning: Could not collect metric {metric.name}: {e}")
+                continue
+            lines.append(f"# HELP {metric.name} {metric.documentation}")
+            lines.append(f"# TYPE {metric.name} {metric.type}")
+            for name, labels, value in samples:
+                lines.append(f"{name}{_format_labels(labels)} {_format_value(value)}")
+        return "\n".join(lines) + "\n"
+
+
+registry = MetricsRegistry()
+
+request_seconds = registry.histogram(
+    "request_seconds", "Request latency by route, until the last byte of the response", ("route", "method", "status")
+)
+stage_seconds = registry.histogram(
+    "stage_seconds", "Latency of one stage of request handling, by model family", ("stage", "model")
+)
+request_errors = registry.counter(
+    "request_errors", "Requests that failed with an unexpected error, by exception type", ("route", "type")
+)
+
+
+class RequestTrace:
+    """Timing of one request: its trace ID, route and the time spent in each stage"""
+
+    def __init__(self, route, method, trace_id=None):
+        self.trace_id = trace_id or uuid.uuid4().hex
+        self.route = route
+        self.method = method
+        self.started = time.perf_counter()
+        self.stages = {}
+        self.status = None
+        self.error = None
+        self._finished = False
+
+    def add_stage(self, name, seconds):
+        self.stages[name] = self.stages.get(name, 0.0) + seconds
+
+
+_current_trace = contextvars.ContextVar("request_trace", default=None)
+
+
+def new_trace_id(requested=None):
+    """Trace ID of a request: the client's X-Request-Id when it is sane, else a new one"""
+    if requested and len(requested) <= 128 and requested.isprintable():
+        return requested
+    return uuid.uuid4().hex
+
+
+def start_request(route, method, trace_id=None):
+    """
+    Begin timing a request on the current thread (or task)
+
+    Returns:
+        RequestTrace: The trace; pass it to finish_request
+    """
+    trace = RequestTrace(route, method, new_trace_id(trace_id))
+    _current_trace.set(trace)
+    return trace
+
+
+def finish_request(trace, status):
+    """Record a request's latency and log it; later calls for the same trace are ignored"""
+    if trace is None or trace._finished:
+        return
+    trace._finished = True
+    elapsed = time.perf_counter() - trace.started
+    request_seconds.observe(elapsed, route=trace.route, method=trace.method, status=str(status))
+    if REQUEST_LOG:
+        fields = {
+            "route": trace.route,
+            "method": trace.method,
+            "status": status,
+            "duration_ms": round(elapsed * 1000, 2),
+            "stages_ms": {name: round(seconds * 1000, 2) for name, seconds in trace.stages.items()},
+        }
+        if trace.error:
+            fields["error"] = trace.error
+        log_event("request", trace_id=trace.trace_id, **fields)
+    if _current_trace.get() is trace:
+        _current_trace.set(None)
+
+
+def current_trace():
+    return _current_trace.get()
+
+
+def current_trace_id():
+    trace = _current_trace.get()
+    return trace.trace_id if trace is not None else None
+
+
+def record_error(error, route=None):
+    """Count an unexpected error of the current request and log it with the trace ID"""
+    trace = _current_trace.get()
+    route = route or (trace.route if trace is not None else "")
+    request_errors.inc(route=route, type=type(error).__name__)
+    if trace is not None:
+        trace.error = f"{type(error).__name__}: {error}"
+    log_event("error", route=route, error_type=type(error).__name__, error=str(error))
+
+
+@contextmanager
+def stage(name, model=""):
+    """
+    Time a stage of request handling
+
+    Args:
+        name (str): decode_upload, model_load, tokenize, generate, vocoder,
+            encode, file_write or upstream
+        model (str): Model family or upstream service (tts, stt, mt, similarity,
+            openrouter, huggingface)
+    """
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        elapsed = time.perf_counter() - started
+        stage_seconds.observe(elapsed, stage=name, model=model)
+        trace = _current_trace.get()
+        if trace is not None:
+            trace.add_stage(f"{model}.{name}" if model else name, elapsed)
+
+
+def log_event(event, **fields):
+    """
+    Print a structured (JSON) log line, tagged with the current trace ID
+
+    Args:
+        event (str): What happened, e.g. "request" or "talking_reply"
+    """
+    if not REQUEST_LOG:
+        return
+    record = {"ts": round(time.time(), 3), "event": event}
+    trace_id = fields.pop("trace_id", None) or current_trace_id()
+    if trace_id:
+        record["trace_id"] = trace_id
+    record.update(fields)
+    print(json.dumps(record, ensure_ascii=False, default=str), flush=True)
@@ -0,0 +1,147 @@
+import os
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import Future
+from inference_executor import current_priority, priority_scope
+
+
+class QueueFullError(Exception):
+    """Raised by MicroBatcher.submit when max_queue items are already waiting"""
+
+
+class MicroBatcher:
+    """
+    Merges concurrent single-item requests into batches.
+
+    Items are queued per key (e.g. a language pair) and handed to
+    `process_batch(key, items)` once `max_batch_size` items are waiting or the
+    oldest one has waited `max_wait_ms`. `process_batch` must return one result per
+    item, in order; a result that is an Exception instance fails only that item,
+    while a raised exception fails every item of the batch.
+
+    Items carry the priority class of the submitting thread: when batches of
+    several keys are ready, the one holding the most urgent item goes first, and
+    process_batch runs with that priority.
+
+    With `max_in_flight_per_key`, a key is not given to another worker while
+    that many of its batches are being processed, so one slow key (e.g. a
+    model being loaded) cannot occupy every worker; its items keep queueing
+    and form larger batches meanwhile.
+    """
+
+    def __init__(self, process_batch, max_batch_size=32, max_wait_ms=10, num_workers=1, max_queue=None, name="micro-batcher", max_in_flight_per_key=None):
+        self.process_batch = process_batch
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000
+        self.num_workers = num_workers
+        self.max_queue = max_queue
+        self.name = name
+        self.max_in_flight_per_key = max_in_flight_per_key
+        self._queued = 0
+        self._in_flight = {}  # key -> batches being processed
+        self._pending = OrderedDict()  # key -> [(item, future, enqueued_at, priority)]
+        self._cond = threading.Condition()
+        self._started_pid = None
+
+    def _ensure_started(self):
+        # Worker threads are started on first use, and again in forked children
+        # (threads do not survive a fork)
+        if self._started_pid == os.getpid():
+            return
+        self._started_pid = os.getpid()
+        for i in range(self.num_workers):
+            threading.Thread(target=self._run, name=f"{self.name}-{i}", daemon=True).start()
+
+    def submit(self, key, item, priority=None):
+        """
+        Queue an item for batched processing
+
+        Args:
+            key (hashable): Items are only batched with items of the same key
+            item: Input passed to process_batch
+            priority (int): Priority class (default: the calling thread's)
+
+        Returns:
+            concurrent.futures.Future: Resolves to the item's result
+
+        Raises:
+            QueueFullError: If max_queue items are already waiting
+        """
+        future = Future()
+        with self._cond:
+            if self.max_queue is not None and self._queued >= self.max_queue:
+                raise QueueFullError(f"{self.name} queue is full ({self.max_queue} waiting)")
+            self._ensure_started()
+            priority = current_priority() if priority is None else priority
+            self._pending.setdefault(key, []).append((item, future, time.monotonic(), priority))
+            self._queued += 1
+            self._cond.notify()
+        return future
+
+    def queue_depth(self):
+        with self._cond:
+            return self._queued
+
+    def _next_batch(self):
+        # Must be called with the condition held
+        while True:
+            now = time.monotonic()
+            timeout = None
+            ready = None
+            for key, queue in self._pending.items():
+                if self.max_in_flight_per_key is not None and self._in_flight.get(key, 0) >= self.max_in_flight_per_key:
+                    # Woken up when one of its batches finishes
+                    continue
+                deadline = queue[0][2] + self.max_wait
+                if len(queue) >= self.max_batch_size or now >= deadline:
+                    priority = min(entry[3] for entry in queue[:self.max_batch_size])
+                    if ready is None or priority < ready[1]:
+                        ready = (key, priority)
+                    continue
+                timeout = deadline - now if timeout is None else min(timeout, deadline - now)
+
+            if ready is not None:
+                key, priority = ready
+                queue = self._pending[key]
+                batch = queue[:self.max_batch_size]
+                del queue[:self.max_batch_size]
+                self._queued -= len(batch)
+                if not queue:
+                    del self._pending[key]
+                self._in_flight[key] = self._in_flight.get(key, 0) + 1
+                return key, batch, priority
+            self._cond.wait(timeout)
+
+    def _run(self):
+        while True:
+            with self._cond:
+                key, batch, priority = self._next_batch()
+
+            try:
+                self._process(key, batch, priority)
+            finally:
+                with self._cond:
+                    self._in_flight[key] -= 1
+                    if not self._in_flight[key]:
+                        del self._in_flight[key]
+                    self._cond.notify_all()
+
+    def _process(self, key, batch, priority):
+        live = [(item, future) for item, future, _, _ in batch if future.set_running_or_notify_cancel()]
+        if not live:
+            return
+
+        try:
+            with priority_scope(priority):
+                results = self.process_batch(key, [item for item, _ in live])
+        except Exception as e:
+            for _, future in live:
+                future.set_exception(e)
+            return
+
+        for (_, future), result in zip(live, results):
+            if isinstance(result, Exception):
+                future.set_exception(result)
+            else:
+                future.set_result(result)
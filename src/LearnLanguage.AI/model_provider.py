@@ -0,0 +1,234 @@
+import os
+import threading
+import time
+from metrics import stage
+
+
+class ModelProvider:
+    """
+    Shared registry of heavy model objects.
+
+    Each model is registered under a name with a factory; the factory runs on the
+    first `get()` and every later caller, in any module or thread, receives the same
+    instance. `set()` injects a ready-made instance instead (e.g. a stub in tests).
+    The load state of every model is tracked for the readiness endpoint.
+    """
+
+    def __init__(self):
+        self._factories = {}
+        self._instances = {}
+        self._locks = {}
+        self._states = {}  # name -> {"state", "load_seconds", "error"}
+        self._lock = threading.Lock()
+
+    def register(self, name, factory):
+        """
+        Register a factory for a model
+
+        Args:
+            name (str): Name the model is requested by
+            factory (callable): Zero-argument callable that builds the model
+        """
+        with self._lock:
+            self._factories[name] = factory
+            self._locks.setdefault(name, threading.Lock())
+            self._states.setdefault(name, {"state": "not_loaded"})
+
+    def get(self, name):
+        """
+        Return the shared instance of a model, building it on first use
+
+        Args:
+            name (str): Registered model name
+
+        Returns:
+            object: The model instance
+
+        Raises:
+            KeyError: If no factory is registered under that name
+        """
+        instance = self._instances.get(name)
+        if instance is not None:
+            return instance
+
+        with self._lock:
+            if name not in self._factories:
+                raise KeyError(f"No model registered under '{name}'")
+            factory = self._factories[name]
+            lock = self._locks[name]
+
+        # Only one thread builds a given model; the others wait for it
+        with lock:
+            instance = self._instances.get(name)
+            if instance is None:
+                self._states[name] = {"state": "loading"}
+                started = time.monotonic()
+                try:
+                    with stage("model_load", name):
+                        instance = factory()
+                except Exception as e:
+                    self._states[name] = {"state": "failed", "error": str(e)}
+                    raise
+                self._instances[name] = instance
+                self._states[name] = {"state": "loaded", "load_seconds": round(time.monotonic() - started, 3)}
+            return instance
+
+    def set(self, name, instance):
+        """Inject an already constructed instance for a model"""
+        with self._lock:
+            self._locks.setdefault(name, threading.Lock())
+            self._instances[name] = instance
+            self._states[name] = {"state": "loaded"}
+
+    def is_loaded(self, name):
+        return name in self._instances
+
+    def status(self):
+        """
+        Returns:
+            dict: Load state of every registered model: not_loaded, loading,
+                loaded (with load_seconds) or failed (with error)
+        """
+        with self._lock:
+            return {name: dict(state) for name, state in self._states.items()}
+
+    def reset(self, name):
+        """Drop the shared instance so the next get() rebuilds it"""
+        with self._lock:
+            self._instances.pop(name, None)
+            if name in self._states:
+                self._states[name] = {"state": "not_loaded"}
+
+
+provider = ModelProvider()
+
+
+# Factories import their modules lazily so that importing this module stays cheap
+
+def _create_tts_service():
+    from tts_service import TextToSpeechService
+    return TextToSpeechService()
+
+
+def _create_whisper_pool():
+    from stt_service import whisper_pool
+    return whisper_pool
+
+
+def _create_translation_loader():
+    from translation_service import get_tokenizer_and_model
+    return get_tokenizer_and_model
+
+
+provider.register("tts", _create_tts_service)
+provider.register("stt", _create_whisper_pool)
+provider.register("mt", _create_translation_loader)
+
+
+def get_tts_service():
+    """
+    Returns:
+        TextToSpeechService: The process-wide SpeechT5 service
+    """
+    return provider.get("tts")
+
+
+def get_whisper_model(model_size="small", compute_type="int8"):
+    """
+    Args:
+        model_size (str): Size of the Whisper model
+        compute_type (str): CTranslate2 compute type
+
+    Returns:
+        WhisperModel: The shared Whisper model for that size/compute type
+    """
+    return provider.get("stt").get(model_size, compute_type)
+
+
+def get_translation_model(src_lang_code, tgt_lang_code):
+    """
+    Args:
+        src_lang_code (str): Source language code (e.g., 'en')
+        tgt_lang_code (str): Target language code (e.g., 'vi')
+
+    Returns:
+        tuple: (tokenizer, model) of the MarianMT model for the pair
+    """
+    return provider.get("mt")(src_lang_code, tgt_lang_code)
+
+
+def _create_similarity_engine():
+    from similarity_service import get_similarity_engine
+    return get_similarity_engine()
+
+
+# What preloading each model means: a Whisper model of the default size, the
+# MarianMT model of the default language pair
+PRELOAD_TARGETS = {
+    "tts": get_tts_service,
+    "stt": lambda: get_whisper_model(os.getenv("PRELOAD_WHISPER_MODEL", "small")),
+    "mt": lambda: get_translation_model("en", "vi"),
+    "similarity": _create_similarity_engine,
+}
+
+# Models whose loaded state may be inherited by forked workers. Whisper runs on
+# CTranslate2 thread pools, which do not survive a fork, so it loads in each worker.
+FORK_SAFE_MODELS = ("tts", "mt", "similarity")
+
+# Models to load in the background once the server is up, e.g. "tts,stt"
+PRELOAD_MODELS = [name.strip() for name in os.getenv("PRELOAD_MODELS", "").split(",") if name.strip()]
+
+_preload_status = {}
+_preload_pid = None
+_preload_lock = threading.Lock()
+
+
+def start_preload(names=None):
+    """
+    Load models in a background thread so that requests that need no model are
+    served while they load. Safe to call more than once; runs once per process.
+
+    Args:
+        names (list): Keys of PRELOAD_TARGETS (default: PRELOAD_MODELS)
+    """
+    global _preload_pid
+    names = PRELOAD_MODELS if names is None else names
+    with _preload_lock:
+        if _preload_pid == os.getpid() or not names:
+            return
+        _preload_pid = os.getpid()
+        for name in names:
+            _preload_status[name] = "pending" if name in PRELOAD_TARGETS else "unknown"
+
+    threading.Thread(target=preload_models, args=(names,), name="model-preload", daemon=True).start()
+
+
+def preload_models(names):
+    """
+    Load models in the calling thread, recording their state for /ready
+
+    Args:
+        names (list): Keys of PRELOAD_TARGETS
+    """
+    for name in names:
+        if name not in PRELOAD_TARGETS:
+            print(f"Warning: Unknown model '{name}' in PRELOAD_MODELS")
+            _preload_status[name] = "unknown"
+            continue
+        _preload_status[name] = "loading"
+        try:
+            PRELOAD_TARGETS[name]()
+            _preload_status[name] = "loaded"
+        except Exception as e:
+            print(f"Warning: Failed to preload model '{name}': {e}")
+            _preload_status[name] = "failed"
+
+
+def preload_status():
+    """
+    Returns:
+        dict: State of each model requested for preloading (pending, loading,
+            loaded, failed or unknown)
+    """
+    with _preload_lock:
+        return dict(_preload_status)
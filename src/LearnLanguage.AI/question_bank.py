@@ -0,0 +1,263 @@
+import json
+import os
+import queue
+import sqlite3
+import threading
+import time
+from question_generator import generate_question
+from question_parser import QuestionFormatError, is_similar_question, validate_question
+
+DEFAULT_BANK_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "cache", "question_bank.sqlite3")
+
+
+def is_valid_question(result, qtype):
+    """A generated quiz can be banked only if it matches the schema of the requested type"""
+    try:
+        validate_question(result, qtype)
+    except QuestionFormatError:
+        return False
+    return True
+
+
+class QuestionBank:
+    """
+    Store of pre-generated, validated quiz questions.
+
+    Questions are bucketed by (topic, word, question_type, language_in,
+    language_out) in SQLite and each one is served once. When a bucket drops
+    below `low_watermark`, a background worker asks the LLM for more until it
+    holds `target_size` questions, so requests are answered from the bank
+    instead of waiting for a completion. When the upstream fails, refills stop
+    and none are started for `backoff_seconds`, doubling with each consecutive
+    failure, so an outage or rate limit is not met with a stream of retries.
+    """
+
+    MAX_BACKOFF_SECONDS = 600
+
+    def __init__(self, path=DEFAULT_BANK_PATH, generate=generate_question, low_watermark=3, target_size=10, max_attempts_factor=2, backoff_seconds=30):
+        self.path = path
+        self.generate = generate
+        self.low_watermark = low_watermark
+        self.target_size = target_size
+        self.max_attempts_factor = max_attempts_factor
+        self.backoff_seconds = backoff_seconds
+        self.hits = 0
+        self.misses = 0
+        self._local = threading.local()
+        self._refill_queue = queue.Queue()
+        self._refilling = set()
+        self._refilling_lock = threading.Lock()
+        self._started_pid = None
+        self._failures = 0
+        self._backoff_until = 0.0
+
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        with self._connection() as conn:
+            conn.execute(
+                """
+                CREATE TABLE IF NOT EXISTS questions (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    topic TEXT NOT NULL,
+                    word TEXT NOT NULL,
+                    question_type TEXT NOT NULL,
+                    language_in TEXT NOT NULL,
+                    language_out TEXT NOT NULL,
+                    question TEXT NOT NULL,
+                    payload TEXT NOT NULL,
+                    created_at REAL NOT NULL
+                )
+                """
+            )
+            conn.execute(
+                "CREATE INDEX IF NOT EXISTS idx_questions_bucket "
+                "ON questions (topic, word, question_type, language_in, language_out)"
+            )
+
+    def _connection(self):
+        # sqlite3 connections cannot be shared between threads (or forked processes)
+        conn = getattr(self._local, "conn", None)
+        if conn is None or self._local.pid != os.getpid():
+            conn = sqlite3.connect(self.path, timeout=10)
+            conn.execute("PRAGMA journal_mode=WAL")
+            self._local.conn = conn
+            self._local.pid = os.getpid()
+        return conn
+
+    @staticmethod
+    def bucket_key(word, qtype, topic, language_in, language_out):
+        # Normalized so that equivalent requests share a bucket
+        return (
+            (topic or "").strip().lower(),
+            (word or "").strip().lower(),
+            qtype,
+            language_in,
+            language_out,
+        )
+
+    def count(self, bucket):
+        return self._connection().execute(
+            "SELECT COUNT(*) FROM questions WHERE topic = ? AND word = ? AND question_type = ? "
+            "AND language_in = ? AND language_out = ?",
+            bucket,
+        ).fetchone()[0]
+
+    def add(self, bucket, result):
+        """
+        Store a generated question unless the bucket already has a similar one
+
+        Returns:
+            bool: True if the question was stored
+        """
+        conn = self._connection()
+        existing = conn.execute(
+            "SELECT question FROM questions WHERE topic = ? AND word = ? AND question_type = ? "
+            "AND language_in = ? AND language_out = ?",
+            bucket,
+        ).fetchall()
+        if any(is_similar_question(result["question"], question) for (question,) in existing):
+            return False
+
+        with conn:
+            conn.execute(
+                "INSERT INTO questions (topic, word, question_type, language_in, language_out, question, payload, created_at) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                (*bucket, result["question"], json.dumps(result, ensure_ascii=False), time.time()),
+            )
+        return True
+
+    def take(self, bucket, previous_question=None):
+        """
+        Remove and return a banked question that differs from previous_question
+
+        Returns:
+            dict | None: The question, or None if the bucket has no suitable one
+        """
+        conn = self._connection()
+        rows = conn.execute(
+            "SELECT id, question, payload FROM questions WHERE topic = ? AND word = ? AND question_type = ? "
+            "AND language_in = ? AND language_out = ? ORDER BY id",
+            bucket,
+        ).fetchall()
+
+        for question_id, question, payload in rows:
+            if is_similar_question(question, previous_question):
+                continue
+            with conn:
+                deleted = conn.execute("DELETE FROM questions WHERE id = ?", (question_id,)).rowcount
+            # Another worker may have served it in the meantime
+            if deleted:
+                return json.loads(payload)
+        return None
+
+    def serve(self, word=None, qtype=None, topic=None, previous_question=None, language_in="English", language_out="Vietnamese"):
+        """
+        Take a banked question for the request. Call refill_if_low once the
+        request is answered (after generating a question itself on a miss).
+
+        Returns:
+            dict | None: The question, or None if the caller has to generate one
+        """
+        bucket = self.bucket_key(word, qtype, topic, language_in, language_out)
+        result = self.take(bucket, previous_question)
+        if result is not None:
+            self.hits += 1
+        else:
+            self.misses += 1
+        return result
+
+    def refill_if_low(self, word=None, qtype=None, topic=None, previous_question=None, language_in="English", language_out="Vietnamese"):
+        """Schedule a background refill of the request's bucket when it runs low"""
+        bucket = self.bucket_key(word, qtype, topic, language_in, language_out)
+        if self.count(bucket) < self.low_watermark:
+            self.schedule_refill(bucket, word, qtype, topic, language_in, language_out)
+
+    def get_question(self, word=None, qtype=None, topic=None, previous_question=None, language_in="English", language_out="Vietnamese"):
+        """
+        Serve a question from the bank, generating one on the spot if the bucket
+        is empty. Takes the same arguments as generate_question.
+        """
+        params = dict(word=word, qtype=qtype, topic=topic, previous_question=previous_question, language_in=language_in, language_out=language_out)
+        result = self.serve(**params)
+        if result is None:
+            result = self.generate(**params)
+        # Only now, so the refill does not call the LLM for the bucket alongside this request
+        self.refill_if_low(**params)
+        return result
+
+    def schedule_refill(self, bucket, word, qtype, topic, language_in, language_out):
+        if self.backing_off():
+            return
+        with self._refilling_lock:
+            self._ensure_started()
+            if bucket in self._refilling:
+                return
+            self._refilling.add(bucket)
+        self._refill_queue.put((bucket, dict(word=word, qtype=qtype, topic=topic, language_in=language_in, language_out=language_out)))
+
+    def _ensure_started(self):
+        # The worker is started on first use, and again in forked children
+        if self._started_pid == os.getpid():
+            return
+        self._started_pid = os.getpid()
+        self._refilling = set()
+        threading.Thread(target=self._refill_worker, name="question-bank-refill", daemon=True).start()
+
+    def backing_off(self):
+        return time.monotonic() < self._backoff_until
+
+    def _back_off(self, bucket, error):
+        self._failures += 1
+        delay = min(self.backoff_seconds * 2 ** (self._failures - 1), self.MAX_BACKOFF_SECONDS)
+        self._backoff_until = time.monotonic() + delay
+        print(f"Warning: Failed to refill question bank {bucket}, pausing refills for {delay:g}s: {error}")
+
+    def refill(self, bucket, params):
+        """
+        Generate questions until the bucket holds target_size of them, giving up
+        after max_attempts_factor * target_size LLM calls, or at the first
+        upstream error
+        """
+        previous_question = None
+        attempts = self.max_attempts_factor * self.target_size
+        while attempts > 0 and not self.backing_off() and self.count(bucket) < self.target_size:
+            attempts -= 1
+            result = self.generate(previous_question=previous_question, **params)
+            if isinstance(result, dict) and result.get("error_type") == "upstream":
+                self._back_off(bucket, result.get("error"))
+                return
+            if not is_valid_question(result, params["qtype"]):
+                continue
+            self._failures = 0
+            self.add(bucket, result)
+            previous_question = result["question"]
+
+    def _refill_worker(self):
+        while True:
+            bucket, params = self._refill_queue.get()
+            try:
+                self.refill(bucket, params)
+            except Exception as e:
+                self._back_off(bucket, e)
+            finally:
+                with self._refilling_lock:
+                    self._refilling.discard(bucket)
+
+    def stats(self):
+        total = self._connection().execute("SELECT COUNT(*) FROM questions").fetchone()[0]
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+            "questions": total,
+            "refills_pending": self._refill_queue.qsize(),
+            "refills_paused": self.backing_off(),
+        }
+
+
+question_bank = QuestionBank(
+    path=os.getenv("QUESTION_BANK_PATH", DEFAULT_BANK_PATH),
+    low_watermark=int(os.getenv("QUESTION_BANK_LOW_WATERMARK", "3")),
+    target_size=int(os.getenv("QUESTION_BANK_TARGET_SIZE", "10")),
+    backoff_seconds=float(os.getenv("QUESTION_BANK_BACKOFF_SECONDS", "30")),
+)
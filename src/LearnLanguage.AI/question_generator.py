@@ -1,43 +1,29 @@
-import json
-from openai import OpenAI
+import asyncio
 import os
-from huggingface_hub import InferenceClient
-from dotenv import load_dotenv
+from concurrent.futures import ThreadPoolExecutor
+from question_parser import IncrementalQuestionParser, QuestionFormatError, QuestionListParser, is_similar_question, parse_question
+from metrics import log_event, stage
+from upstream_clients import get_async_openrouter_client, get_openrouter_client
 
+QUESTION_MODEL = "x-ai/grok-4-fast:free"
+# Completions abandoned as malformed are regenerated up to this many times in total
+QUESTION_MAX_ATTEMPTS = int(os.getenv("QUESTION_MAX_ATTEMPTS", "3"))
+# Items of a batch that fail validation are regenerated one by one, this many at a time
+QUESTION_FANOUT_WORKERS = int(os.getenv("QUESTION_FANOUT_WORKERS", "8"))
 
-load_dotenv()
 
-client = OpenAI(
-  base_url="https://openrouter.ai/api/v1",
-  api_key=os.getenv("OPENROUTER_API_KEY"),
-)
-
-
-
-def generate_question(word: str = None, qtype: str = None, topic: str = None, previous_question: str = None, language_in: str = "English", language_out: str = "Vietnamese"):
-    prompt = f"""
-    You are an AI that generates JSON objects for bilingual language learning quizzes.
-
-    Rules:
-    1. Always return pure JSON only, without markdown code blocks or explanations.
-    2. JSON format must be:
-    {{
+def _question_format(language_in, language_out):
+    return f"""{{
       "topic": "<topic or null>",
       "word": "<chosen word or null>",
       "question_type": "<type>",
       "question": "<the question in {language_in}>",
       "answer": <string | array | object in {language_out}>,
       "options": <array | object in {language_out}>
-    }}
-
-    Requirements:
-    - If `word` is provided → use that word.
-    - If `word` is missing but `topic` is provided → choose a suitable word related to the topic.
-    - If `topic` is provided → include it in the JSON. If not → set "topic": null.
-    - `question_type` must exactly match the requested type.
-    - The new question MUST NOT be identical or too similar to the previous question: "{previous_question if previous_question else "none"}".
+    }}"""
 
-    Question rules:
+def _question_rules(language_in, language_out):
+    return f"""Question rules:
     - All questions MUST be in {language_in}.
     - All answers and options MUST be in {language_out}.
 
@@ -57,7 +43,34 @@ def generate_question(word: str = None, qtype: str = None, topic: str = None, pr
         "{language_in}": ["word1", "word2", "word3", "word4"],
         "{language_out}": ["nghĩa1", "nghĩa2", "nghĩa3", "nghĩa4"]
       }}
-    - For `translation`: options = [].
+    - For `translation`: options = []."""
+
+def _quoted_questions(questions):
+    if isinstance(questions, str):
+        questions = [questions]
+    return "; ".join(f'"{question}"' for question in questions) if questions else "none"
+
+def build_question_prompt(word: str = None, qtype: str = None, topic: str = None, previous_question=None, language_in: str = "English", language_out: str = "Vietnamese"):
+    """
+    Prompt for one quiz. `previous_question` is the question (or list of
+    questions) the new one must not repeat.
+    """
+    return f"""
+    You are an AI that generates JSON objects for bilingual language learning quizzes.
+
+    Rules:
+    1. Always return pure JSON only, without markdown code blocks or explanations.
+    2. JSON format must be:
+    {_question_format(language_in, language_out)}
+
+    Requirements:
+    - If `word` is provided → use that word.
+    - If `word` is missing but `topic` is provided → choose a suitable word related to the topic.
+    - If `topic` is provided → include it in the JSON. If not → set "topic": null.
+    - `question_type` must exactly match the requested type.
+    - The new question MUST NOT be identical or too similar to these previous questions: {_quoted_questions(previous_question)}.
+
+    {_question_rules(language_in, language_out)}
 
     Now generate one quiz with:
     - Word: {word if word else "choose one from topic"}
@@ -65,25 +78,279 @@ def generate_question(word: str = None, qtype: str = None, topic: str = None, pr
     - Question type: {qtype}
     """
 
+def build_questions_prompt(words: list, qtype: str = None, topic: str = None, previous_questions: list = None, language_in: str = "English", language_out: str = "Vietnamese"):
+    """
+    Prompt for a whole lesson: one quiz per entry of `words`, where a None entry
+    lets the model choose a word from `topic`
+    """
+    items = "\n".join(
+        f"    {i}. Word: {word if word else 'choose one from topic'}"
+        for i, word in enumerate(words, 1)
+    )
+    previous = _quoted_questions(previous_questions)
+    return f"""
+    You are an AI that generates JSON arrays of bilingual language learning quizzes.
+
+    Rules:
+    1. Always return a pure JSON array only, without markdown code blocks or explanations.
+    2. The array must contain exactly {len(words)} items, in the order requested below.
+    3. Each item must be:
+    {_question_format(language_in, language_out)}
+
+    Requirements:
+    - If a word is provided → use that word.
+    - If a word is missing → choose a suitable word related to the topic, different from the other items.
+    - If `topic` is provided → include it in every item. If not → set "topic": null.
+    - `question_type` must exactly match the requested type.
+    - The questions MUST NOT be identical or too similar to each other or to these previous questions: {previous}.
+
+    {_question_rules(language_in, language_out)}
+
+    Now generate {len(words)} quizzes with:
+    - Topic: {topic if topic else "null"}
+    - Question type: {qtype}
+{items}
+    """
+
+def parse_question_text(text: str, qtype: str = None):
+    """
+    Parse a complete completion text, returning {"raw": ..., "error": ...} if it
+    is not a valid quiz of type `qtype`
+    """
     try:
-        completion = client.chat.completions.create(
-          model="x-ai/grok-4-fast:free",
-          messages=[
+        return parse_question(text, qtype)
+    except QuestionFormatError as e:
+        return {"raw": text.strip(), "error": str(e)}
+
+def _question_request(prompt):
+    return dict(
+        model=QUESTION_MODEL,
+        messages=[
             {
-              "role": "user",
-              "content": prompt
+                "role": "user",
+                "content": prompt
             }
-          ]
-        )
-        
-        text = completion.choices[0].message.content.strip()
+        ],
+        stream=True
+    )
+
+def _stream_question(prompt, qtype):
+    """
+    Stream one completion through the incremental parser, closing the stream as
+    soon as the quiz is complete or turns out to be malformed
+    """
+    parser = IncrementalQuestionParser(qtype)
+    with stage("upstream", "openrouter"):
+        stream = get_openrouter_client().chat.completions.create(**_question_request(prompt))
+        try:
+            for chunk in stream:
+                if chunk.choices and chunk.choices[0].delta.content and parser.feed(chunk.choices[0].delta.content):
+                    break
+        finally:
+            stream.close()
+    return parser.finish()
+
+async def _astream_question(prompt, qtype):
+    parser = IncrementalQuestionParser(qtype)
+    with stage("upstream", "openrouter"):
+        stream = await get_async_openrouter_client().chat.completions.create(**_question_request(prompt))
+        try:
+            async for chunk in stream:
+                if chunk.choices and chunk.choices[0].delta.content and parser.feed(chunk.choices[0].delta.content):
+                    break
+        finally:
+            await stream.close()
+    return parser.finish()
+
+def generate_question(word: str = None, qtype: str = None, topic: str = None, previous_question: str = None, language_in: str = "English", language_out: str = "Vietnamese"):
+    """
+    Generate a quiz of type `qtype`. The completion is streamed and validated as
+    it arrives; malformed output is abandoned early and regenerated, up to
+    QUESTION_MAX_ATTEMPTS times.
+
+    Returns:
+        dict: The quiz, or {"error": ..., "error_type": "format" | "upstream"}
+            when no valid quiz was produced or the upstream call failed
+    """
+    prompt = build_question_prompt(word, qtype, topic, previous_question, language_in, language_out)
+
+    error = None
+    for _ in range(QUESTION_MAX_ATTEMPTS):
+        try:
+            return _stream_question(prompt, qtype)
+        except QuestionFormatError as e:
+            error = e
+        except Exception as e:
+            return {"error": str(e), "error_type": "upstream"}
+    return {"error": f"No valid question after {QUESTION_MAX_ATTEMPTS} attempts: {error}", "error_type": "format"}
 
-        if text.startswith("```"):
-            text = text.strip("`").replace("json\n", "").replace("json", "")
+async def agenerate_question(word: str = None, qtype: str = None, topic: str = None, previous_question: str = None, language_in: str = "English", language_out: str = "Vietnamese"):
+    """
+    Async version of generate_question: the request waits on the event loop
+    instead of holding a thread
+    """
+    prompt = build_question_prompt(word, qtype, topic, previous_question, language_in, language_out)
 
+    error = None
+    for _ in range(QUESTION_MAX_ATTEMPTS):
         try:
-            return json.loads(text)
+            return await _astream_question(prompt, qtype)
+        except QuestionFormatError as e:
+            error = e
         except Exception as e:
-            return {"raw": text, "error": str(e)}
+            return {"error": str(e), "error_type": "upstream"}
+    return {"error": f"No valid question after {QUESTION_MAX_ATTEMPTS} attempts: {error}", "error_type": "format"}
+
+def _stream_questions(prompt, qtype, count):
+    parser = QuestionListParser(qtype, max_items=count)
+    with stage("upstream", "openrouter"):
+        stream = get_openrouter_client().chat.completions.create(**_question_request(prompt))
+        try:
+            for chunk in stream:
+                if chunk.choices and chunk.choices[0].delta.content and parser.feed(chunk.choices[0].delta.content):
+                    break
+        finally:
+            stream.close()
+    return parser.finish()
+
+async def _astream_questions(prompt, qtype, count):
+    parser = QuestionListParser(qtype, max_items=count)
+    with stage("upstream", "openrouter"):
+        stream = await get_async_openrouter_client().chat.completions.create(**_question_request(prompt))
+        try:
+            async for chunk in stream:
+                if chunk.choices and chunk.choices[0].delta.content and parser.feed(chunk.choices[0].delta.content):
+                    break
+        finally:
+            await stream.close()
+    return parser.finish()
+
+def _same_word(word, other):
+    return (word or "").strip().lower() == (other or "").strip().lower()
+
+def accept_batch_items(items, words, previous_questions=None):
+    """
+    Match the items of a batch completion to the requested words
+
+    Args:
+        items (list): Parsed quizzes or QuestionFormatError instances, in order
+        words (list): Requested word per slot (None lets the model choose)
+        previous_questions (list): Questions the new ones must not repeat
+
+    Returns:
+        list: The quiz for each slot, or None where it has to be regenerated
+    """
+    seen = list(previous_questions or [])
+    accepted = []
+    for i, word in enumerate(words):
+        item = items[i] if i < len(items) else None
+        if (
+            isinstance(item, dict)
+            and "question" in item
+            and (not word or _same_word(word, item.get("word")))
+            and not any(is_similar_question(item["question"], question) for question in seen)
+        ):
+            accepted.append(item)
+            seen.append(item["question"])
+        else:
+            accepted.append(None)
+    return accepted
+
+def _lesson_slots(words, count):
+    return list(words) if words else [None] * count
+
+def _accepted_questions(results, previous_questions):
+    return list(previous_questions or []) + [result["question"] for result in results if result and "question" in result]
+
+def _accept_regenerated(results, missing, regenerated, slots, previous_questions):
+    """
+    Put regenerated quizzes into their slots if they pass the same checks as
+    the batch items (requested word, not similar to any previous or accepted
+    question, nor to each other)
+
+    Returns:
+        list: Indices of the slots that still have to be regenerated
+    """
+    accepted = accept_batch_items(regenerated, [slots[i] for i in missing], _accepted_questions(results, previous_questions))
+    still_missing = []
+    for i, item, result in zip(missing, regenerated, accepted):
+        if result is not None:
+            results[i] = result
+        elif isinstance(item, dict) and "error" in item:
+            # Generation itself failed (after its own attempts); report it
+            results[i] = item
+        else:
+            still_missing.append(i)
+    return still_missing
+
+def _not_distinct_error():
+    return {"error": f"No distinct question after {QUESTION_MAX_ATTEMPTS} attempts", "error_type": "format"}
+
+def generate_questions(words: list = None, qtype: str = None, topic: str = None, count: int = None, previous_questions: list = None, language_in: str = "English", language_out: str = "Vietnamese"):
+    """
+    Generate a lesson's worth of quizzes in one completion: one per word of
+    `words`, or `count` quizzes about `topic`. Items that are missing, invalid
+    or repeated are regenerated in parallel with generate_question, and the
+    regenerated ones go through the same checks (for up to
+    QUESTION_MAX_ATTEMPTS rounds).
+
+    Returns:
+        list: One quiz (or {"error": ...}) per requested slot
+    """
+    slots = _lesson_slots(words, count)
+    prompt = build_questions_prompt(slots, qtype, topic, previous_questions, language_in, language_out)
+
+    try:
+        items = _stream_questions(prompt, qtype, len(slots))
+    except Exception as e:
+        # Every slot is then generated one by one
+        log_event("question_batch_failed", qtype=qtype, slots=len(slots), error_type=type(e).__name__, error=str(e))
+        items = []
+    results = accept_batch_items(items, slots, previous_questions)
+
+    missing = [i for i, result in enumerate(results) if result is None]
+    for _ in range(QUESTION_MAX_ATTEMPTS):
+        if not missing:
+            break
+        avoid = _accepted_questions(results, previous_questions)
+        with ThreadPoolExecutor(max_workers=min(QUESTION_FANOUT_WORKERS, len(missing))) as executor:
+            regenerated = list(executor.map(
+                lambda i: generate_question(word=slots[i], qtype=qtype, topic=topic, previous_question=avoid, language_in=language_in, language_out=language_out),
+                missing
+            ))
+        missing = _accept_regenerated(results, missing, regenerated, slots, previous_questions)
+    for i in missing:
+        results[i] = _not_distinct_error()
+    return results
+
+async def agenerate_questions(words: list = None, qtype: str = None, topic: str = None, count: int = None, previous_questions: list = None, language_in: str = "English", language_out: str = "Vietnamese"):
+    """
+    Async version of generate_questions
+    """
+    slots = _lesson_slots(words, count)
+    prompt = build_questions_prompt(slots, qtype, topic, previous_questions, language_in, language_out)
+
+    try:
+        items = await _astream_questions(prompt, qtype, len(slots))
     except Exception as e:
-        return {"error": str(e)} 
+        # Every slot is then generated one by one
+        log_event("question_batch_failed", qtype=qtype, slots=len(slots), error_type=type(e).__name__, error=str(e))
+        items = []
+    results = accept_batch_items(items, slots, previous_questions)
+
+    missing = [i for i, result in enumerate(results) if result is None]
+    semaphore = asyncio.Semaphore(QUESTION_FANOUT_WORKERS)
+
+    async def regenerate(i, avoid):
+        async with semaphore:
+            return await agenerate_question(word=slots[i], qtype=qtype, topic=topic, previous_question=avoid, language_in=language_in, language_out=language_out)
+
+    for _ in range(QUESTION_MAX_ATTEMPTS):
+        if not missing:
+            break
+        avoid = _accepted_questions(results, previous_questions)
+        regenerated = await asyncio.gather(*(regenerate(i, avoid) for i in missing))
+        missing = _accept_regenerated(results, missing, regenerated, slots, previous_questions)
+    for i in missing:
+        results[i] = _not_distinct_error()
+    return results
@@ -0,0 +1,361 @@
+import json
+import re
+
+# Text the model may send before the JSON object: whitespace and an opening ```json fence
+_PREFIX_PATTERN = re.compile(r"\s*(`{1,3}[A-Za-z]*\s*)?")
+MAX_PREFIX_CHARS = 16
+MAX_QUESTION_CHARS = 4000
+
+REQUIRED_FIELDS = ("question_type", "question", "answer", "options")
+
+
+class QuestionFormatError(ValueError):
+    """The generated quiz is not valid JSON or does not match its question type"""
+
+
+def _tokens(text):
+    return set(re.findall(r"\w+", (text or "").lower()))
+
+
+def is_similar_question(question, other, threshold=0.8):
+    """
+    Whether two question texts are identical or too similar (Jaccard overlap of
+    their words), mirroring the rule the LLM is asked to follow
+    """
+    if not question or not other:
+        return False
+    a, b = _tokens(question), _tokens(other)
+    if not a or not b:
+        return question.strip().lower() == other.strip().lower()
+    return len(a & b) / len(a | b) >= threshold
+
+
+def _is_string_list(value, length=None):
+    return (
+        isinstance(value, list)
+        and all(isinstance(item, str) and item.strip() for item in value)
+        and (length is None or len(value) == length)
+    )
+
+
+def _check_optional_string(value):
+    return value is None or isinstance(value, str)
+
+
+def _check_single_answer(value):
+    return isinstance(value, str) and bool(value.strip())
+
+
+def _check_four_options(value):
+    return _is_string_list(value, 4)
+
+
+def _check_match_answer(value):
+    return (
+        isinstance(value, list)
+        and len(value) > 0
+        and all(
+            isinstance(pair, dict) and len(pair) == 1 and all(isinstance(v, str) for v in pair.values())
+            for pair in value
+        )
+    )
+
+
+def _check_match_options(value):
+    return isinstance(value, dict) and len(value) == 2 and all(_is_string_list(column) for column in value.values())
+
+
+def _answer_in_options(question):
+    return question["answer"] in question["options"]
+
+
+def _columns_have_same_length(question):
+    return len({len(column) for column in question["options"].values()}) == 1
+
+
+# Per-field checks and whole-object checks for each question type
+COMMON_FIELDS = {
+    "topic": _check_optional_string,
+    "word": _check_optional_string,
+    "question": lambda value: isinstance(value, str) and bool(value.strip()),
+}
+
+QUESTION_SCHEMAS = {
+    "fill_in_blank": {
+        "fields": {"answer": _check_single_answer, "options": _check_four_options},
+        "checks": [_answer_in_options],
+    },
+    "multiple_choice": {
+        "fields": {"answer": _check_single_answer, "options": _check_four_options},
+        "checks": [_answer_in_options],
+    },
+    "translation": {
+        "fields": {"answer": _check_single_answer, "options": lambda value: isinstance(value, list)},
+        "checks": [],
+    },
+    "match": {
+        "fields": {"answer": _check_match_answer, "options": _check_match_options},
+        "checks": [_columns_have_same_length],
+    },
+}
+
+
+def validate_field(qtype, key, value):
+    """
+    Validate one top-level field of a quiz of type `qtype`
+
+    Raises:
+        QuestionFormatError: If the value cannot belong to a valid quiz
+    """
+    if key == "question_type":
+        if value != qtype:
+            raise QuestionFormatError(f"Expected question_type '{qtype}', got {value!r}")
+        return
+
+    schema = QUESTION_SCHEMAS.get(qtype, {"fields": {}})
+    check = schema["fields"].get(key) or COMMON_FIELDS.get(key)
+    if check is not None and not check(value):
+        raise QuestionFormatError(f"Invalid '{key}' for a {qtype} question: {value!r}")
+
+
+def validate_question(question, qtype):
+    """
+    Validate a complete quiz object against the schema of `qtype`
+
+    Raises:
+        QuestionFormatError: If the quiz is incomplete or invalid
+    """
+    if not isinstance(question, dict):
+        raise QuestionFormatError("Expected a JSON object")
+    missing = [field for field in REQUIRED_FIELDS if field not in question]
+    if missing:
+        raise QuestionFormatError(f"Missing fields: {', '.join(missing)}")
+
+    for key, value in question.items():
+        validate_field(qtype, key, value)
+    for check in QUESTION_SCHEMAS.get(qtype, {"checks": []})["checks"]:
+        if not check(question):
+            raise QuestionFormatError(f"Inconsistent {qtype} question: {check.__name__.strip('_')}")
+
+
+class IncrementalQuestionParser:
+    """
+    Parse a quiz object from streamed completion text.
+
+    Every top-level field is decoded and validated as soon as its value is
+    complete, so a malformed or off-schema completion is rejected after a few
+    tokens instead of after the whole generation.
+    """
+
+    def __init__(self, qtype):
+        self.qtype = qtype
+        self.text = ""
+        self.prefix = ""
+        self.result = None
+        self._fields = {}
+        self._depth = 0
+        self._in_string = False
+        self._escaped = False
+        self._member_start = None
+
+    @property
+    def done(self):
+        return self.result is not None
+
+    def feed(self, chunk):
+        """
+        Consume the next piece of completion text
+
+        Returns:
+            dict | None: The validated quiz once the JSON object is complete
+
+        Raises:
+            QuestionFormatError: As soon as the text cannot become a valid quiz
+        """
+        for char in chunk:
+            if self.done:
+                # Anything after the object (a closing fence) is ignored
+                break
+            self._consume(char)
+        return self.result
+
+    def finish(self):
+        """
+        Signal the end of the completion
+
+        Returns:
+            dict: The validated quiz
+
+        Raises:
+            QuestionFormatError: If the completion ended before the object did
+        """
+        if not self.done:
+            raise QuestionFormatError("Completion ended before the JSON object was complete")
+        return self.result
+
+    def _consume(self, char):
+        if self._depth == 0:
+            if char == "{":
+                self._depth = 1
+                self.text = char
+                self._member_start = 1
+                return
+            self.prefix += char
+            if len(self.prefix) > MAX_PREFIX_CHARS or not _PREFIX_PATTERN.fullmatch(self.prefix):
+                raise QuestionFormatError(f"Expected a JSON object, got {self.prefix.strip()[:40]!r}")
+            return
+
+        self.text += char
+        if len(self.text) > MAX_QUESTION_CHARS:
+            raise QuestionFormatError("Generated question is too long")
+
+        if self._in_string:
+            if self._escaped:
+                self._escaped = False
+            elif char == "\\":
+                self._escaped = True
+            elif char == '"':
+                self._in_string = False
+            return
+
+        if char == '"':
+            self._in_string = True
+        elif char in "{[":
+            self._depth += 1
+        elif char in "}]":
+            if self._depth == 1:
+                if char != "}":
+                    raise QuestionFormatError("Malformed JSON: unexpected ']'")
+                self._close_member(len(self.text) - 1)
+                self._depth = 0
+                self._finish_object()
+            else:
+                self._depth -= 1
+        elif char == "," and self._depth == 1:
+            self._close_member(len(self.text) - 1)
+            self._member_start = len(self.text)
+
+    def _close_member(self, end):
+        member = self.text[self._member_start:end]
+        if not member.strip():
+            return
+        try:
+            parsed = json.loads("{" + member + "}")
+        except json.JSONDecodeError as e:
+            raise QuestionFormatError(f"Malformed JSON: {e}") from e
+        for key, value in parsed.items():
+            validate_field(self.qtype, key, value)
+            self._fields[key] = value
+
+    def _finish_object(self):
+        validate_question(self._fields, self.qtype)
+        self.result = self._fields
+
+
+def parse_question(text, qtype):
+    """
+    Parse and validate a complete completion text
+
+    Raises:
+        QuestionFormatError: If the text is not a valid quiz of type `qtype`
+    """
+    parser = IncrementalQuestionParser(qtype)
+    parser.feed(text)
+    return parser.finish()
+
+
+class QuestionListParser:
+    """
+    Split a streamed JSON array of quizzes into items.
+
+    Each item is validated on its own as soon as it closes; an invalid item is
+    recorded as a QuestionFormatError in `items` instead of failing the whole
+    array. Only text that cannot be an array at all raises.
+    """
+
+    def __init__(self, qtype, max_items=None):
+        self.qtype = qtype
+        self.max_items = max_items
+        self.items = []
+        self.prefix = ""
+        self.done = False
+        self._started = False
+        self._depth = 0
+        self._in_string = False
+        self._escaped = False
+        self._item = ""
+
+    def feed(self, chunk):
+        """
+        Consume the next piece of completion text
+
+        Returns:
+            bool: True once the array is complete (or max_items were read)
+
+        Raises:
+            QuestionFormatError: If the text is not a JSON array of objects
+        """
+        for char in chunk:
+            if self.done:
+                break
+            self._consume(char)
+        return self.done
+
+    def finish(self):
+        """
+        Signal the end of the completion
+
+        Returns:
+            list: Validated quizzes and QuestionFormatError instances, in order
+        """
+        if not self._started:
+            raise QuestionFormatError("Completion ended before the JSON array started")
+        return self.items
+
+    def _consume(self, char):
+        if not self._started:
+            if char == "[":
+                self._started = True
+                return
+            self.prefix += char
+            if len(self.prefix) > MAX_PREFIX_CHARS or not _PREFIX_PATTERN.fullmatch(self.prefix):
+                raise QuestionFormatError(f"Expected a JSON array, got {self.prefix.strip()[:40]!r}")
+            return
+
+        if self._depth == 0:
+            if char == "{":
+                self._depth = 1
+                self._item = char
+            elif char == "]":
+                self.done = True
+            elif not (char.isspace() or char == ","):
+                raise QuestionFormatError(f"Expected a quiz object in the array, got {char!r}")
+            return
+
+        self._item += char
+        if len(self._item) > MAX_QUESTION_CHARS:
+            raise QuestionFormatError("Generated question is too long")
+
+        if self._in_string:
+            if self._escaped:
+                self._escaped = False
+            elif char == "\\":
+                self._escaped = True
+            elif char == '"':
+                self._in_string = False
+        elif char == '"':
+            self._in_string = True
+        elif char in "{[":
+            self._depth += 1
+        elif char in "}]":
+            self._depth -= 1
+            if self._depth == 0:
+                self._finish_item()
+
+    def _finish_item(self):
+        try:
+            self.items.append(parse_question(self._item, self.qtype))
+        except QuestionFormatError as e:
+            self.items.append(e)
+        if self.max_items is not None and len(self.items) >= self.max_items:
+            self.done = True
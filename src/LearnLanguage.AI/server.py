@@ -1,41 +1,73 @@
 import json
-from flask import Flask, request, jsonify, send_file
-from openai import OpenAI
+from flask import Flask, Request, Response, g, request, jsonify, send_file, stream_with_context
 import os
-from huggingface_hub import InferenceClient
 from flask_cors import CORS
 from dotenv import load_dotenv
 import io
-from tts_service import TextToSpeechService
-from stt_service import transcribe_audio
-from question_generator import generate_question
-from translation_service import translate_word
-from talking_service import talkingService
+from inference_executor import BULK, inference_executor, priority_scope
+import metrics
+from model_provider import get_tts_service, preload_status, provider, start_preload
+from audio_cache import AUDIO_DIR, GENERATED_FILENAME_PATTERN
+from audio_codecs import TTS_AUDIO_FORMAT, UnsupportedAudioFormatError, mimetype_for, negotiate_audio_format
+from audio_ingest import AUDIO_MAX_BYTES, AudioIngestError, audio_from_data_url, audio_from_upload, audio_from_url
+from stt_service import iter_scheduled_transcription_events, transcription_scheduler, whisper_pool
+from micro_batcher import QueueFullError
+from question_bank import question_bank
+from question_generator import generate_questions
+from translation_service import model_memory_bytes, translate_word_batched, translate_words_with_route, translation_batcher, translation_cache, translation_models
+from talking_service import iter_talking_events, talkingService
+from conversation_store import conversation_store
+from similarity_service import compare_sentences, similarity_matrix, top_k
 
 # Load environment variables from .env file
 load_dotenv()
 
+
+class InMemoryUploadRequest(Request):
+    """
+    Keeps the files of a multipart body that fits the audio upload limit in
+    memory; Werkzeug would spool any body over 500 KB to a temporary file.
+    Larger bodies (or ones without a length) still go to a temporary file.
+    """
+
+    def _get_file_stream(self, total_content_length, content_type, filename=None, content_length=None):
+        if total_content_length is not None and total_content_length <= AUDIO_MAX_BYTES + 64 * 1024:
+            return io.BytesIO()
+        return super()._get_file_stream(total_content_length, content_type, filename, content_length)
+
+
 app = Flask(__name__)
+app.request_class = InMemoryUploadRequest
 CORS(app)
 
 
-clientHF = InferenceClient(
-    provider="hf-inference",
-    api_key=os.getenv("HUGGINGFACE_API_KEY"),
-)
+@app.before_request
+def start_request_trace():
+    route = request.url_rule.rule if request.url_rule is not None else "unmatched"
+    g.trace = metrics.start_request(route, request.method, request.headers.get(metrics.TRACE_HEADER))
 
-# Initialize text-to-speech service
-tts_service = TextToSpeechService()
+@app.after_request
+def finish_request_trace(response):
+    trace = g.get("trace")
+    if trace is not None:
+        trace.status = response.status_code
+        response.headers[metrics.TRACE_HEADER] = trace.trace_id
+        # Recorded once the body is sent, so streamed responses are timed to their last byte
+        response.call_on_close(lambda: metrics.finish_request(trace, response.status_code))
+    return response
 
+@app.teardown_request
+def abandon_request_trace(error=None):
+    # Requests that never produced a response (after_request did not run)
+    trace = g.get("trace")
+    if trace is not None and trace.status is None:
+        metrics.finish_request(trace, 500)
 
+def error_response(e, status=500, **fields):
+    """JSON error response of an unexpected exception, counted and logged with the request's trace ID"""
+    metrics.record_error(e)
+    return jsonify({"error": str(e), **fields}), status
 
-def compare_sentences(sentence1, sentence2):
-    result = clientHF.sentence_similarity(
-        sentence=sentence1,
-        other_sentences=[sentence2],
-        model="sentence-transformers/paraphrase-multilingual-MiniLM-L12-v2"
-    )
-    return result[0]
 
 
 @app.route("/generate-question", methods=["POST"])
@@ -54,11 +86,48 @@ def generate_question_api():
         return jsonify({"error": "Missing 'question_type'"}), 400
 
     try:
-        result = generate_question(word=word, qtype=question_type, topic=topic, previous_question=previous_question, language_in=language_in, language_out=language_out)
+        result = question_bank.get_question(word=word, qtype=question_type, topic=topic, previous_question=previous_question, language_in=language_in, language_out=language_out)
         return jsonify(result)
     except Exception as e:
-        return jsonify({"error": str(e)}), 500
+        return error_response(e)
       
+# Maximum number of questions generated by a single /generate-questions request
+QUESTION_BATCH_MAX = int(os.getenv("QUESTION_BATCH_MAX", "20"))
+
+@app.route("/generate-questions", methods=["POST"])
+def generate_questions_api():
+    data = request.get_json()
+    words = data.get("words")
+    question_type = data.get("question_type")
+    topic = data.get("topic")
+    count = data.get("count")
+    previous_questions = data.get("previous_questions") or []
+
+    if words is not None and (not isinstance(words, list) or not all(isinstance(word, str) and word.strip() for word in words)):
+        return jsonify({"error": "'words' must be a list of non-empty strings"}), 400
+    if not words and not topic:
+        return jsonify({"error": "Missing 'words' or 'topic'"}), 400
+    if not words and (not isinstance(count, int) or count < 1):
+        return jsonify({"error": "Missing 'count' (expected a positive integer) for a topic lesson"}), 400
+    if not question_type:
+        return jsonify({"error": "Missing 'question_type'"}), 400
+    if len(words or []) > QUESTION_BATCH_MAX or (not words and count > QUESTION_BATCH_MAX):
+        return jsonify({"error": f"Too many questions (max {QUESTION_BATCH_MAX})"}), 400
+
+    try:
+        questions = generate_questions(
+            words=words,
+            qtype=question_type,
+            topic=topic,
+            count=count,
+            previous_questions=previous_questions,
+            language_in=data.get("language_in", "English"),
+            language_out=data.get("language_out", "Vietnamese")
+        )
+        return jsonify({"questions": questions})
+    except Exception as e:
+        return error_response(e)
+
 @app.route("/compare", methods=["POST"])
 def compare():
     data = request.get_json()
@@ -72,7 +141,54 @@ def compare():
         score = compare_sentences(sentence1, sentence2)
         return jsonify({"similarity_score": score})
     except Exception as e:
-        return jsonify({"error": str(e)}), 500
+        return error_response(e)
+
+# Maximum number of sentences (references + candidates) scored by one /compare/bulk request
+COMPARE_BULK_MAX_SENTENCES = int(os.getenv("COMPARE_BULK_MAX_SENTENCES", "1024"))
+
+@app.route("/compare/bulk", methods=["POST"])
+def compare_bulk():
+    """
+    Score one reference (`reference`) or several (`references`) against many
+    `candidates` in a single call. Returns the score matrix and, for each
+    reference, the `top_k` best candidates (all of them by default).
+    """
+    data = request.get_json()
+    references = data.get("references") or ([data["reference"]] if data.get("reference") else None)
+    candidates = data.get("candidates")
+    k = data.get("top_k")
+
+    if not references or not isinstance(references, list):
+        return jsonify({"error": "Missing 'reference' or 'references'"}), 400
+    if not candidates or not isinstance(candidates, list):
+        return jsonify({"error": "Missing 'candidates' (expected a non-empty list)"}), 400
+    if not all(isinstance(sentence, str) and sentence.strip() for sentence in references + candidates):
+        return jsonify({"error": "Every sentence must be a non-empty string"}), 400
+    if len(references) + len(candidates) > COMPARE_BULK_MAX_SENTENCES:
+        return jsonify({"error": f"Too many sentences (max {COMPARE_BULK_MAX_SENTENCES})"}), 400
+    if k is not None and (not isinstance(k, int) or k < 1):
+        return jsonify({"error": "'top_k' must be a positive integer"}), 400
+
+    try:
+        scores = similarity_matrix(references, candidates)
+        results = [
+            {
+                "reference": reference,
+                "scores": row.tolist(),
+                "top": [
+                    {"index": index, "candidate": candidates[index], "similarity_score": float(row[index])}
+                    for index in top_k(row, k or len(candidates))
+                ]
+            }
+            for reference, row in zip(references, scores)
+        ]
+
+        # A single `reference` gets a flat response
+        if "references" not in data:
+            return jsonify(results[0])
+        return jsonify({"results": results})
+    except Exception as e:
+        return error_response(e)
 
 @app.route("/text-to-speech", methods=["POST"])
 def text_to_speech():
@@ -81,10 +197,16 @@ def text_to_speech():
     
     if not text:
         return jsonify({"error": "Missing 'text'"}), 400
+
+    # Encoding chosen with "format" (wav, ogg, mp3) or the audio types of the Accept header
+    try:
+        audio_format = negotiate_audio_format(request.headers.get("Accept"), data.get("format"), TTS_AUDIO_FORMAT)
+    except UnsupportedAudioFormatError as e:
+        return jsonify({"error": str(e)}), 400
     
     try:
-        # Generate audio file using TTS service
-        audio_filename = tts_service.generate_speech_file(text)
+        # Generate audio file using the shared TTS service (loaded on first use)
+        audio_filename = get_tts_service().generate_speech_file(text, audio_format)
         
         # Verify that the audio file was created successfully
         import os
@@ -100,38 +222,99 @@ def text_to_speech():
         # Return full URL with protocol that clients can access
         audio_url = f"{base_url}/{audio_filename}"
         
-        return jsonify({"audio": audio_url})
+        return jsonify({"audio": audio_url, "format": audio_format})
     except Exception as e:
-        return jsonify({"error": str(e)}), 500
+        return error_response(e)
+
+# Browser/CDN cache lifetime of files served by /audio
+AUDIO_MAX_AGE = int(os.getenv("AUDIO_MAX_AGE_SECONDS", str(365 * 24 * 3600)))
 
 @app.route("/audio/<filename>")
 def serve_audio(filename):
-    """Serve audio files from the audio directory"""
+    """
+    Serve audio files from the audio directory. Range requests, ETags and
+    conditional GETs are answered by send_file; generated files are
+    content-addressed and never change, so clients may cache them for good.
+    """
     try:
         # Validate filename to prevent directory traversal attacks
         import os.path
         if '..' in filename or filename.startswith('/'):
             return jsonify({"error": "Invalid filename"}), 400
         
-        # Use absolute path relative to the AI directory
-        ai_dir = os.path.dirname(os.path.abspath(__file__))
-        audio_path = os.path.join(ai_dir, "audio", filename)
+        # Use absolute path inside the audio directory
+        audio_dir = os.path.abspath(AUDIO_DIR)
+        audio_path = os.path.join(audio_dir, filename)
         
         # Check if file exists and is within the audio directory
         if os.path.exists(audio_path) and os.path.isfile(audio_path):
             # Ensure the resolved path is within the audio directory
-            if os.path.commonpath([ai_dir, audio_path]) == ai_dir:
-                return send_file(audio_path, mimetype="audio/wav")
+            if os.path.commonpath([audio_dir, audio_path]) == audio_dir:
+                response = send_file(audio_path, mimetype=mimetype_for(filename), conditional=True, etag=True, max_age=AUDIO_MAX_AGE)
+                response.headers["Accept-Ranges"] = "bytes"
+                if GENERATED_FILENAME_PATTERN.match(filename):
+                    response.cache_control.immutable = True
+                return response
             else:
                 return jsonify({"error": "Invalid file path"}), 400
         else:
             return jsonify({"error": f"Audio file not found: {filename}"}), 404
     except Exception as e:
-        return jsonify({"error": str(e)}), 500
+        return error_response(e)
     
+def get_stream_format():
+    """
+    Streaming format requested for a response: 'ndjson', 'sse' or None.
+    Selected with ?stream=ndjson|sse (or ?stream=1) or through the Accept header.
+    """
+    stream = request.args.get("stream", "").lower()
+    if stream in ("ndjson", "sse"):
+        return stream
+    if stream in ("1", "true"):
+        return "sse" if "text/event-stream" in request.headers.get("Accept", "") else "ndjson"
+
+    accept = request.headers.get("Accept", "")
+    if "text/event-stream" in accept:
+        return "sse"
+    if "application/x-ndjson" in accept:
+        return "ndjson"
+    return None
+
+def stream_events(events, stream_format):
+    """Stream events as NDJSON lines or Server-Sent Events"""
+    def generate():
+        try:
+            for event in events:
+                yield format_stream_event(event, stream_format)
+        except Exception as e:
+            metrics.record_error(e)
+            yield format_stream_event({"type": "error", "error": str(e), "success": False}, stream_format)
+
+    mimetype = "text/event-stream" if stream_format == "sse" else "application/x-ndjson"
+    response = Response(stream_with_context(generate()), mimetype=mimetype)
+    response.headers["Cache-Control"] = "no-cache"
+    response.headers["X-Accel-Buffering"] = "no"
+    return response
+
+def with_audio_url(event, base_url):
+    """Turn the audio path of a streamed event into a full URL"""
+    if event.get("audio"):
+        return {**event, "audio": f"{base_url}/{event['audio']}"}
+    return event
+
+def format_stream_event(event, stream_format):
+    data = json.dumps(event, ensure_ascii=False)
+    if stream_format == "sse":
+        return f"event: {event['type']}\ndata: {data}\n\n"
+    return data + "\n"
+
 @app.route("/speech-to-text", methods=["POST"])
 def speech_to_text():
     try:
+        # Reject oversized bodies before reading them (base64 adds a third on top of the audio)
+        if request.content_length and request.content_length > AUDIO_MAX_BYTES * 4 // 3 + 64 * 1024:
+            return jsonify({"error": "Audio upload is too large", "success": False}), 413
+
         # Check if request contains multipart form data (file upload)
         if request.content_type and request.content_type.startswith('multipart/form-data'):
             # Handle direct file upload
@@ -143,20 +326,12 @@ def speech_to_text():
             if audio_file.filename == '':
                 return jsonify({"error": "No audio file selected"}), 400
             
-            # Save the uploaded audio file temporarily
-            import tempfile
-            temp_file = tempfile.NamedTemporaryFile(delete=False, suffix='.wav')
-            audio_file.save(temp_file.name)
+            # Decode the upload in memory
+            audio = audio_from_upload(audio_file)
             
             # Get language from form data
             language = request.form.get('language', 'en')
             
-            # Perform transcription
-            segments, info = transcribe_audio(audio_path=temp_file.name, language=language)
-            
-            # Clean up the temporary file
-            os.unlink(temp_file.name)
-            
         else:
             # Handle JSON request with audio data
             data = request.get_json()
@@ -170,25 +345,8 @@ def speech_to_text():
                 
                 # Check if this is base64 encoded audio
                 if audio_data.startswith('data:'):
-                    import base64
-                    import tempfile
-                    
-                    # Extract audio format and data
-                    header, encoded = audio_data.split(',', 1)
-                    
-                    # Decode base64 data
-                    decoded_audio = base64.b64decode(encoded)
-                    
-                    # Save to temporary file
-                    temp_file = tempfile.NamedTemporaryFile(delete=False, suffix='.wav')
-                    temp_file.write(decoded_audio)
-                    temp_file.close()
-                    
-                    # Perform transcription
-                    segments, info = transcribe_audio(audio_path=temp_file.name, language=language)
-                    
-                    # Clean up the temporary file
-                    os.unlink(temp_file.name)
+                    # Decode base64 data straight into PCM samples
+                    audio = audio_from_data_url(audio_data)
                 else:
                     return jsonify({"error": "Invalid audio data format. Expected base64 encoded data."}), 400
                     
@@ -205,10 +363,18 @@ def speech_to_text():
                     }), 400
                 
                 # Handle regular URLs
-                segments, info = transcribe_audio(audio_path=audio_url, language=language)
+                audio = audio_from_url(audio_url)
             else:
                 return jsonify({"error": "No audio provided. Use 'audio_data' for base64 audio or 'audio_url' for direct URLs, or upload as multipart form data."}), 400
         
+        # Emit segments as they are decoded when the client asked for a stream
+        stream_format = get_stream_format()
+        if stream_format:
+            return stream_events(iter_scheduled_transcription_events(audio, language), stream_format)
+
+        # Queue the transcription; short clips are decoded together with concurrent requests
+        segments, info = transcription_scheduler.submit(audio, language).result()
+
         # Collect transcription results
         transcription = []
         full_text = ""
@@ -229,11 +395,20 @@ def speech_to_text():
             "success": True
         })
         
-    except Exception as e:
+    except AudioIngestError as e:
         return jsonify({
             "error": str(e),
             "success": False
-        }), 500
+        }), e.status_code
+    except QueueFullError:
+        response = jsonify({
+            "error": "Too many transcriptions in progress, please retry later",
+            "success": False
+        })
+        response.headers["Retry-After"] = str(transcription_scheduler.retry_after())
+        return response, 429
+    except Exception as e:
+        return error_response(e, success=False)
 
 LANGUAGE_CODE_MAP = {
     "en": "English",
@@ -277,15 +452,59 @@ def translate():
         src_lang = get_full_language_name(src_lang_code)
         tgt_lang = get_full_language_name(tgt_lang_code)
         
-        translation = translate_word(word, src_lang, tgt_lang)
-        return jsonify({"translation": translation, "src_lang": src_lang, "tgt_lang": tgt_lang})
+        # Concurrent requests for the same language pair share one model call
+        result = translate_word_batched(word, src_lang, tgt_lang)
+        return jsonify({
+            "translation": result["translation"],
+            "src_lang": src_lang,
+            "tgt_lang": tgt_lang,
+            "route": result["route"],
+            "hops": result["hops"]
+        })
     except Exception as e:
-        return jsonify({"error": str(e)}), 500
+        return error_response(e)
+
+# Maximum number of words accepted by a single /translate/batch request
+TRANSLATE_BATCH_MAX_WORDS = int(os.getenv("TRANSLATE_BATCH_MAX_WORDS", "256"))
+
+@app.route("/translate/batch", methods=["POST"])
+def translate_batch():
+    data = request.get_json()
+    words = data.get("words")
+    src_lang_code = data.get("src_lang", "en")
+    tgt_lang_code = data.get("tgt_lang", "vi")
+
+    if not words or not isinstance(words, list):
+        return jsonify({"error": "Missing 'words' (expected a non-empty list)"}), 400
+    if not all(isinstance(word, str) and word.strip() for word in words):
+        return jsonify({"error": "Every item of 'words' must be a non-empty string"}), 400
+    if len(words) > TRANSLATE_BATCH_MAX_WORDS:
+        return jsonify({"error": f"Too many words (max {TRANSLATE_BATCH_MAX_WORDS})"}), 400
+
+    try:
+        src_lang = get_full_language_name(src_lang_code)
+        tgt_lang = get_full_language_name(tgt_lang_code)
+
+        # Batch requests yield the models to interactive ones
+        with priority_scope(BULK):
+            result = translate_words_with_route(words, src_lang, tgt_lang)
+        return jsonify({
+            "translations": [{"word": word, "translation": translation} for word, translation in zip(words, result["translations"])],
+            "src_lang": src_lang,
+            "tgt_lang": tgt_lang,
+            "route": result["route"],
+            "hops": result["hops"],
+            "cache_hits": result["cache_hits"]
+        })
+    except Exception as e:
+        return error_response(e)
 
 @app.route("/talking-service", methods=["POST"])
 def talking_service_api():
     """
     API endpoint for the talking service that returns message with audio.
+    With ?stream=sse|ndjson the reply is streamed: text as it is generated and
+    each sentence's audio as soon as it is synthesized.
     """
     data = request.get_json()
     message = data.get("message")
@@ -294,23 +513,151 @@ def talking_service_api():
     
     if not message or not language or not topic:
         return jsonify({"error": "Missing 'message', 'language', or 'topic'"}), 400
+
+    # The conversation to continue; without it every turn would start an empty history
+    session_id = data.get("session_id") or request.headers.get("X-Session-Id")
+    if not session_id:
+        return jsonify({"error": "Missing 'session_id' (or an X-Session-Id header)"}), 400
     
     try:
-        # Call the talking service
-        result = talkingService(message, language, topic)
-        
         # Get the base URL of the current request
         base_url = request.url_root.rstrip('/')
+
+        stream_format = get_stream_format()
+        if stream_format:
+            events = iter_talking_events(message, language, topic, session_id)
+            return stream_events((with_audio_url(event, base_url) for event in events), stream_format)
+
+        result = talkingService(message, language, topic, session_id)
         
         # Return full URL with protocol that clients can access
         audio_url = f"{base_url}/{result['audio']}"
         
         return jsonify({
             "message": result["message"],
-            "audio": audio_url
+            "audio": audio_url,
+            "session_id": result["session_id"]
         })
     except Exception as e:
-        return jsonify({"error": str(e)}), 500
+        return error_response(e)
+
+def get_process_rss_bytes():
+    """Resident set size of this process, or None where /proc is unavailable"""
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError):
+        return None
+
+@app.route("/admin/models", methods=["GET"])
+def admin_models():
+    """Report which models are resident and how much memory they use"""
+    return jsonify({
+        "process_rss_bytes": get_process_rss_bytes(),
+        "translation": translation_models.stats(),
+        "whisper": {
+            "memory_budget_mb": whisper_pool.memory_budget_mb,
+            "resident_memory_mb": whisper_pool.resident_memory_mb(),
+            "models": whisper_pool.loaded_models()
+        },
+        "tts": {"loaded": provider.is_loaded("tts")},
+        "question_bank": question_bank.stats(),
+        "conversations": conversation_store.stats(),
+        "inference": inference_executor.stats()
+    })
+
+# Values read from the services on every /metrics scrape. Models that are not
+# loaded yet are skipped rather than loaded by the scrape.
+
+def _loaded(name):
+    return provider.get(name) if provider.is_loaded(name) else None
+
+def _cache_counts():
+    counts = [
+        ("translation_memory", translation_cache.memory_hits, None),
+        ("translation_disk", translation_cache.disk_hits, translation_cache.misses),
+        ("question_bank", question_bank.hits, question_bank.misses),
+        ("translation_models", translation_models.hits, translation_models.loads),
+        ("whisper_models", whisper_pool.hits, whisper_pool.loads),
+    ]
+    tts_service = _loaded("tts")
+    if tts_service is not None:
+        counts.append(("tts_audio", tts_service.cache.hits, tts_service.cache.misses))
+    similarity_engine = _loaded("similarity")
+    if similarity_engine is not None:
+        counts.append(("embeddings", similarity_engine.hits, similarity_engine.misses))
+    return counts
+
+def _queue_depths():
+    depths = [
+        ({"queue": "transcription"}, transcription_scheduler.queue_depth()),
+        ({"queue": "translation"}, translation_batcher.queue_depth()),
+    ]
+    depths += [({"queue": f"inference_{family}"}, pool.stats()["queue_depth"]) for family, pool in inference_executor.pools.items()]
+    tts_service = _loaded("tts")
+    if tts_service is not None:
+        depths.append(({"queue": "tts"}, tts_service.batcher.queue_depth()))
+    return depths
+
+def _model_memory():
+    memory = [
+        ({"model": "stt"}, int(whisper_pool.resident_memory_mb() * 1024 * 1024)),
+        ({"model": "mt"}, translation_models.resident_bytes()),
+    ]
+    tts_service = _loaded("tts")
+    if tts_service is not None:
+        memory.append(({"model": "tts"}, model_memory_bytes(tts_service.model) + model_memory_bytes(tts_service.vocoder)))
+    similarity_engine = _loaded("similarity")
+    if similarity_engine is not None:
+        memory.append(({"model": "similarity"}, model_memory_bytes(similarity_engine.model)))
+    return memory
+
+metrics.registry.counter_callback(
+    "cache_hits", "Lookups answered from a cache",
+    lambda: [({"cache": cache}, hits) for cache, hits, _ in _cache_counts()],
+)
+metrics.registry.counter_callback(
+    "cache_misses", "Lookups a cache could not answer (model caches: loads)",
+    lambda: [({"cache": cache}, misses) for cache, _, misses in _cache_counts() if misses is not None],
+)
+metrics.registry.gauge_callback("queue_depth", "Items waiting in a batching or inference queue", _queue_depths)
+metrics.registry.gauge_callback(
+    "inference_active", "Model inferences running, by model family",
+    lambda: [({"family": family}, pool.stats()["active"]) for family, pool in inference_executor.pools.items()],
+)
+metrics.registry.gauge_callback("model_resident_bytes", "Memory held by loaded model weights", _model_memory)
+metrics.registry.gauge_callback(
+    "model_loaded", "Whether a model is loaded (1) or not (0)",
+    lambda: [({"model": name}, int(state["state"] == "loaded")) for name, state in provider.status().items()],
+)
+metrics.registry.gauge_callback("process_resident_bytes", "Resident set size of this worker process", get_process_rss_bytes)
+
+@app.route("/metrics", methods=["GET"])
+def metrics_endpoint():
+    """Prometheus metrics of this process"""
+    return Response(metrics.registry.render(), content_type=metrics.CONTENT_TYPE)
+
+@app.route("/health", methods=["GET"])
+def health():
+    """Liveness: the process is up and serving requests"""
+    return jsonify({"status": "ok"})
+
+@app.route("/ready", methods=["GET"])
+def ready():
+    """
+    Readiness: 200 once every model listed in PRELOAD_MODELS is loaded, 503 before.
+    Models not preloaded are loaded by the first request that needs them.
+    """
+    preload = preload_status()
+    is_ready = all(state == "loaded" for state in preload.values())
+    return jsonify({
+        "ready": is_ready,
+        "preload": preload,
+        "models": provider.status()
+    }), 200 if is_ready else 503
 
 if __name__ == "__main__":
+    # With the reloader, only the child process that actually serves requests preloads
+    if os.environ.get("WERKZEUG_RUN_MAIN") == "true":
+        start_preload()
     app.run(host="0.0.0.0", debug=True, port=5000)
\ No newline at end of file
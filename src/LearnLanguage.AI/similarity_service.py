@@ -0,0 +1,216 @@
+import asyncio
+import os
+import threading
+import unicodedata
+from collections import OrderedDict
+import numpy as np
+from inference_executor import inference_executor
+from metrics import stage
+from model_provider import provider
+from upstream_clients import acall_with_retry, call_with_retry, get_async_hf_client, get_hf_client
+
+SIMILARITY_MODEL_NAME = "sentence-transformers/paraphrase-multilingual-MiniLM-L12-v2"
+
+# 'local' runs the embedding model in-process, 'remote' calls the hosted Hugging Face API
+SIMILARITY_BACKEND = os.getenv("SIMILARITY_BACKEND", "local").lower()
+
+# Model the remote backend calls: a Hub model id, or the URL of an endpoint serving it
+SIMILARITY_REMOTE_MODEL = os.getenv("SIMILARITY_REMOTE_MODEL", SIMILARITY_MODEL_NAME)
+
+
+def normalize_sentence(sentence):
+    return " ".join(unicodedata.normalize("NFC", sentence).split())
+
+
+class SentenceEmbeddingEngine:
+    """
+    In-process sentence embeddings for the same model the hosted API uses
+    (mean pooling over the transformer output, as sentence-transformers does).
+
+    Embeddings are L2-normalized and kept in an LRU keyed by sentence, so a
+    reference sentence shared by many learners is only embedded once and a
+    comparison becomes a dot product.
+    """
+
+    def __init__(self, model_name=SIMILARITY_MODEL_NAME, cache_size=50000, batch_size=32):
+        # Imported on construction so that importing this module stays cheap
+        from transformers import AutoModel, AutoTokenizer
+
+        self.tokenizer = AutoTokenizer.from_pretrained(model_name)
+        self.model = AutoModel.from_pretrained(model_name)
+        self.model.eval()
+        self.cache_size = cache_size
+        self.batch_size = batch_size
+        self.hits = 0
+        self.misses = 0
+        self._cache = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _encode(self, sentences):
+        import torch
+
+        vectors = []
+        for start in range(0, len(sentences), self.batch_size):
+            batch = sentences[start:start + self.batch_size]
+            with stage("tokenize", "similarity"):
+                inputs = self.tokenizer(batch, padding=True, truncation=True, max_length=128, return_tensors="pt")
+            with inference_executor.slot("similarity"), stage("encode", "similarity"), torch.no_grad():
+                output = self.model(**inputs).last_hidden_state
+
+            # Mean pooling over the real (non-padding) tokens
+            mask = inputs["attention_mask"].unsqueeze(-1).to(output.dtype)
+            pooled = (output * mask).sum(dim=1) / mask.sum(dim=1).clamp(min=1e-9)
+            pooled = torch.nn.functional.normalize(pooled, p=2, dim=1)
+            vectors.append(pooled.cpu().numpy().astype(np.float32))
+        return np.concatenate(vectors)
+
+    def embed(self, sentences):
+        """
+        Embed sentences, reusing cached embeddings and batching the rest
+
+        Args:
+            sentences (list): Sentences to embed
+
+        Returns:
+            numpy.ndarray: (len(sentences), dim) L2-normalized embeddings
+        """
+        keys = [normalize_sentence(sentence) for sentence in sentences]
+        found = {}
+        with self._lock:
+            for key in keys:
+                if key in self._cache:
+                    self._cache.move_to_end(key)
+                    found[key] = self._cache[key]
+            missing = [key for key in dict.fromkeys(keys) if key not in found]
+            self.hits += len(keys) - len(missing)
+            self.misses += len(missing)
+
+        if missing:
+            encoded = self._encode(missing)
+            with self._lock:
+                for key, vector in zip(missing, encoded):
+                    found[key] = vector
+                    self._cache[key] = vector
+                while len(self._cache) > self.cache_size:
+                    self._cache.popitem(last=False)
+
+        return np.stack([found[key] for key in keys])
+
+    def similarity_matrix(self, sentences, other_sentences):
+        """
+        Cosine similarity of every sentence against every other sentence
+
+        Returns:
+            numpy.ndarray: (len(sentences), len(other_sentences)) scores
+        """
+        embeddings = self.embed([*sentences, *other_sentences])
+        return embeddings[:len(sentences)] @ embeddings[len(sentences):].T
+
+    def similarity(self, sentence, other_sentences):
+        """
+        Cosine similarity of `sentence` against each of `other_sentences`
+
+        Returns:
+            list: One float per other sentence
+        """
+        embeddings = self.embed([sentence, *other_sentences])
+        return (embeddings[1:] @ embeddings[0]).tolist()
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+                "entries": len(self._cache),
+            }
+
+
+provider.register("similarity", lambda: SentenceEmbeddingEngine(
+    cache_size=int(os.getenv("SIMILARITY_CACHE_SIZE", "50000")),
+    batch_size=int(os.getenv("SIMILARITY_BATCH_SIZE", "32")),
+))
+
+
+def get_similarity_engine():
+    """
+    Returns:
+        SentenceEmbeddingEngine: The shared local embedding engine
+    """
+    return provider.get("similarity")
+
+
+def compare_sentences(sentence1, sentence2):
+    """
+    Score how similar two sentences are
+
+    Returns:
+        float: Cosine similarity between the sentence embeddings
+    """
+    if SIMILARITY_BACKEND == "local":
+        return get_similarity_engine().similarity(sentence1, [sentence2])[0]
+
+    with stage("upstream", "huggingface"):
+        result = call_with_retry(lambda: get_hf_client().sentence_similarity(
+            sentence=sentence1,
+            other_sentences=[sentence2],
+            model=SIMILARITY_REMOTE_MODEL
+        ))
+    return result[0]
+
+
+async def acompare_sentences(sentence1, sentence2):
+    """
+    Async version of compare_sentences
+    """
+    if SIMILARITY_BACKEND == "local":
+        # The model runs on CPU; keep it off the event loop
+        return await asyncio.to_thread(compare_sentences, sentence1, sentence2)
+
+    client = get_async_hf_client()
+    with stage("upstream", "huggingface"):
+        result = await acall_with_retry(lambda: client.sentence_similarity(
+            sentence=sentence1,
+            other_sentences=[sentence2],
+            model=SIMILARITY_REMOTE_MODEL
+        ))
+    return result[0]
+
+
+def similarity_matrix(references, candidates):
+    """
+    Score every reference sentence against every candidate in one pass
+
+    Args:
+        references (list): M reference sentences
+        candidates (list): N candidate sentences
+
+    Returns:
+        numpy.ndarray: (M, N) cosine similarities
+    """
+    if SIMILARITY_BACKEND == "local":
+        return get_similarity_engine().similarity_matrix(references, candidates)
+
+    # The hosted API scores one reference against a list of candidates per call
+    with stage("upstream", "huggingface"):
+        rows = [
+            call_with_retry(lambda reference=reference: get_hf_client().sentence_similarity(
+                sentence=reference,
+                other_sentences=list(candidates),
+                model=SIMILARITY_REMOTE_MODEL
+            ))
+            for reference in references
+        ]
+    return np.asarray(rows, dtype=np.float32)
+
+
+def top_k(scores, k):
+    """
+    Indices of the k highest scores of a 1-D array, best first
+    """
+    k = min(k, len(scores))
+    if k <= 0:
+        return []
+    indices = np.argpartition(-scores, k - 1)[:k]
+    return indices[np.argsort(-scores[indices])].tolist()
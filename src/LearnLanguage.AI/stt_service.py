@@ -1,8 +1,185 @@
+import dataclasses
 import os
-import tempfile
-import requests
+import queue
+import threading
+import time
+import numpy as np
+from collections import OrderedDict, namedtuple
 from urllib.parse import urlparse
-from faster_whisper import WhisperModel
+from audio_ingest import WHISPER_SAMPLING_RATE, AudioIngestError, audio_from_url
+from micro_batcher import MicroBatcher, QueueFullError
+from inference_executor import inference_executor
+from metrics import stage
+
+# Approximate resident size (MB) of each Whisper model once loaded with int8 weights.
+# float16/float32 weights take roughly 2x/4x as much memory.
+WHISPER_MODEL_MEMORY_MB = {
+    "tiny": 75,
+    "base": 145,
+    "small": 480,
+    "medium": 1500,
+    "large": 3000,
+    "large-v2": 3000,
+    "large-v3": 3000,
+}
+
+COMPUTE_TYPE_MEMORY_FACTOR = {
+    "int8": 1,
+    "int8_float16": 1,
+    "int8_float32": 1,
+    "float16": 2,
+    "float32": 4,
+}
+
+
+class WhisperModelPool:
+    """
+    Process-wide registry of loaded Whisper models.
+
+    Each (model_size, compute_type) pair is loaded once and shared by every request
+    thread; faster-whisper allows concurrent transcribe() calls on a single model
+    when it is created with num_workers > 1. Models that have not been used for
+    `idle_ttl` seconds, or the least recently used ones when the memory budget is
+    exceeded, are dropped from the pool; a background thread checks for idle
+    models every `idle_ttl / 2` seconds (at most every minute), so they are
+    released even when no request comes in.
+    """
+
+    def __init__(self, device="cpu", cpu_threads=0, num_workers=1, memory_budget_mb=2048, idle_ttl=900):
+        self.device = device
+        self.cpu_threads = cpu_threads
+        self.num_workers = num_workers
+        self.memory_budget_mb = memory_budget_mb
+        self.idle_ttl = idle_ttl
+        self._models = OrderedDict()  # (model_size, compute_type) -> [model, last_used]
+        self.hits = 0
+        self.loads = 0
+        self._lock = threading.Lock()
+        self._load_locks = {}
+        self._reaper_pid = None
+
+    def _ensure_reaper(self):
+        # Started on first use, and again in forked children (threads do not survive a fork)
+        if not self.idle_ttl or self._reaper_pid == os.getpid():
+            return
+        self._reaper_pid = os.getpid()
+        threading.Thread(target=self._reap_idle, name="whisper-idle-reaper", daemon=True).start()
+
+    def _reap_idle(self):
+        interval = min(self.idle_ttl / 2, 60)
+        while True:
+            time.sleep(interval)
+            self.evict_idle()
+
+    @staticmethod
+    def estimate_memory_mb(model_size, compute_type):
+        base = WHISPER_MODEL_MEMORY_MB.get(model_size, WHISPER_MODEL_MEMORY_MB["small"])
+        return base * COMPUTE_TYPE_MEMORY_FACTOR.get(compute_type, 1)
+
+    def get(self, model_size="small", compute_type="int8"):
+        """
+        Return a loaded WhisperModel, loading it on first use
+
+        Args:
+            model_size (str): Size of the Whisper model (tiny, base, small, medium, large)
+            compute_type (str): CTranslate2 compute type (e.g., 'int8', 'float32')
+
+        Returns:
+            WhisperModel: The shared model instance
+        """
+        key = (model_size, compute_type)
+
+        with self._lock:
+            self._ensure_reaper()
+            entry = self._models.get(key)
+            if entry is not None:
+                entry[1] = time.monotonic()
+                self._models.move_to_end(key)
+                self.hits += 1
+                self._evict_locked(keep=key)
+                return entry[0]
+            load_lock = self._load_locks.setdefault(key, threading.Lock())
+
+        # Load outside the pool lock so other sizes stay available meanwhile;
+        # the per-key lock keeps concurrent first requests from loading twice.
+        with load_lock:
+            with self._lock:
+                entry = self._models.get(key)
+                if entry is not None:
+                    entry[1] = time.monotonic()
+                    self.hits += 1
+                    return entry[0]
+
+            # Imported here: faster-whisper pulls in CTranslate2 and PyAV, which
+            # workers that never transcribe should not pay for at startup
+            from faster_whisper import WhisperModel
+
+            with stage("model_load", "stt"):
+                model = WhisperModel(
+                    model_size,
+                    device=self.device,
+                    compute_type=compute_type,
+                    cpu_threads=self.cpu_threads,
+                    num_workers=self.num_workers,
+                )
+
+            with self._lock:
+                self._models[key] = [model, time.monotonic()]
+                self.loads += 1
+                self._evict_locked(keep=key)
+            return model
+
+    def evict_idle(self):
+        """Drop models that have been idle for longer than idle_ttl"""
+        with self._lock:
+            self._evict_locked()
+
+    def _evict_locked(self, keep=None):
+        now = time.monotonic()
+
+        # Idle models first
+        if self.idle_ttl:
+            for key, (_, last_used) in list(self._models.items()):
+                if key != keep and now - last_used > self.idle_ttl:
+                    del self._models[key]
+
+        # Then least recently used models until the pool fits the budget
+        while self._models and self.resident_memory_mb() > self.memory_budget_mb:
+            key = next(iter(self._models))
+            if key == keep:
+                break
+            del self._models[key]
+
+    def resident_memory_mb(self):
+        return sum(self.estimate_memory_mb(size, ctype) for size, ctype in self._models)
+
+    def loaded_models(self):
+        """
+        Describe the models currently held by the pool
+
+        Returns:
+            list: One dict per model with its size, compute type, estimated memory and idle time
+        """
+        now = time.monotonic()
+        with self._lock:
+            return [
+                {
+                    "model_size": size,
+                    "compute_type": ctype,
+                    "memory_mb": self.estimate_memory_mb(size, ctype),
+                    "idle_seconds": round(now - last_used, 1),
+                }
+                for (size, ctype), (_, last_used) in self._models.items()
+            ]
+
+
+whisper_pool = WhisperModelPool(
+    device=os.getenv("WHISPER_DEVICE", "cpu"),
+    cpu_threads=inference_executor.pools["stt"].threads,
+    num_workers=int(os.getenv("WHISPER_NUM_WORKERS", "2")),
+    memory_budget_mb=int(os.getenv("WHISPER_MEMORY_BUDGET_MB", "2048")),
+    idle_ttl=int(os.getenv("WHISPER_IDLE_TTL_SECONDS", "900")),
+)
 
 def is_url(path):
     """
@@ -20,116 +197,301 @@ def is_url(path):
     except Exception:
         return False
 
-def download_audio_from_url(url, temp_dir=None):
-    """
-    Download audio file from URL to a temporary location
-    
-    Args:
-        url (str): URL of the audio file to download
-        temp_dir (str, optional): Directory for temporary file storage
-    
-    Returns:
-        str: Path to the downloaded temporary file
-    
-    Raises:
-        requests.RequestException: If download fails
-        ValueError: If URL is invalid or points to blob URL
-    """
-    if url.startswith('blob:'):
-        raise ValueError("Blob URLs cannot be downloaded by server. Use base64 audio data instead.")
-    
-    try:
-        # Add headers to mimic a browser request
-        headers = {
-            'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36'
-        }
-        
-        response = requests.get(url, headers=headers, timeout=30)
-        response.raise_for_status()
-        
-        # Create a temporary file with the appropriate extension
-        parsed_url = urlparse(url)
-        file_extension = os.path.splitext(parsed_url.path)[1] or '.wav'
-        
-        # Create temporary file
-        temp_file = tempfile.NamedTemporaryFile(delete=False, suffix=file_extension, dir=temp_dir)
-        temp_file.write(response.content)
-        temp_file.close()
-        
-        return temp_file.name
-        
-    except requests.RequestException as e:
-        raise requests.RequestException(f"Failed to download audio from URL: {str(e)}")
+def validate_language(language):
+    """Return the language code, or None (auto-detection) if Whisper may not support it"""
+    valid_languages = ['en', 'vi', 'ja', 'zh', 'ko', 'fr', 'de', 'es', 'pt', 'it', 'ru', 'ar']
+    if language not in valid_languages:
+        print(f"Warning: Language '{language}' may not be supported. Using 'auto' detection.")
+        return None  # Let Whisper auto-detect
+    return language
+
+def validate_model_size(model_size):
+    valid_models = ["tiny", "base", "small", "medium", "large", "large-v2", "large-v3"]
+    if model_size not in valid_models:
+        print(f"Warning: Model size '{model_size}' not recognized. Using 'small'.")
+        return "small"
+    return model_size
 
-def transcribe_audio(audio_path="./audio/output.wav", model_size="small", language="en"):
+# Voice activity detection used on every decode, batched or not, so that the
+# same audio gives the same transcript whatever the load
+VAD_PARAMETERS = dict(min_silence_duration_ms=500)
+
+def transcribe_audio(audio_path="./audio/output.wav", model_size="small", language="en", compute_type="int8"):
     """
     Transcribe audio file using faster_whisper
     
     Args:
-        audio_path (str): Path or URL to the audio file to transcribe
+        audio_path (str | numpy.ndarray): Path or URL to the audio file to transcribe,
+            or already decoded float32 16 kHz PCM samples
         model_size (str): Size of the Whisper model to use (tiny, base, small, medium, large)
         language (str): Language code for transcription (e.g., 'en', 'vi', 'ja')
+        compute_type (str): CTranslate2 compute type used to load the model
     
     Returns:
         tuple: (segments, info) from the transcription
     
     Raises:
         FileNotFoundError: If local audio file doesn't exist
-        ValueError: If blob URL is provided
+        AudioIngestError: If the audio cannot be downloaded or decoded (e.g. blob URL)
+        ValueError: If the transcription parameters are invalid
         Exception: If transcription fails
     """
-    temp_file_path = None
-    
     try:
         # Validate language parameter
-        valid_languages = ['en', 'vi', 'ja', 'zh', 'ko', 'fr', 'de', 'es', 'pt', 'it', 'ru', 'ar']
-        if language not in valid_languages:
-            print(f"Warning: Language '{language}' may not be supported. Using 'auto' detection.")
-            language = None  # Let Whisper auto-detect
+        language = validate_language(language)
         
-        # Check if audio_path is a URL
-        if is_url(audio_path):
-            # Download the audio file from URL to a temporary location
-            temp_file_path = download_audio_from_url(audio_path)
-            file_path = temp_file_path
+        if isinstance(audio_path, np.ndarray):
+            # Already decoded samples, nothing touches the disk
+            audio = audio_path
+        elif is_url(audio_path):
+            # Stream the download into memory and decode it there
+            audio = audio_from_url(audio_path)
         else:
             # It's a local file path, check if it exists
             if not os.path.exists(audio_path):
                 raise FileNotFoundError(f"Audio file not found: {audio_path}")
-            file_path = audio_path
+            audio = audio_path
         
         # Validate model size
-        valid_models = ["tiny", "base", "small", "medium", "large", "large-v2", "large-v3"]
-        if model_size not in valid_models:
-            print(f"Warning: Model size '{model_size}' not recognized. Using 'small'.")
-            model_size = "small"
+        model_size = validate_model_size(model_size)
         
-        # Initialize Whisper model (using CPU for better compatibility)
-        model = WhisperModel(model_size, device="cpu", compute_type="int8")
+        # Reuse the process-wide Whisper model (loaded once per size/compute type)
+        model = whisper_pool.get(model_size, compute_type)
         
         # Perform transcription with optimized parameters
         segments, info = model.transcribe(
-            file_path,
+            audio,
             beam_size=5,
             language=language,
             task="transcribe",
             vad_filter=True,  # Voice activity detection
-            vad_parameters=dict(min_silence_duration_ms=500)
+            vad_parameters=dict(VAD_PARAMETERS)
         )
         
         return segments, info
         
+    except (AudioIngestError, FileNotFoundError):
+        raise
     except ValueError as e:
         raise ValueError(f"Transcription error: {str(e)}")
     except Exception as e:
         raise Exception(f"Failed to transcribe audio: {str(e)}")
-    finally:
-        # Clean up temporary file if it was created
-        if temp_file_path and os.path.exists(temp_file_path):
-            try:
-                os.remove(temp_file_path)
-            except Exception as cleanup_error:
-                print(f"Warning: Failed to clean up temporary file {temp_file_path}: {cleanup_error}")
+
+# Summary of one clip transcribed as part of a batch
+ClipInfo = namedtuple("ClipInfo", ["language", "language_probability", "duration"])
+
+TranscriptionJob = namedtuple("TranscriptionJob", ["audio", "on_segment"])
+
+
+class TranscriptionScheduler:
+    """
+    Bounded queue and worker pool in front of Whisper.
+
+    Requests are queued per (model_size, language). Short clips with a known
+    language are decoded together: they are laid out back to back and passed to
+    faster-whisper's BatchedInferencePipeline with one clip timestamp per request,
+    so each clip becomes one chunk of a single batched decode. Longer clips and
+    auto-detected languages are decoded one at a time on the same workers. When
+    `max_queue` requests are already waiting, submit() raises QueueFullError.
+    """
+
+    def __init__(self, num_workers=2, max_queue=32, max_batch_size=8, max_wait_ms=50, max_batch_clip_seconds=30):
+        self.num_workers = num_workers
+        self.max_batch_size = max_batch_size
+        self.max_batch_clip_seconds = min(max_batch_clip_seconds, 30)  # one Whisper window
+        self._batch_seconds = 1.0  # moving average of the time a batch takes
+        self._batcher = MicroBatcher(
+            self._process_batch,
+            max_batch_size=max_batch_size,
+            max_wait_ms=max_wait_ms,
+            num_workers=num_workers,
+            max_queue=max_queue,
+            name="transcription-scheduler",
+        )
+
+    def submit(self, audio, language="en", model_size="small", on_segment=None):
+        """
+        Queue decoded audio for transcription
+
+        Args:
+            audio (numpy.ndarray): float32 16 kHz PCM samples
+            language (str): Language code for transcription (e.g., 'en', 'vi', 'ja')
+            model_size (str): Size of the Whisper model to use
+            on_segment (callable, optional): Called with each segment as soon as it is decoded
+
+        Returns:
+            concurrent.futures.Future: Resolves to (segments, info) with segments as a list
+
+        Raises:
+            QueueFullError: If too many requests are already waiting
+        """
+        language = validate_language(language)
+        model_size = validate_model_size(model_size)
+        batchable = language is not None and len(audio) / WHISPER_SAMPLING_RATE <= self.max_batch_clip_seconds
+        return self._batcher.submit((model_size, language, batchable), TranscriptionJob(audio, on_segment))
+
+    def queue_depth(self):
+        return self._batcher.queue_depth()
+
+    def retry_after(self):
+        """Estimated seconds until the queue has room again"""
+        batches_ahead = self.queue_depth() / max(1, self.num_workers * self.max_batch_size)
+        return max(1, int(round(batches_ahead * self._batch_seconds)) + 1)
+
+    def _process_batch(self, key, jobs):
+        model_size, language, batchable = key
+        started = time.monotonic()
+        try:
+            with inference_executor.slot("stt"), stage("generate", "stt"):
+                results = [None] * len(jobs)
+                if batchable and len(jobs) > 1:
+                    try:
+                        self._transcribe_batched(model_size, language, jobs, results)
+                        return results
+                    except Exception as e:
+                        # Fall back to decoding one by one the clips whose segments were not delivered yet
+                        print(f"Warning: Batched transcription failed, retrying clips individually: {e}")
+                return [
+                    result if result is not None else self._transcribe_single(model_size, language, job)
+                    for result, job in zip(results, jobs)
+                ]
+        finally:
+            elapsed = time.monotonic() - started
+            self._batch_seconds = 0.8 * self._batch_seconds + 0.2 * elapsed
+
+    def _transcribe_single(self, model_size, language, job):
+        try:
+            segments, info = transcribe_audio(audio_path=job.audio, model_size=model_size, language=language)
+            collected = []
+            for segment in segments:
+                collected.append(segment)
+                if job.on_segment:
+                    job.on_segment(segment)
+            return collected, info
+        except Exception as e:
+            return e
+
+    def _transcribe_batched(self, model_size, language, jobs, results):
+        """
+        Decode the clips in one batched pass, filling `results` with each clip's
+        (segments, info) once all of its segments are known. A clip's segments
+        are passed to its on_segment callback at that point too, so if the pass
+        fails partway the clips left as None can be decoded again without
+        delivering any segment twice.
+        """
+        from faster_whisper import BatchedInferencePipeline
+        from faster_whisper.vad import SpeechTimestampsMap, VadOptions, get_speech_timestamps
+
+        model = whisper_pool.get(model_size, "int8")
+        pipeline = BatchedInferencePipeline(model=model)
+
+        # The pipeline skips its own VAD when given clip timestamps, so run the
+        # same VAD as transcribe_audio on each clip and batch only its speech
+        vad_options = VadOptions(**VAD_PARAMETERS)
+        offsets = []
+        speech_maps = []
+        clip_timestamps = []
+        speech = []
+        position = 0
+        for job in jobs:
+            chunks = get_speech_timestamps(job.audio, vad_options)
+            speech_audio = np.concatenate([job.audio[c["start"]:c["end"]] for c in chunks]) if chunks else job.audio[:0]
+            offsets.append(position / WHISPER_SAMPLING_RATE)
+            speech_maps.append(SpeechTimestampsMap(chunks, WHISPER_SAMPLING_RATE) if chunks else None)
+            if len(speech_audio):
+                clip_timestamps.append({
+                    "start": position / WHISPER_SAMPLING_RATE,
+                    "end": (position + len(speech_audio)) / WHISPER_SAMPLING_RATE,
+                })
+            speech.append(speech_audio)
+            position += len(speech_audio)
+
+        collected = [[] for _ in jobs]
+        info_language, info_probability = language, 1.0
+
+        def finish(index):
+            job = jobs[index]
+            if job.on_segment:
+                for segment in collected[index]:
+                    job.on_segment(segment)
+            results[index] = (collected[index], ClipInfo(info_language, info_probability, len(job.audio) / WHISPER_SAMPLING_RATE))
+
+        finished = 0
+        if clip_timestamps:
+            segments, info = pipeline.transcribe(
+                np.concatenate(speech).astype(np.float32),
+                language=language,
+                task="transcribe",
+                beam_size=5,
+                clip_timestamps=clip_timestamps,
+                batch_size=len(clip_timestamps),
+            )
+            info_language, info_probability = info.language, info.language_probability
+
+            # Give each segment back to the clip it came from, in that clip's original timeline.
+            # Segments arrive in clip order, so a segment of a later clip completes the earlier ones.
+            for segment in segments:
+                index = max(i for i, offset in enumerate(offsets) if offset <= segment.start + 1e-3 and len(speech[i]))
+                while finished < index:
+                    finish(finished)
+                    finished += 1
+                speech_map = speech_maps[index]
+                segment = dataclasses.replace(
+                    segment,
+                    start=speech_map.get_original_time(segment.start - offsets[index]),
+                    end=speech_map.get_original_time(segment.end - offsets[index], is_end=True),
+                )
+                collected[index].append(segment)
+
+        while finished < len(jobs):
+            finish(finished)
+            finished += 1
+        return results
+
+
+transcription_scheduler = TranscriptionScheduler(
+    num_workers=int(os.getenv("STT_WORKERS", os.getenv("WHISPER_NUM_WORKERS", "2"))),
+    max_queue=int(os.getenv("STT_MAX_QUEUE", "32")),
+    max_batch_size=int(os.getenv("STT_MAX_BATCH_SIZE", "8")),
+    max_wait_ms=float(os.getenv("STT_MAX_WAIT_MS", "50")),
+    max_batch_clip_seconds=float(os.getenv("STT_BATCH_MAX_CLIP_SECONDS", "30")),
+)
+
+def iter_scheduled_transcription_events(audio, language="en", model_size="small"):
+    """
+    Schedule a transcription and return an iterator of its events: each segment
+    as soon as it is decoded, then a summary once decoding is finished.
+
+    The request is queued immediately, so QueueFullError is raised here rather
+    than while iterating.
+
+    Yields:
+        dict: {"type": "segment", ...} per segment, then {"type": "done", ...}
+    """
+    segment_queue = queue.Queue()
+    future = transcription_scheduler.submit(audio, language, model_size, on_segment=segment_queue.put)
+    future.add_done_callback(lambda _: segment_queue.put(None))
+
+    def generate():
+        texts = []
+        while True:
+            segment = segment_queue.get()
+            if segment is None:
+                break
+            text = segment.text.strip()
+            texts.append(text)
+            yield {"type": "segment", "start": segment.start, "end": segment.end, "text": text}
+
+        _, info = future.result()
+        yield {
+            "type": "done",
+            "language": info.language,
+            "language_probability": info.language_probability,
+            "full_text": " ".join(texts).strip(),
+            "success": True
+        }
+
+    return generate()
 
 if __name__ == "__main__":
     try:
@@ -1,19 +1,42 @@
-import json
-from openai import OpenAI
+import asyncio
 import os
-from huggingface_hub import InferenceClient
-from dotenv import load_dotenv
-from tts_service import TextToSpeechService
+import re
+import threading
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from conversation_store import conversation_store, new_session_id
+from inference_executor import INTERACTIVE, priority_scope
+from model_provider import get_tts_service
+from metrics import log_event, stage
+from upstream_clients import get_async_openrouter_client, get_openrouter_client
 
+TALKING_MODEL = "gpt-4o"
 
-load_dotenv()
+# Sentences of a streamed reply synthesized at the same time
+TALKING_TTS_WORKERS = int(os.getenv("TALKING_TTS_WORKERS", "2"))
 
-client = OpenAI(
-  base_url="https://openrouter.ai/api/v1",
-  api_key=os.getenv("OPENROUTER_API_KEY"),
-)
+# End of a sentence: terminal punctuation (and closing quotes) followed by whitespace, or a line break
+SENTENCE_END_PATTERN = re.compile(r"""[.!?…。！？]+["'”’)]*\s+|\n+""")
 
-def talkingService(message, language, topic):
+_tts_executor = None
+_tts_executor_lock = threading.Lock()
+
+def _completion_params(language, prompt, stream=False):
+    return dict(
+        stream=stream,
+        model=TALKING_MODEL,
+        messages=[
+            {"role": "system", "content": f"You are a helpful assistant that speaks {language} and helps users practice {language}. Keep responses concise and helpful."},
+            {"role": "user", "content": prompt}
+        ],
+        max_tokens=150,
+        temperature=0.7,
+        top_p=1,
+        frequency_penalty=0,
+        presence_penalty=0
+    )
+
+def talkingService(message, language, topic, session_id=None):
     """
     Creates a bot that maintains conversation history and returns the message with audio.
     
@@ -21,24 +44,174 @@ def talkingService(message, language, topic):
         message (str): The user's message
         language (str): The language to respond in
         topic (str): The topic of the conversation
+        session_id (str): Conversation to continue; a new one is started if omitted
     
     Returns:
-        dict: JSON response containing the message and audio URL
+        dict: JSON response containing the message, audio URL and session id
     """
-    # For this implementation, we'll maintain conversation history in memory
-    # In a production environment, you'd want to store this in a database
-    if not hasattr(talkingService, 'conversation_history'):
-        talkingService.conversation_history = []
+    session_id = session_id or new_session_id()
+    prompt = _start_turn(session_id, message, language, topic)
     
-    # Add the user's message to the conversation history
-    talkingService.conversation_history.append({"role": "user", "content": message})
-    
-    # Limit conversation history to last 10 exchanges to prevent context overflow
-    if len(talkingService.conversation_history) > 10:
-        talkingService.conversation_history = talkingService.conversation_history[-10:]
+    # Get AI response
+    with stage("upstream", "openrouter"):
+        response = get_openrouter_client().chat.completions.create(**_completion_params(language, prompt))
     
-    # Prepare the prompt with conversation history
-    conversation_text = "\n".join([f"{item['role'].capitalize()}: {item['content']}" for item in talkingService.conversation_history])
+    return _finish_turn(session_id, response.choices[0].message.content.strip())
+
+async def atalkingService(message, language, topic, session_id=None):
+    """
+    Async version of talkingService: the LLM round trip waits on the event loop
+    and speech synthesis runs in a worker thread.
+    """
+    session_id = session_id or new_session_id()
+    prompt = await asyncio.to_thread(_start_turn, session_id, message, language, topic)
+
+    with stage("upstream", "openrouter"):
+        response = await get_async_openrouter_client().chat.completions.create(**_completion_params(language, prompt))
+
+    return await asyncio.to_thread(_finish_turn, session_id, response.choices[0].message.content.strip())
+
+def split_sentences(text):
+    """
+    Cut streamed text at sentence boundaries
+
+    Returns:
+        tuple: (list of complete sentences, unfinished remainder)
+    """
+    sentences = []
+    start = 0
+    for match in SENTENCE_END_PATTERN.finditer(text):
+        sentence = text[start:match.end()].strip()
+        if sentence:
+            sentences.append(sentence)
+        start = match.end()
+    return sentences, text[start:]
+
+def _get_tts_executor():
+    global _tts_executor
+    # Created once, even when the first requests arrive together
+    with _tts_executor_lock:
+        if _tts_executor is None:
+            _tts_executor = ThreadPoolExecutor(max_workers=TALKING_TTS_WORKERS, thread_name_prefix="talking-tts")
+        return _tts_executor
+
+def _speak(text):
+    # A learner is waiting on this audio, so it goes ahead of bulk model work
+    with priority_scope(INTERACTIVE):
+        return get_tts_service().generate_speech_file(text)
+
+def _sentence_event(index, text, audio_filename):
+    return {"type": "sentence", "index": index, "text": text, "audio": audio_filename}
+
+def iter_talking_events(message, language, topic, session_id=None):
+    """
+    Streaming version of talkingService. Completion tokens are cut into
+    sentences as they arrive and each sentence is synthesized while the rest
+    of the reply is still being generated.
+
+    Yields:
+        dict: `delta` events with new reply text, `sentence` events with a
+            sentence and its audio file (in reply order), then a `done` event
+            with the full message and the session id
+    """
+    session_id = session_id or new_session_id()
+    prompt = _start_turn(session_id, message, language, topic)
+    executor = _get_tts_executor()
+
+    pending = deque()
+    index = 0
+    reply = ""
+    buffer = ""
+
+    def synthesize(sentence):
+        nonlocal index
+        pending.append((index, sentence, executor.submit(_speak, sentence)))
+        index += 1
+
+    def finished_sentences(wait=False):
+        while pending and (wait or pending[0][2].done()):
+            sentence_index, sentence, future = pending.popleft()
+            yield _sentence_event(sentence_index, sentence, future.result())
+
+    with stage("upstream", "openrouter"):
+        stream = get_openrouter_client().chat.completions.create(**_completion_params(language, prompt, stream=True))
+        try:
+            for chunk in stream:
+                delta = chunk.choices[0].delta.content if chunk.choices else None
+                if not delta:
+                    continue
+                reply += delta
+                yield {"type": "delta", "text": delta}
+
+                sentences, buffer = split_sentences(buffer + delta)
+                for sentence in sentences:
+                    synthesize(sentence)
+                yield from finished_sentences()
+        finally:
+            stream.close()
+
+    if buffer.strip():
+        synthesize(buffer.strip())
+    yield from finished_sentences(wait=True)
+
+    reply = reply.strip()
+    conversation_store.append(session_id, "assistant", reply)
+    yield {"type": "done", "message": reply, "session_id": session_id}
+
+async def aiter_talking_events(message, language, topic, session_id=None):
+    """
+    Async version of iter_talking_events: tokens are read on the event loop and
+    sentences are synthesized in worker threads
+    """
+    session_id = session_id or new_session_id()
+    prompt = await asyncio.to_thread(_start_turn, session_id, message, language, topic)
+    executor = _get_tts_executor()
+    loop = asyncio.get_running_loop()
+
+    pending = deque()
+    index = 0
+    reply = ""
+    buffer = ""
+
+    def synthesize(sentence):
+        nonlocal index
+        pending.append((index, sentence, loop.run_in_executor(executor, _speak, sentence)))
+        index += 1
+
+    with stage("upstream", "openrouter"):
+        stream = await get_async_openrouter_client().chat.completions.create(**_completion_params(language, prompt, stream=True))
+        try:
+            async for chunk in stream:
+                delta = chunk.choices[0].delta.content if chunk.choices else None
+                if not delta:
+                    continue
+                reply += delta
+                yield {"type": "delta", "text": delta}
+
+                sentences, buffer = split_sentences(buffer + delta)
+                for sentence in sentences:
+                    synthesize(sentence)
+                while pending and pending[0][2].done():
+                    sentence_index, sentence, future = pending.popleft()
+                    yield _sentence_event(sentence_index, sentence, future.result())
+        finally:
+            await stream.close()
+
+    if buffer.strip():
+        synthesize(buffer.strip())
+    while pending:
+        sentence_index, sentence, future = pending.popleft()
+        yield _sentence_event(sentence_index, sentence, await future)
+
+    reply = reply.strip()
+    await asyncio.to_thread(conversation_store.append, session_id, "assistant", reply)
+    yield {"type": "done", "message": reply, "session_id": session_id}
+
+def _start_turn(session_id, message, language, topic):
+    """Record the user's message and build the prompt for the next reply"""
+    # The store keeps the last messages of each session, already rendered as transcript lines
+    conversation_store.append(session_id, "user", message)
+    conversation_text = conversation_store.transcript(session_id)
     
     prompt = f"""
     You are an AI that engages in conversations with users to help them practice {language}.
@@ -51,37 +224,23 @@ def talkingService(message, language, topic):
     
     Respond to the user's last message in the conversation above, keeping in mind the topic: {topic}
     """
-    
-    # Get AI response
-    response = client.chat.completions.create(
-        model="gpt-4o",
-        messages=[
-            {"role": "system", "content": f"You are a helpful assistant that speaks {language} and helps users practice {language}. Keep responses concise and helpful."},
-            {"role": "user", "content": prompt}
-        ],
-        max_tokens=150,
-        temperature=0.7,
-        top_p=1,
-        frequency_penalty=0,
-        presence_penalty=0
-    )
-    
-    ai_response = response.choices[0].message.content.strip()
-    
+    return prompt
+
+def _finish_turn(session_id, ai_response):
+    """Record the AI's reply and synthesize its audio"""
     # Add the AI's response to the conversation history
-    talkingService.conversation_history.append({"role": "assistant", "content": ai_response})
+    conversation_store.append(session_id, "assistant", ai_response)
     
-    # Generate audio for the AI response using TTS service
-    tts_service = TextToSpeechService()
-    audio_filename = tts_service.generate_speech_file(ai_response)
+    # Generate audio for the AI response using the shared TTS service
+    audio_filename = _speak(ai_response)
 
-    print(f"Generated audio file: {audio_filename}")
-    print(f"AI response: {ai_response}")
+    log_event("talking_reply", session_id=session_id, audio=audio_filename, reply_chars=len(ai_response))
 
     # Return JSON response with message and audio
     return {
         "message": ai_response,
-        "audio": audio_filename
+        "audio": audio_filename,
+        "session_id": session_id
     }
 
 # while(True):
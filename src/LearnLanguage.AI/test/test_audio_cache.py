@@ -0,0 +1,64 @@
+#!/usr/bin/env python3
+"""
+Test script for the content-addressed TTS audio cache
+"""
+import sys
+import os
+import tempfile
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from audio_cache import AudioCache
+
+
+def write_entry(cache, key, size):
+    filename, path = cache.path_for(key)
+    with open(path, "wb") as f:
+        f.write(b"\0" * size)
+    cache.put(key, filename)
+    return filename
+
+
+def test_audio_cache():
+    with tempfile.TemporaryDirectory() as audio_dir:
+        cache = AudioCache(audio_dir, max_bytes=250)
+
+        assert cache.get("a" * 64) is None
+        write_entry(cache, "a" * 64, 100)
+        write_entry(cache, "b" * 64, 100)
+        assert cache.get("a" * 64) == f"{'a' * 64}.wav"
+
+        # "b" is now the least recently used entry and is evicted first
+        write_entry(cache, "c" * 64, 100)
+        assert cache.get("b" * 64) is None
+        assert not os.path.exists(os.path.join(audio_dir, f"{'b' * 64}.wav"))
+
+        stats = cache.stats()
+        assert stats["hits"] == 1 and stats["misses"] == 2 and stats["evictions"] == 1
+        assert stats["entries"] == 2 and stats["bytes"] == 200
+
+        # The index survives a restart
+        reloaded = AudioCache(audio_dir, max_bytes=250)
+        assert reloaded.get("c" * 64) == f"{'c' * 64}.wav"
+
+    with tempfile.TemporaryDirectory() as audio_dir:
+        # Audio not written by the cache (legacy uuid names) is never indexed or evicted
+        legacy = os.path.join(audio_dir, "12345678-1234-1234-1234-123456789abc.wav")
+        with open(legacy, "wb") as f:
+            f.write(b"\0" * 1000)
+
+        # Two workers share one index and one size budget, and see each other's files
+        first = AudioCache(audio_dir, max_bytes=250)
+        second = AudioCache(audio_dir, max_bytes=250)
+        write_entry(first, "a" * 64, 100)
+        write_entry(second, "b" * 64, 100)
+        assert first.get("b" * 64) == f"{'b' * 64}.wav"
+        write_entry(second, "c" * 64, 100)
+        assert second.get("a" * 64) is None
+        assert first.stats()["entries"] == 2 and second.stats()["bytes"] == 200
+        assert os.path.exists(legacy)
+        assert not [name for name in os.listdir(audio_dir) if name.endswith(".tmp")]
+
+    print("Audio cache tests completed.")
+
+if __name__ == "__main__":
+    test_audio_cache()
@@ -0,0 +1,42 @@
+#!/usr/bin/env python3
+"""
+Test script for the speech output encodings
+"""
+import sys
+import os
+import io
+import numpy as np
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from audio_codecs import UnsupportedAudioFormatError, available_audio_formats, encode_audio, negotiate_audio_format
+
+
+def test_audio_codecs():
+    waveform = (np.sin(np.arange(16000) * 2 * np.pi * 440 / 16000) * 0.5).astype(np.float32)
+
+    # WAV output is 16-bit PCM
+    wav = encode_audio(waveform, 16000, "wav")
+    assert wav[:4] == b"RIFF" and len(wav) == 44 + 2 * len(waveform)
+
+    # Explicit formats win; otherwise the best acceptable audio type of the Accept header
+    assert negotiate_audio_format("application/json", None, "wav") == "wav"
+    assert negotiate_audio_format("audio/wav", "wav") == "wav"
+    try:
+        negotiate_audio_format(None, "flac")
+        assert False, "expected UnsupportedAudioFormatError"
+    except UnsupportedAudioFormatError:
+        pass
+
+    if "ogg" in available_audio_formats():
+        assert negotiate_audio_format("audio/wav;q=0.5, audio/ogg") == "ogg"
+        ogg = encode_audio(waveform, 16000, "ogg")
+        assert ogg[:4] == b"OggS" and len(ogg) < len(wav) // 4
+
+        from faster_whisper import decode_audio
+        assert abs(len(decode_audio(io.BytesIO(ogg))) - len(waveform)) < 1600
+
+    print("Audio codecs test passed")
+
+
+if __name__ == "__main__":
+    test_audio_codecs()
@@ -0,0 +1,46 @@
+#!/usr/bin/env python3
+"""
+Test script for the benchmark suite's upstream stub and latency summary
+"""
+import sys
+import os
+import json
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.append(os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "benchmarks"))
+
+from question_generator import build_question_prompt, build_questions_prompt
+from question_parser import QUESTION_SCHEMAS, validate_question
+from run_benchmarks import load_corpus, summarize
+from stub_upstream import StubUpstream
+
+
+def test_benchmark():
+    stub = StubUpstream(latency_ms=0, chunk_delay_ms=0)
+
+    def reply(prompt):
+        return json.loads(stub.completion_text({"messages": [{"role": "user", "content": prompt}]}))
+
+    # Stubbed quizzes must pass the same validation as real ones
+    for qtype in QUESTION_SCHEMAS:
+        quiz = reply(build_question_prompt("ticket", qtype, "travel"))
+        validate_question(quiz, qtype)
+        assert quiz["word"] == "ticket" and quiz["topic"] == "travel"
+
+        quizzes = reply(build_questions_prompt(["ticket", None, "train"], qtype))
+        for quiz in quizzes:
+            validate_question(quiz, qtype)
+        assert [quizzes[0]["word"], quizzes[2]["word"]] == ["ticket", "train"]
+    stub.stop()
+
+    summary = summarize([0.01 * i for i in range(1, 101)], wall_seconds=2.0, errors=["TimeoutError: slow"])
+    assert summary["calls"] == 101 and summary["errors"] == 1
+    assert summary["throughput_per_s"] == 50.0
+    assert abs(summary["p50_ms"] - 505) < 1e-6 and summary["p99_ms"] > summary["p95_ms"] > summary["p50_ms"]
+
+    corpus = load_corpus()
+    assert len(corpus["words"]) == 50 and len(corpus["sentences"]) == 10 and len(corpus["clips"]) == 6
+
+    print("Benchmark tests completed.")
+
+if __name__ == "__main__":
+    test_benchmark()
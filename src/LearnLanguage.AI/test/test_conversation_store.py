@@ -0,0 +1,53 @@
+#!/usr/bin/env python3
+"""
+Test script for the per-session conversation store
+"""
+import sys
+import os
+import tempfile
+import time
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from conversation_store import MemoryConversationStore, SqliteConversationStore
+
+
+def test_conversation_store():
+    with tempfile.TemporaryDirectory() as cache_dir:
+        stores = [
+            MemoryConversationStore(max_messages=3, max_bytes=40),
+            SqliteConversationStore(os.path.join(cache_dir, "conversations.sqlite3"), max_messages=3),
+        ]
+        for store in stores:
+            # Sessions do not see each other's messages, and keep only their last messages
+            for i in range(4):
+                store.append("alice", "user", f"a{i}")
+            store.append("bob", "user", "hello")
+            assert store.transcript("alice") == "User: a1\nUser: a2\nUser: a3"
+            assert store.transcript("bob") == "User: hello"
+            assert store.transcript("carol") == ""
+
+            store.clear("bob")
+            assert store.transcript("bob") == ""
+
+        # Over the memory budget, the least recently used session is dropped
+        memory = stores[0]
+        memory.append("bob", "assistant", "x" * 20)
+        assert memory.transcript("alice") == ""
+        assert memory.transcript("bob") == "Assistant: " + "x" * 20
+        assert memory.stats()["evictions"] == 1
+
+        # A message to an idle-expired session starts a new history
+        for store in (
+            MemoryConversationStore(ttl_seconds=0.05),
+            SqliteConversationStore(os.path.join(cache_dir, "expiring.sqlite3"), ttl_seconds=0.05),
+        ):
+            store.append("dave", "user", "old")
+            time.sleep(0.1)
+            store.append("dave", "user", "new")
+            assert store.transcript("dave") == "User: new"
+
+    print("Conversation store test passed")
+
+
+if __name__ == "__main__":
+    test_conversation_store()
@@ -0,0 +1,76 @@
+#!/usr/bin/env python3
+"""
+Test script for the inference executor's slots and priority classes
+"""
+import sys
+import os
+import threading
+import time
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from inference_executor import BULK, INTERACTIVE, InferencePool, current_priority, priority_scope
+from micro_batcher import MicroBatcher
+
+
+def test_inference_executor():
+    pool = InferencePool("tts", slots=1, threads=1)
+    order = []
+    running = 0
+    max_running = 0
+    lock = threading.Lock()
+
+    def infer(name, priority):
+        nonlocal running, max_running
+        with pool.slot(priority):
+            with lock:
+                running += 1
+                max_running = max(max_running, running)
+            order.append(name)
+            time.sleep(0.02)
+            with lock:
+                running -= 1
+
+    # Hold the only slot while a bulk and then an interactive request queue up
+    with pool.slot(BULK):
+        threads = [threading.Thread(target=infer, args=("bulk", BULK))]
+        threads[0].start()
+        while pool.stats()["queue_depth"] < 1:
+            time.sleep(0.001)
+        threads.append(threading.Thread(target=infer, args=("interactive", INTERACTIVE)))
+        threads[1].start()
+        while pool.stats()["queue_depth"] < 2:
+            time.sleep(0.001)
+        assert pool.stats()["waiting"] == {"interactive": 1, "default": 0, "bulk": 1}
+    for thread in threads:
+        thread.join(5)
+
+    assert order == ["interactive", "bulk"]
+    assert max_running == 1
+    assert pool.stats()["completed"] == 3 and pool.stats()["active"] == 0
+
+    # The batcher serves the ready key holding the most urgent item first,
+    # and runs it with that item's priority
+    batches = []
+    release = threading.Event()
+
+    def process_batch(key, items):
+        release.wait(5)
+        batches.append((key, current_priority()))
+        return items
+
+    batcher = MicroBatcher(process_batch, max_batch_size=4, max_wait_ms=1)
+    first = batcher.submit("warmup", 0)
+    time.sleep(0.05)
+    bulk = batcher.submit("bulk", 1, priority=BULK)
+    with priority_scope(INTERACTIVE):
+        interactive = batcher.submit("interactive", 2)
+    time.sleep(0.05)
+    release.set()
+    assert [f.result(5) for f in (first, bulk, interactive)] == [0, 1, 2]
+    assert [key for key, _ in batches] == ["warmup", "interactive", "bulk"]
+    assert batches[1][1] == INTERACTIVE and batches[2][1] == BULK
+
+    print("Inference executor tests completed.")
+
+if __name__ == "__main__":
+    test_inference_executor()
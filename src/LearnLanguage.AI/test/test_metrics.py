@@ -0,0 +1,57 @@
+#!/usr/bin/env python3
+"""
+Test script for the Prometheus metrics and request traces
+"""
+import sys
+import os
+import asyncio
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from metrics import MetricsRegistry, current_trace_id, finish_request, stage, start_request
+
+
+def test_metrics():
+    registry = MetricsRegistry(prefix="test")
+    latency = registry.histogram("latency_seconds", "Latency", ("route",), buckets=(0.1, 1.0))
+    errors = registry.counter("errors", "Errors", ("type",))
+    registry.gauge_callback("queue_depth", "Depth", lambda: [({"queue": "stt"}, 3)])
+
+    latency.observe(0.05, route="/a")
+    latency.observe(0.5, route="/a")
+    latency.observe(5, route="/a")
+    errors.inc(type='Key"Error')
+
+    text = registry.render()
+    assert "# TYPE test_latency_seconds histogram" in text
+    assert 'test_latency_seconds_bucket{route="/a",le="0.1"} 1' in text
+    assert 'test_latency_seconds_bucket{route="/a",le="1.0"} 2' in text
+    assert 'test_latency_seconds_bucket{route="/a",le="+Inf"} 3' in text
+    assert 'test_latency_seconds_count{route="/a"} 3' in text
+    assert 'test_errors_total{type="Key\\"Error"} 1' in text
+    assert 'test_queue_depth{queue="stt"} 3' in text
+
+    # Stages are added to the trace of the request they run in, including
+    # work handed to a thread with asyncio.to_thread
+    async def handle():
+        trace = start_request("/talking-service", "POST", "trace-1")
+        with stage("upstream", "openrouter"):
+            await asyncio.sleep(0.01)
+
+        def synthesize():
+            assert current_trace_id() == "trace-1"
+            with stage("generate", "tts"):
+                pass
+
+        await asyncio.to_thread(synthesize)
+        finish_request(trace, 200)
+        return trace
+
+    trace = asyncio.run(handle())
+    assert set(trace.stages) == {"openrouter.upstream", "tts.generate"}
+    assert trace.stages["openrouter.upstream"] >= 0.01
+    assert current_trace_id() is None
+
+    print("Metrics tests completed.")
+
+if __name__ == "__main__":
+    test_metrics()
@@ -0,0 +1,61 @@
+#!/usr/bin/env python3
+"""
+Test script for the micro-batcher used by the translation service
+"""
+import sys
+import os
+import threading
+import time
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from micro_batcher import MicroBatcher
+
+
+def test_micro_batcher():
+    batches = []
+    release = threading.Event()
+
+    def process_batch(key, items):
+        release.wait(5)
+        batches.append((key, list(items)))
+        return [f"{key}:{item}" for item in items]
+
+    batcher = MicroBatcher(process_batch, max_batch_size=4, max_wait_ms=50)
+
+    # The first item occupies the worker; the others queue up and are merged
+    first = batcher.submit("en-vi", "dog")
+    futures = [batcher.submit("en-vi", word) for word in ["cat", "bird", "fish", "cow", "pig"]]
+    other = batcher.submit("en-fr", "cat")
+    release.set()
+
+    assert first.result(5) == "en-vi:dog"
+    assert [f.result(5) for f in futures] == ["en-vi:cat", "en-vi:bird", "en-vi:fish", "en-vi:cow", "en-vi:pig"]
+    assert other.result(5) == "en-fr:cat"
+    assert all(len(items) <= 4 for _, items in batches)
+    assert len(batches) < 7
+
+    # A slow key holds one worker at most: other keys are served meanwhile,
+    # and its own items wait and are merged into one batch
+    slow_release = threading.Event()
+    slow_batches = []
+
+    def process_slowly(key, items):
+        if key == "en-ja":
+            slow_release.wait(5)
+        slow_batches.append((key, list(items)))
+        return list(items)
+
+    batcher = MicroBatcher(process_slowly, max_batch_size=8, max_wait_ms=1, num_workers=2, max_in_flight_per_key=1)
+    loading = batcher.submit("en-ja", "dog")
+    time.sleep(0.05)
+    waiting = [batcher.submit("en-ja", word) for word in ["cat", "bird"]]
+    assert batcher.submit("en-vi", "fish").result(5) == "fish"
+    assert not loading.done()
+    slow_release.set()
+    assert [f.result(5) for f in waiting] == ["cat", "bird"]
+    assert slow_batches[1:] == [("en-ja", ["dog"]), ("en-ja", ["cat", "bird"])]
+
+    print("Micro-batcher tests completed.")
+
+if __name__ == "__main__":
+    test_micro_batcher()
@@ -0,0 +1,84 @@
+#!/usr/bin/env python3
+"""
+Test script for the pre-generated question bank
+"""
+import sys
+import os
+import tempfile
+import time
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from question_bank import QuestionBank, is_similar_question
+
+
+def fake_generator():
+    calls = []
+
+    def generate(word=None, qtype=None, topic=None, previous_question=None, language_in="English", language_out="Vietnamese"):
+        calls.append(previous_question)
+        n = len(calls)
+        return {"question_type": qtype, "question": f"Question {n} about {word} number{n}", "answer": "a", "options": ["a", "b", "c", "d"]}
+
+    return generate, calls
+
+
+def test_question_bank():
+    assert is_similar_question("What does apple mean?", "what does apple mean")
+    assert not is_similar_question("What does apple mean?", "Translate the word banana")
+
+    with tempfile.TemporaryDirectory() as cache_dir:
+        generate, calls = fake_generator()
+        bank = QuestionBank(os.path.join(cache_dir, "bank.sqlite3"), generate=generate, low_watermark=2, target_size=4)
+
+        # An empty bucket is answered on the spot and refilled in the background
+        first = bank.get_question(word="apple", qtype="multiple_choice")
+        assert first["question_type"] == "multiple_choice"
+        bucket = bank.bucket_key("apple", "multiple_choice", None, "English", "Vietnamese")
+        deadline = time.time() + 5
+        while bank.count(bucket) < 4 and time.time() < deadline:
+            time.sleep(0.01)
+        assert bank.count(bucket) == 4
+
+        # Banked questions are served once, skipping the learner's previous question
+        generated = len(calls)
+        second = bank.take(bucket, previous_question="Question 2 about apple number2")
+        assert second["question"] == "Question 3 about apple number3"
+        assert bank.take(bucket)["question"] == "Question 2 about apple number2"
+        assert len(calls) == generated
+
+        stats = bank.stats()
+        assert stats["misses"] == 1
+
+        # No background refill of a bucket runs while a request generates for it
+        sync_calls = []
+        pear = bank.bucket_key("pear", "multiple_choice", None, "English", "Vietnamese")
+
+        def generate_while_refilling(**params):
+            sync_calls.append(pear in bank._refilling)
+            return generate(**params)
+
+        bank.generate = generate_while_refilling
+        bank.get_question(word="pear", qtype="multiple_choice")
+        assert sync_calls[0] is False
+
+        # An upstream error stops the refill at once and pauses further refills
+        failing_calls = []
+
+        def failing(**params):
+            failing_calls.append(params)
+            return {"error": "429 Too Many Requests", "error_type": "upstream"}
+
+        failing_bank = QuestionBank(os.path.join(cache_dir, "failing.sqlite3"), generate=failing, target_size=4, backoff_seconds=60)
+        failing_bucket = failing_bank.bucket_key("kiwi", "multiple_choice", None, "English", "Vietnamese")
+        params = dict(word="kiwi", qtype="multiple_choice", topic=None, language_in="English", language_out="Vietnamese")
+        failing_bank.refill(failing_bucket, params)
+        assert len(failing_calls) == 1
+        assert failing_bank.stats()["refills_paused"]
+        failing_bank.schedule_refill(failing_bucket, **params)
+        assert failing_bank.stats()["refills_pending"] == 0
+
+    print("Question bank test passed")
+
+
+if __name__ == "__main__":
+    test_question_bank()
@@ -0,0 +1,54 @@
+#!/usr/bin/env python3
+"""
+Test script for regenerating the invalid items of a batch of quizzes
+"""
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import question_generator
+from question_parser import QuestionFormatError
+
+
+def quiz(word, question):
+    return {"topic": None, "word": word, "question_type": "multiple_choice", "question": question,
+            "answer": "a", "options": ["a", "b", "c", "d"]}
+
+
+def test_question_generator():
+    originals = question_generator._stream_questions, question_generator.generate_question
+    prompts = []
+
+    def stream_questions(prompt, qtype, count):
+        # The pear item is for the wrong word and the plum item is malformed
+        return [quiz("apple", "Which word means apple?"), quiz("grape", "Which word means grape?"), QuestionFormatError("bad")]
+
+    def generate_question(word=None, qtype=None, topic=None, previous_question=None, language_in="English", language_out="Vietnamese"):
+        prompts.append((word, list(previous_question)))
+        if word == "pear" and sum(1 for w, _ in prompts if w == "pear") == 1:
+            # A repeat of an accepted question is not accepted either
+            return quiz("pear", "Which word means apple?")
+        if word == "plum":
+            return {"error": "429 Too Many Requests", "error_type": "upstream"}
+        return quiz(word, f"Pick the meaning of {word}")
+
+    question_generator._stream_questions = stream_questions
+    question_generator.generate_question = generate_question
+    try:
+        results = question_generator.generate_questions(["apple", "pear", "plum"], "multiple_choice", previous_questions=["Old question"])
+    finally:
+        question_generator._stream_questions, question_generator.generate_question = originals
+
+    assert results[0]["question"] == "Which word means apple?"
+    assert results[1]["question"] == "Pick the meaning of pear"
+    assert results[2]["error_type"] == "upstream"
+
+    # Retries see every question accepted so far, not only the last previous one,
+    # and a failed generation is not retried
+    assert [word for word, _ in prompts].count("pear") == 2 and [word for word, _ in prompts].count("plum") == 1
+    assert all(avoid[:2] == ["Old question", "Which word means apple?"] for _, avoid in prompts)
+
+    print("Question generator tests completed.")
+
+if __name__ == "__main__":
+    test_question_generator()
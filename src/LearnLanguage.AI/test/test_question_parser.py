@@ -0,0 +1,73 @@
+#!/usr/bin/env python3
+"""
+Test script for the streaming quiz parser
+"""
+import sys
+import os
+import json
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from question_parser import IncrementalQuestionParser, QuestionFormatError, QuestionListParser
+
+
+def feed_in_chunks(parser, text, size=5):
+    for i in range(0, len(text), size):
+        result = parser.feed(text[i:i + size])
+        if result is not None:
+            return result, i + size
+    return None, len(text)
+
+
+def test_question_parser():
+    question = {
+        "topic": None,
+        "word": "house",
+        "question_type": "match",
+        "question": "Match the words {with} their \"meanings\"",
+        "answer": [{"home": "nhà"}, {"door": "cửa"}],
+        "options": {"English": ["home", "door"], "Vietnamese": ["nhà", "cửa"]},
+    }
+
+    # A fenced completion is parsed as soon as the object closes
+    text = "```json\n" + json.dumps(question, ensure_ascii=False) + "\n```\nHope this helps!"
+    result, consumed = feed_in_chunks(IncrementalQuestionParser("match"), text)
+    assert result == question
+    assert consumed < len(text)
+
+    # A wrong question type is rejected before the rest of the object arrives
+    text = json.dumps({"question_type": "translation", **{k: v for k, v in question.items() if k != "question_type"}})
+    try:
+        feed_in_chunks(IncrementalQuestionParser("match"), text)
+        assert False, "expected QuestionFormatError"
+    except QuestionFormatError:
+        pass
+
+    # Prose instead of JSON is rejected within the first few characters
+    parser = IncrementalQuestionParser("multiple_choice")
+    try:
+        parser.feed("Sure! Here is")
+        assert False, "expected QuestionFormatError"
+    except QuestionFormatError:
+        pass
+
+    # An answer missing from the options fails the multiple_choice schema
+    bad = {"question_type": "multiple_choice", "question": "Pick one", "answer": "x", "options": ["a", "b", "c", "d"]}
+    try:
+        IncrementalQuestionParser("multiple_choice").feed(json.dumps(bad))
+        assert False, "expected QuestionFormatError"
+    except QuestionFormatError:
+        pass
+
+    # Array items are validated one by one; a bad item does not fail its neighbours
+    good = {"question_type": "multiple_choice", "question": "Pick one", "answer": "a", "options": ["a", "b", "c", "d"]}
+    parser = QuestionListParser("multiple_choice", max_items=3)
+    assert parser.feed(json.dumps([good, bad, good]))
+    items = parser.finish()
+    assert items[0] == good and items[2] == good
+    assert isinstance(items[1], QuestionFormatError)
+
+    print("Question parser test passed")
+
+
+if __name__ == "__main__":
+    test_question_parser()
@@ -0,0 +1,92 @@
+#!/usr/bin/env python3
+"""
+Test script for sentence similarity
+"""
+import sys
+import os
+import threading
+from collections import OrderedDict
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ["SIMILARITY_BACKEND"] = "local"
+
+import numpy as np
+import torch
+from model_provider import provider
+from similarity_service import SentenceEmbeddingEngine, compare_sentences, similarity_matrix, top_k
+
+
+class FakeTokenizer:
+    """Maps each word to an id and pads, like a Hugging Face tokenizer"""
+
+    def __init__(self):
+        self.vocab = {}
+
+    def __call__(self, sentences, padding=True, truncation=True, max_length=128, return_tensors="pt"):
+        ids = [[self.vocab.setdefault(word.lower().strip(".,!?"), len(self.vocab) + 1) for word in s.split()] for s in sentences]
+        width = max(len(row) for row in ids)
+        return {
+            "input_ids": torch.tensor([row + [0] * (width - len(row)) for row in ids]),
+            "attention_mask": torch.tensor([[1] * len(row) + [0] * (width - len(row)) for row in ids]),
+        }
+
+
+class FakeModel:
+    """One fixed random vector per word id, so sentences sharing words score higher"""
+
+    def __init__(self):
+        torch.manual_seed(0)
+        self.embeddings = torch.nn.Embedding(1000, 16)
+        self.encoded = []
+
+    def __call__(self, input_ids, attention_mask):
+        self.encoded.append(len(input_ids))
+        return type("Output", (), {"last_hidden_state": self.embeddings(input_ids)})
+
+
+class FakeEngine(SentenceEmbeddingEngine):
+    def __init__(self, cache_size=50000, batch_size=32):
+        # The real engine's pooling, caching and scoring, without loading a model
+        self.tokenizer = FakeTokenizer()
+        self.model = FakeModel()
+        self.cache_size = cache_size
+        self.batch_size = batch_size
+        self.hits = 0
+        self.misses = 0
+        self._cache = OrderedDict()
+        self._lock = threading.Lock()
+
+
+def test_similarity():
+    engine = FakeEngine(cache_size=4, batch_size=2)
+    provider.set("similarity", engine)
+
+    # Identical sentences score 1, sentences sharing words score above unrelated ones
+    assert abs(compare_sentences("I like dogs", "I  like dogs") - 1.0) < 1e-5
+    close = compare_sentences("I like dogs", "I like cats")
+    far = compare_sentences("I like dogs", "The weather is cold")
+    assert -1.0 <= far < close < 1.0
+
+    # Repeated sentences come from the LRU instead of the model
+    encoded = sum(engine.model.encoded)
+    first = engine.embed(["I like cats"])
+    assert sum(engine.model.encoded) == encoded
+    assert np.array_equal(first, engine.embed(["I like cats"]))
+    assert engine.stats()["hits"] >= 2
+
+    # Only the cache_size most recently used sentences are kept
+    assert engine.stats()["entries"] == 3
+    engine.embed(["A new sentence", "Another one"])
+    assert engine.stats()["entries"] == 4
+    assert "I like dogs" not in engine._cache and "I like cats" in engine._cache
+
+    # Every reference against every candidate, and candidates ranked best first
+    scores = similarity_matrix(["I like dogs", "The weather is cold"], ["I like cats", "Cold weather today", "I like dogs"])
+    assert scores.shape == (2, 3)
+    assert top_k(scores[0], 2) == [2, 0]
+    assert top_k(scores[1], 1) == [1]
+
+    provider.reset("similarity")
+    print("Similarity tests completed.")
+
+if __name__ == "__main__":
+    test_similarity()
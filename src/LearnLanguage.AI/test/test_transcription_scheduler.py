@@ -0,0 +1,96 @@
+#!/usr/bin/env python3
+"""
+Test script for the batched transcription scheduler's fallback
+"""
+import sys
+import os
+import dataclasses
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import numpy as np
+import scipy.io.wavfile
+import faster_whisper
+from faster_whisper.transcribe import Segment, TranscriptionInfo
+import stt_service
+from stt_service import TranscriptionJob, TranscriptionScheduler, WhisperModelPool
+
+CLIP_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "benchmarks", "corpus", "clips")
+
+
+def make_segment(start, end, text):
+    fields = {field.name: None for field in dataclasses.fields(Segment)}
+    return Segment(**{**fields, "id": 0, "start": start, "end": end, "text": text})
+
+
+def make_info():
+    fields = {field.name: None for field in dataclasses.fields(TranscriptionInfo)}
+    return TranscriptionInfo(**{**fields, "language": "en", "language_probability": 1.0})
+
+
+class FakeWhisperModel:
+    def __init__(self, model_size, **kwargs):
+        self.decode_options = []
+
+    def transcribe(self, audio, **options):
+        self.decode_options.append(options)
+        return iter([make_segment(0.0, 0.5, f"single {len(audio)}")]), make_info()
+
+
+class FailingPipeline:
+    calls = []
+
+    def __init__(self, model):
+        pass
+
+    def transcribe(self, audio, clip_timestamps=None, **options):
+        FailingPipeline.calls.append(clip_timestamps)
+
+        def segments():
+            # The first clip decodes, then the pass fails during the second one
+            yield make_segment(clip_timestamps[0]["start"], clip_timestamps[0]["start"] + 0.5, "batched first")
+            yield make_segment(clip_timestamps[1]["start"], clip_timestamps[1]["start"] + 0.5, "batched second")
+            raise RuntimeError("decoder failed")
+
+        return segments(), make_info()
+
+
+def read_clip(name):
+    _, samples = scipy.io.wavfile.read(os.path.join(CLIP_DIR, name))
+    return samples.astype(np.float32) / 32768
+
+
+def test_transcription_scheduler():
+    originals = faster_whisper.WhisperModel, faster_whisper.BatchedInferencePipeline, stt_service.whisper_pool
+    faster_whisper.WhisperModel = FakeWhisperModel
+    faster_whisper.BatchedInferencePipeline = FailingPipeline
+    stt_service.whisper_pool = WhisperModelPool(cpu_threads=1, num_workers=1, idle_ttl=0)
+
+    try:
+        scheduler = TranscriptionScheduler(num_workers=1, max_batch_size=3)
+        delivered = [[] for _ in range(3)]
+        jobs = [
+            TranscriptionJob(read_clip(name), delivered[i].append)
+            for i, name in enumerate(["short_1.wav", "medium_1.wav", "short_2.wav"])
+        ]
+        results = scheduler._process_batch(("small", "en", True), jobs)
+
+        # The batched pass got one clip per request, of speech only
+        assert len(FailingPipeline.calls[0]) == 3
+
+        # The first clip keeps its batched result; the clip that failed midway
+        # and the one never reached are decoded again, and no segment is delivered twice
+        assert [s.text for s in delivered[0]] == ["batched first"]
+        assert [s.text for s in delivered[1]] == [f"single {len(jobs[1].audio)}"]
+        assert [s.text for s in delivered[2]] == [f"single {len(jobs[2].audio)}"]
+        assert [segments for segments, _ in results] == delivered
+
+        # Single clips use the same voice activity detection as the batched pass
+        model = stt_service.whisper_pool.get("small", "int8")
+        assert all(options["vad_filter"] and options["vad_parameters"] == stt_service.VAD_PARAMETERS for options in model.decode_options)
+    finally:
+        faster_whisper.WhisperModel, faster_whisper.BatchedInferencePipeline, stt_service.whisper_pool = originals
+
+    print("Transcription scheduler tests completed.")
+
+if __name__ == "__main__":
+    test_transcription_scheduler()
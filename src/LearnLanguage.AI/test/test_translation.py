@@ -6,10 +6,17 @@ import sys
 import os
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
-from translation_service import translate_word
+from translation_service import TranslationRoute, route_cache_model, translate_word
 
 def test_translation():
     print("Testing translation functionality...")
+
+    # Cached translations are keyed by the models that produced them and their precision
+    direct = TranslationRoute("direct", [("de", "vi", "Helsinki-NLP/opus-mt-de-vi")])
+    pivot = TranslationRoute("pivot", [("de", "en", "Helsinki-NLP/opus-mt-de-en"), ("en", "vi", "Helsinki-NLP/opus-mt-en-vi")])
+    assert route_cache_model(direct, "fp32") == "Helsinki-NLP/opus-mt-de-vi@fp32"
+    assert route_cache_model(direct, "int8") != route_cache_model(direct, "fp32")
+    assert route_cache_model(pivot, "fp32") == "Helsinki-NLP/opus-mt-de-en+Helsinki-NLP/opus-mt-en-vi@fp32"
     
     # Test cases - note that T5 model expects full language names
     test_cases = [
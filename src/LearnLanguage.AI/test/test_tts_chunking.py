@@ -0,0 +1,30 @@
+#!/usr/bin/env python3
+"""
+Test script for sentence chunking and crossfading of synthesized speech
+"""
+import sys
+import os
+import numpy as np
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from tts_service import crossfade_concat, split_text_for_synthesis
+
+
+def test_tts_chunking():
+    # Short sentences are packed together, long ones are cut at clauses and words
+    chunks = split_text_for_synthesis("Hi. How are you? " + "I like apples, " * 10 + "and pears.", max_chars=40)
+    assert chunks[0] == "Hi. How are you?"
+    assert all(len(chunk) <= 40 for chunk in chunks)
+    assert " ".join(chunks).split() == ("Hi. How are you? " + "I like apples, " * 10 + "and pears.").split()
+
+    # Consecutive waveforms overlap by the crossfade length
+    joined = crossfade_concat([np.ones(100), np.zeros(50)], crossfade_samples=10)
+    assert len(joined) == 140
+    assert joined[0] == 1.0 and joined[-1] == 0.0
+    assert np.all(np.diff(joined[88:102]) <= 0)
+
+    print("TTS chunking test passed")
+
+
+if __name__ == "__main__":
+    test_tts_chunking()
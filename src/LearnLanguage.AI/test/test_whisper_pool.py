@@ -0,0 +1,59 @@
+#!/usr/bin/env python3
+"""
+Test script for the shared Whisper model pool
+"""
+import sys
+import os
+import time
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import faster_whisper
+from stt_service import WhisperModelPool
+
+
+class FakeWhisperModel:
+    loads = 0
+
+    def __init__(self, model_size, **kwargs):
+        FakeWhisperModel.loads += 1
+        self.model_size = model_size
+        self.kwargs = kwargs
+
+
+def test_whisper_pool():
+    # The pool imports WhisperModel when it loads a model
+    original = faster_whisper.WhisperModel
+    faster_whisper.WhisperModel = FakeWhisperModel
+    FakeWhisperModel.loads = 0
+
+    try:
+        pool = WhisperModelPool(cpu_threads=4, num_workers=2, memory_budget_mb=600, idle_ttl=0)
+
+        # Same size/compute type is loaded once and shared
+        first = pool.get("small", "int8")
+        second = pool.get("small", "int8")
+        assert first is second
+        assert FakeWhisperModel.loads == 1
+        assert first.kwargs["cpu_threads"] == 4 and first.kwargs["num_workers"] == 2
+
+        # Loading another size over the budget evicts the least recently used one
+        pool.get("base", "int8")
+        assert [m["model_size"] for m in pool.loaded_models()] == ["base"]
+
+        pool.get("small", "int8")
+        assert FakeWhisperModel.loads == 3
+
+        # Idle models are released in the background, without another request
+        idle_pool = WhisperModelPool(idle_ttl=0.05)
+        idle_pool.get("tiny", "int8")
+        deadline = time.time() + 5
+        while idle_pool.loaded_models() and time.time() < deadline:
+            time.sleep(0.01)
+        assert idle_pool.loaded_models() == []
+    finally:
+        faster_whisper.WhisperModel = original
+
+    print("Whisper pool tests completed.")
+
+if __name__ == "__main__":
+    test_whisper_pool()
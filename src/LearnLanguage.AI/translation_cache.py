@@ -0,0 +1,197 @@
+import argparse
+import os
+import sqlite3
+import threading
+import time
+import unicodedata
+from collections import OrderedDict
+
+DEFAULT_CACHE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "cache", "translations.sqlite3")
+
+
+def normalize_word(word):
+    """Normalize a word so that trivially different inputs share a cache entry"""
+    return " ".join(unicodedata.normalize("NFC", word).split())
+
+
+class TranslationCache:
+    """
+    Two-tier cache of translation results.
+
+    Lookups go to an in-process LRU first, then to a SQLite file that survives
+    restarts and can be shared by several worker processes. Entries are keyed by
+    (normalized word, source code, target code, model name).
+    """
+
+    def __init__(self, path=DEFAULT_CACHE_PATH, memory_size=10000):
+        self.path = path
+        self.memory_size = memory_size
+        self.memory_hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self._memory = OrderedDict()
+        self._lock = threading.Lock()
+        self._local = threading.local()
+
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        with self._connection() as conn:
+            conn.execute(
+                """
+                CREATE TABLE IF NOT EXISTS translations (
+                    word TEXT NOT NULL,
+                    src_lang TEXT NOT NULL,
+                    tgt_lang TEXT NOT NULL,
+                    model TEXT NOT NULL,
+                    translation TEXT NOT NULL,
+                    created_at REAL NOT NULL,
+                    PRIMARY KEY (word, src_lang, tgt_lang, model)
+                )
+                """
+            )
+
+    def _connection(self):
+        # sqlite3 connections cannot be shared between threads (or forked processes)
+        conn = getattr(self._local, "conn", None)
+        if conn is None or self._local.pid != os.getpid():
+            conn = sqlite3.connect(self.path, timeout=10)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+            self._local.pid = os.getpid()
+        return conn
+
+    def _remember(self, key, translation):
+        with self._lock:
+            self._memory[key] = translation
+            self._memory.move_to_end(key)
+            while len(self._memory) > self.memory_size:
+                self._memory.popitem(last=False)
+
+    def get_many(self, words, src_lang, tgt_lang, model):
+        """
+        Look up several words at once
+
+        Args:
+            words (list): Words to look up
+            src_lang (str): Source language code
+            tgt_lang (str): Target language code
+            model (str): Name of the model that produced the translations
+
+        Returns:
+            dict: word -> translation for every word found in the cache
+        """
+        found = {}
+        disk_lookup = {}
+
+        with self._lock:
+            for word in words:
+                key = (normalize_word(word), src_lang, tgt_lang, model)
+                if key in self._memory:
+                    self._memory.move_to_end(key)
+                    found[word] = self._memory[key]
+                    self.memory_hits += 1
+                else:
+                    disk_lookup.setdefault(key[0], []).append(word)
+
+        if disk_lookup:
+            normalized = list(disk_lookup)
+            placeholders = ",".join("?" * len(normalized))
+            rows = self._connection().execute(
+                f"SELECT word, translation FROM translations "
+                f"WHERE src_lang = ? AND tgt_lang = ? AND model = ? AND word IN ({placeholders})",
+                [src_lang, tgt_lang, model, *normalized],
+            ).fetchall()
+
+            for normalized_word, translation in rows:
+                self._remember((normalized_word, src_lang, tgt_lang, model), translation)
+                for word in disk_lookup.pop(normalized_word):
+                    found[word] = translation
+
+            with self._lock:
+                self.disk_hits += len(rows)
+                self.misses += len(disk_lookup)
+
+        return found
+
+    def put_many(self, translations, src_lang, tgt_lang, model):
+        """
+        Store translations in both tiers
+
+        Args:
+            translations (dict): word -> translation
+            src_lang (str): Source language code
+            tgt_lang (str): Target language code
+            model (str): Name of the model that produced the translations
+        """
+        now = time.time()
+        rows = []
+        for word, translation in translations.items():
+            key = (normalize_word(word), src_lang, tgt_lang, model)
+            self._remember(key, translation)
+            rows.append((*key, translation, now))
+
+        conn = self._connection()
+        with conn:
+            conn.executemany(
+                "INSERT OR REPLACE INTO translations (word, src_lang, tgt_lang, model, translation, created_at) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                rows,
+            )
+
+    def stats(self):
+        """
+        Returns:
+            dict: Hit/miss counters and the number of stored entries
+        """
+        disk_entries = self._connection().execute("SELECT COUNT(*) FROM translations").fetchone()[0]
+        with self._lock:
+            lookups = self.memory_hits + self.disk_hits + self.misses
+            return {
+                "memory_hits": self.memory_hits,
+                "disk_hits": self.disk_hits,
+                "misses": self.misses,
+                "hit_rate": round((self.memory_hits + self.disk_hits) / lookups, 4) if lookups else 0.0,
+                "memory_entries": len(self._memory),
+                "disk_entries": disk_entries,
+            }
+
+
+def read_word_list(path):
+    """Read one word per line, skipping blank lines and '#' comments"""
+    with open(path, "r", encoding="utf-8") as f:
+        words = [line.strip() for line in f]
+    return [word for word in words if word and not word.startswith("#")]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Manage the persistent translation cache")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    warm = subparsers.add_parser("warm", help="Pre-populate the cache from a word list")
+    warm.add_argument("word_list", help="File with one word per line")
+    warm.add_argument("--src", default="en", help="Source language code (default: en)")
+    warm.add_argument("--tgt", action="append", required=True, help="Target language code, can be repeated")
+
+    subparsers.add_parser("stats", help="Show cache statistics")
+
+    args = parser.parse_args()
+
+    # Imported here so that `stats` does not load torch/transformers
+    if args.command == "warm":
+        from inference_executor import BULK, priority_scope
+        from translation_service import TRANSLATE_MAX_BATCH_SIZE, translate_words
+
+        words = read_word_list(args.word_list)
+        for tgt in args.tgt:
+            started = time.perf_counter()
+            for start in range(0, len(words), TRANSLATE_MAX_BATCH_SIZE):
+                with priority_scope(BULK):
+                    translate_words(words[start:start + TRANSLATE_MAX_BATCH_SIZE], args.src, tgt)
+            print(f"{args.src}->{tgt}: {len(words)} words in {time.perf_counter() - started:.1f}s")
+    else:
+        cache = TranslationCache(os.getenv("TRANSLATION_CACHE_PATH", DEFAULT_CACHE_PATH))
+        print(cache.stats())
+
+
+if __name__ == "__main__":
+    main()
@@ -1,6 +1,31 @@
-from transformers import MarianMTModel, MarianTokenizer
-from functools import lru_cache
+from collections import OrderedDict
+import os
 import re
+import threading
+import time
+from micro_batcher import MicroBatcher
+from inference_executor import inference_executor
+from metrics import log_event, stage
+from translation_cache import DEFAULT_CACHE_PATH, TranslationCache
+
+# Largest number of inputs sent through a single generate() call
+TRANSLATE_MAX_BATCH_SIZE = int(os.getenv("TRANSLATE_MAX_BATCH_SIZE", "32"))
+
+# How long a single-word request may wait for others to share its batch
+TRANSLATE_MAX_WAIT_MS = float(os.getenv("TRANSLATE_MAX_WAIT_MS", "10"))
+
+# Batches translated at the same time; each language pair uses at most one
+# worker, so a cold model load or slow batch for one pair does not hold up the others
+TRANSLATE_WORKERS = int(os.getenv("TRANSLATE_WORKERS", "4"))
+
+# Memory budget for resident MarianMT models (a full-precision model is roughly 300 MB)
+TRANSLATION_MODEL_MEMORY_MB = int(os.getenv("TRANSLATION_MODEL_MEMORY_MB", "2048"))
+
+# Weight precision of loaded MarianMT models: fp32, int8 (dynamic quantization), fp16 or bf16
+TRANSLATION_MODEL_PRECISION = os.getenv("TRANSLATION_MODEL_PRECISION", "fp32").lower()
+
+# How long a failed route lookup is remembered before the models are probed again
+TRANSLATION_ROUTE_NEGATIVE_TTL = float(os.getenv("TRANSLATION_ROUTE_NEGATIVE_TTL", "3600"))
 
 LANGUAGE_CODE_MAP = {
     "English": "en",
@@ -32,84 +57,407 @@ LANGUAGE_CODE_MAP = {
 # Reverse mapping for language codes to names
 REVERSE_LANGUAGE_CODE_MAP = {v: k for k, v in LANGUAGE_CODE_MAP.items()}
 
-@lru_cache(maxsize=128)
-def get_tokenizer_and_model(src_lang_code, tgt_lang_code):
+MODEL_NAME_TEMPLATE = "Helsinki-NLP/opus-mt-{src}-{tgt}"
+
+# Results survive restarts, so common vocabulary is only ever translated once
+translation_cache = TranslationCache(
+    path=os.getenv("TRANSLATION_CACHE_PATH", DEFAULT_CACHE_PATH),
+    memory_size=int(os.getenv("TRANSLATION_CACHE_SIZE", "10000")),
+)
+
+def _tensor_bytes(value):
+    import torch
+
+    if isinstance(value, torch.Tensor):
+        return value.numel() * value.element_size()
+    if isinstance(value, (tuple, list)):
+        # Dynamically quantized Linear layers store (weight, bias) tuples
+        return sum(_tensor_bytes(item) for item in value)
+    return 0
+
+def model_memory_bytes(model):
+    """Size of the model weights and buffers as held in memory"""
+    return sum(_tensor_bytes(value) for value in model.state_dict().values())
+
+class MarianModelCache:
     """
-    Load the MarianMT model and tokenizer for specific language pair.
-    MarianMT models are specifically designed for translation tasks.
+    Least-recently-used cache of MarianMT models bounded by memory rather than
+    by entry count. Models can be loaded with int8 dynamic quantization or
+    half precision to fit more language pairs in the same budget.
     """
-    model_name = f"Helsinki-NLP/opus-mt-{src_lang_code}-{tgt_lang_code}"
-    try:
+
+    PRECISIONS = ("fp32", "int8", "fp16", "bf16")
+
+    def __init__(self, max_bytes, precision="fp32"):
+        if precision not in self.PRECISIONS:
+            log_event("translation_precision_unknown", precision=precision, using="fp32")
+            precision = "fp32"
+        self.max_bytes = max_bytes
+        self.precision = precision
+        self.hits = 0
+        self.loads = 0
+        self.evictions = 0
+        self._models = OrderedDict()  # model_name -> {"tokenizer", "model", "bytes", "last_used"}
+        self._lock = threading.Lock()
+        self._load_locks = {}
+
+    def _load(self, model_name):
+        # Imported on first load so that importing this module stays cheap
+        import torch
+        from transformers import MarianMTModel, MarianTokenizer
+
         tokenizer = MarianTokenizer.from_pretrained(model_name)
         model = MarianMTModel.from_pretrained(model_name)
+        model.eval()
+
+        if self.precision == "int8":
+            model = torch.ao.quantization.quantize_dynamic(model, {torch.nn.Linear}, dtype=torch.qint8)
+        elif self.precision == "fp16":
+            model = model.to(torch.float16)
+        elif self.precision == "bf16":
+            model = model.to(torch.bfloat16)
         return tokenizer, model
-    except Exception as e:
-        # If specific model doesn't exist, try a multilingual model
-        try:
-            model_name = f"Helsinki-NLP/opus-mt-{src_lang_code}-mul"
-            tokenizer = MarianTokenizer.from_pretrained(model_name)
-            model = MarianMTModel.from_pretrained(model_name)
+
+    def get(self, model_name):
+        """
+        Return (tokenizer, model) for a model name, loading it on first use
+
+        Raises:
+            Exception: If the model cannot be loaded
+        """
+        with self._lock:
+            entry = self._models.get(model_name)
+            if entry is not None:
+                entry["last_used"] = time.time()
+                self._models.move_to_end(model_name)
+                self.hits += 1
+                return entry["tokenizer"], entry["model"]
+            load_lock = self._load_locks.setdefault(model_name, threading.Lock())
+
+        with load_lock:
+            with self._lock:
+                entry = self._models.get(model_name)
+                if entry is not None:
+                    self.hits += 1
+                    return entry["tokenizer"], entry["model"]
+
+            with stage("model_load", "mt"):
+                tokenizer, model = self._load(model_name)
+
+            with self._lock:
+                self._models[model_name] = {
+                    "tokenizer": tokenizer,
+                    "model": model,
+                    "bytes": model_memory_bytes(model),
+                    "last_used": time.time(),
+                }
+                self.loads += 1
+                self._evict_locked(keep=model_name)
             return tokenizer, model
-        except Exception:
-            # If that fails, try the reverse direction
-            try:
-                model_name = f"Helsinki-NLP/opus-mt-{tgt_lang_code}-{src_lang_code}"
-                tokenizer = MarianTokenizer.from_pretrained(model_name)
-                model = MarianMTModel.from_pretrained(model_name)
-                return tokenizer, model
-            except Exception:
-                raise Exception(f"No suitable translation model found for {src_lang_code} to {tgt_lang_code}")
 
-def translate_word(word, src_lang, tgt_lang):
+    def _evict_locked(self, keep=None):
+        while self._models and self.resident_bytes() > self.max_bytes:
+            model_name = next(iter(self._models))
+            if model_name == keep:
+                break
+            del self._models[model_name]
+            self.evictions += 1
+
+    def resident_bytes(self):
+        return sum(entry["bytes"] for entry in self._models.values())
+
+    def stats(self):
+        """
+        Returns:
+            dict: Resident models with their memory use, and cache counters
+        """
+        with self._lock:
+            return {
+                "precision": self.precision,
+                "max_bytes": self.max_bytes,
+                "resident_bytes": self.resident_bytes(),
+                "hits": self.hits,
+                "loads": self.loads,
+                "evictions": self.evictions,
+                "models": [
+                    {"model": model_name, "bytes": entry["bytes"], "last_used": entry["last_used"]}
+                    for model_name, entry in self._models.items()
+                ],
+            }
+
+translation_models = MarianModelCache(
+    max_bytes=TRANSLATION_MODEL_MEMORY_MB * 1024 * 1024,
+    precision=TRANSLATION_MODEL_PRECISION,
+)
+
+def load_model(model_name):
     """
-    Translate a word from source language to target language using MarianMT model.
+    Load a MarianMT model and its tokenizer by name.
+    MarianMT models are specifically designed for translation tasks.
+    """
+    return translation_models.get(model_name)
+
+class NoTranslationRouteError(Exception):
+    pass
+
+class TranslationRoute:
+    """
+    How a language pair is translated: `kind` is 'direct', 'mul' or 'pivot' and
+    `hops` lists the (src, tgt, model_name) steps in order.
+    """
+
+    def __init__(self, kind, hops):
+        self.kind = kind
+        self.hops = hops
+
+    def to_dict(self):
+        return {
+            "kind": self.kind,
+            "models": [model_name for _, _, model_name in self.hops],
+        }
+
+# model_name -> (available, checked_at)
+_model_availability = {}
+# (src, tgt) -> TranslationRoute or (NoTranslationRouteError, checked_at)
+_routes = {}
+_routes_lock = threading.Lock()
+
+def _model_exists(model_name):
+    """
+    Check whether a model exists from its metadata, without loading it
+
+    Raises:
+        Exception: If the Hub cannot be reached (the answer is unknown)
+    """
+    # Imported on first lookup so that importing this module stays cheap
+    from huggingface_hub import constants, get_hf_file_metadata, hf_hub_url, try_to_load_from_cache
+    from huggingface_hub.utils import EntryNotFoundError, RepositoryNotFoundError, RevisionNotFoundError
+
+    if isinstance(try_to_load_from_cache(model_name, "config.json"), str):
+        return True
+    if constants.HF_HUB_OFFLINE:
+        # Not downloaded, and it cannot be while offline
+        return False
+    try:
+        get_hf_file_metadata(hf_hub_url(model_name, "config.json"))
+        return True
+    except (RepositoryNotFoundError, EntryNotFoundError, RevisionNotFoundError):
+        return False
+
+def _is_model_available(model_name):
+    """
+    Whether a model exists. Only a definite "not found" is remembered (for
+    TRANSLATION_ROUTE_NEGATIVE_TTL); network or Hub errors propagate, so a
+    transient failure does not hide the model.
+    """
+    checked = _model_availability.get(model_name)
+    if checked is not None:
+        available, checked_at = checked
+        if available or time.monotonic() - checked_at < TRANSLATION_ROUTE_NEGATIVE_TTL:
+            return available
+
+    available = _model_exists(model_name)
+    _model_availability[model_name] = (available, time.monotonic())
+    return available
+
+def _resolve_hop(src_lang_code, tgt_lang_code):
+    """Find a single model for the pair: the direct one first, then the multilingual one"""
+    for kind, model_name in (
+        ("direct", MODEL_NAME_TEMPLATE.format(src=src_lang_code, tgt=tgt_lang_code)),
+        ("mul", MODEL_NAME_TEMPLATE.format(src=src_lang_code, tgt="mul")),
+    ):
+        if _is_model_available(model_name):
+            return kind, (src_lang_code, tgt_lang_code, model_name)
+    return None, None
+
+def _resolve_route(src_lang_code, tgt_lang_code):
+    kind, hop = _resolve_hop(src_lang_code, tgt_lang_code)
+    if hop is not None:
+        return TranslationRoute(kind, [hop])
+
+    # No single model for the pair: use English as a bridge
+    if src_lang_code != 'en' and tgt_lang_code != 'en':
+        _, first_hop = _resolve_hop(src_lang_code, 'en')
+        _, second_hop = _resolve_hop('en', tgt_lang_code)
+        if first_hop is not None and second_hop is not None:
+            return TranslationRoute("pivot", [first_hop, second_hop])
+
+    raise NoTranslationRouteError(f"No translation model available for {src_lang_code} to {tgt_lang_code}")
+
+def plan_route(src_lang_code, tgt_lang_code):
+    """
+    Decide once per language pair how to translate it (direct, mul or pivot).
+
+    The decision is memoized, including the absence of any route, so later
+    requests do not repeat failed model lookups.
+    """
+    key = (src_lang_code, tgt_lang_code)
+    route = _routes.get(key)
+    if isinstance(route, TranslationRoute):
+        return route
+
+    # Resolving is rare (once per pair), so a single lock is enough
+    with _routes_lock:
+        route = _routes.get(key)
+        if isinstance(route, TranslationRoute):
+            return route
+        if route is not None and time.monotonic() - route[1] < TRANSLATION_ROUTE_NEGATIVE_TTL:
+            raise route[0]
+
+        try:
+            route = _resolve_route(src_lang_code, tgt_lang_code)
+        except NoTranslationRouteError as e:
+            _routes[key] = (e, time.monotonic())
+            raise
+        _routes[key] = route
+        return route
+
+def route_cache_model(route, precision=None):
+    """
+    Identify how a route translates, for the translation cache: every model it
+    runs through, in order, and their weight precision
+
+    Returns:
+        str: e.g. "Helsinki-NLP/opus-mt-de-en+Helsinki-NLP/opus-mt-en-vi@int8"
+    """
+    models = "+".join(model_name for _, _, model_name in route.hops)
+    return f"{models}@{precision or translation_models.precision}"
+
+def get_tokenizer_and_model(src_lang_code, tgt_lang_code):
+    """
+    Load the MarianMT model and tokenizer for specific language pair.
+
+    Raises:
+        NoTranslationRouteError: If the pair can only be translated through a pivot
+    """
+    route = plan_route(src_lang_code, tgt_lang_code)
+    if route.kind == "pivot":
+        raise NoTranslationRouteError(f"No single translation model for {src_lang_code} to {tgt_lang_code}")
+    return load_model(route.hops[0][2])
+
+def generate_translations(tokenizer, model, texts):
+    """
+    Translate a list of texts with one padded generate() call per chunk of
+    TRANSLATE_MAX_BATCH_SIZE inputs.
+    """
+    import torch
+
+    results = []
+    for start in range(0, len(texts), TRANSLATE_MAX_BATCH_SIZE):
+        chunk = texts[start:start + TRANSLATE_MAX_BATCH_SIZE]
+        with stage("tokenize", "mt"):
+            inputs = tokenizer(chunk, return_tensors="pt", padding=True)
+        with inference_executor.slot("mt"), stage("generate", "mt"), torch.no_grad():
+            translated = model.generate(**inputs, max_length=20, num_beams=4)
+        results.extend(tokenizer.batch_decode(translated, skip_special_tokens=True))
+    return results
+
+def _translate_uncached(words, route):
+    """Run the words through every hop of the route, batching each hop"""
+    texts = words
+    hops = []
+    for src_lang_code, tgt_lang_code, model_name in route.hops:
+        started = time.perf_counter()
+        tokenizer, model = load_model(model_name)
+        texts = generate_translations(tokenizer, model, texts)
+        hops.append({
+            "src_lang": src_lang_code,
+            "tgt_lang": tgt_lang_code,
+            "model": model_name,
+            "latency_ms": round((time.perf_counter() - started) * 1000, 2),
+        })
+    return texts, hops
+
+def translate_words_with_route(words, src_lang, tgt_lang):
+    """
+    Translate a list of words and report how it was done.
+
+    Returns:
+        dict: "translations" (one per word), "route" (kind and models, None when the
+        languages match), "hops" (per-hop latency of the model calls) and "cache_hits"
     """
     try:
         # Convert language names to codes
         src_lang_code = LANGUAGE_CODE_MAP.get(src_lang, src_lang.lower())
         tgt_lang_code = LANGUAGE_CODE_MAP.get(tgt_lang, tgt_lang.lower())
         
-        # Special case: if source and target languages are the same, return the word as is
+        # Special case: if source and target languages are the same, return the words as is
         if src_lang_code == tgt_lang_code:
-            return word
-        
-        # Handle special case where model might not exist for specific language pair
-        # Try to find the best model available
-        try:
-            tokenizer, model = get_tokenizer_and_model(src_lang_code, tgt_lang_code)
-        except Exception:
-            # If the specific pair doesn't exist, try using a multilingual model
-            # or a common language as bridge (like English)
-            if src_lang_code != 'en' and tgt_lang_code != 'en':
-                # Try via English as bridge
-                tokenizer, model = get_tokenizer_and_model(src_lang_code, 'en')
-                # First translate to English
-                inputs = tokenizer(word, return_tensors="pt", padding=True)
-                translated = model.generate(**inputs, max_length=20, num_beams=4)
-                intermediate_text = tokenizer.decode(translated[0], skip_special_tokens=True)
-                
-                # Then translate from English to target
-                tokenizer2, model2 = get_tokenizer_and_model('en', tgt_lang_code)
-                inputs2 = tokenizer2(intermediate_text, return_tensors="pt", padding=True)
-                translated2 = model2.generate(**inputs2, max_length=20, num_beams=4)
-                tgt_text = tokenizer2.decode(translated2[0], skip_special_tokens=True)
-                return tgt_text
-            else:
-                raise Exception(f"No translation model available for {src_lang_code} to {tgt_lang_code}")
-        
-        # Tokenize the input
-        inputs = tokenizer(word, return_tensors="pt", padding=True)
-        
-        # Generate translation
-        translated = model.generate(**inputs, max_length=20, num_beams=4)
-        
-        # Decode the result
-        tgt_text = tokenizer.decode(translated[0], skip_special_tokens=True)
-        return tgt_text
+            return {"translations": list(words), "route": None, "hops": [], "cache_hits": 0}
+
+        unique_words = list(dict.fromkeys(words))
+
+        # Cached results are only reused for the same models and precision;
+        # the route is memoized, so only the first request for a pair resolves it
+        route = plan_route(src_lang_code, tgt_lang_code)
+        cache_model = route_cache_model(route)
+
+        translations = translation_cache.get_many(unique_words, src_lang_code, tgt_lang_code, cache_model)
+        missing = [word for word in unique_words if word not in translations]
+        cache_hits = len(unique_words) - len(missing)
+        hops = []
+
+        if missing:
+            new_texts, hops = _translate_uncached(missing, route)
+            new_translations = dict(zip(missing, new_texts))
+            translation_cache.put_many(new_translations, src_lang_code, tgt_lang_code, cache_model)
+            translations.update(new_translations)
+
+        return {
+            "translations": [translations[word] for word in words],
+            "route": route.to_dict(),
+            "hops": hops,
+            "cache_hits": cache_hits,
+        }
     except Exception as e:
-        print(f"Error translating '{word}' from {src_lang} to {tgt_lang}: {str(e)}")
+        log_event("translation_failed", src_lang=src_lang, tgt_lang=tgt_lang, words=len(words), error_type=type(e).__name__, error=str(e))
         raise e
 
+def translate_words(words, src_lang, tgt_lang):
+    """
+    Translate a list of words from source language to target language using MarianMT model.
+    Duplicate words are translated once and cached results skip the model entirely.
+    """
+    return translate_words_with_route(words, src_lang, tgt_lang)["translations"]
+
+def translate_word(word, src_lang, tgt_lang):
+    """
+    Translate a word from source language to target language using MarianMT model.
+    """
+    return translate_words([word], src_lang, tgt_lang)[0]
+
+def _translate_batch(lang_pair, words):
+    src_lang_code, tgt_lang_code = lang_pair
+    result = translate_words_with_route(words, src_lang_code, tgt_lang_code)
+    return [
+        {"translation": translation, "route": result["route"], "hops": result["hops"]}
+        for translation in result["translations"]
+    ]
+
+# Merges concurrent single-word requests for the same language pair into one generate() call
+translation_batcher = MicroBatcher(
+    _translate_batch,
+    max_batch_size=TRANSLATE_MAX_BATCH_SIZE,
+    max_wait_ms=TRANSLATE_MAX_WAIT_MS,
+    num_workers=TRANSLATE_WORKERS,
+    max_in_flight_per_key=1,
+    name="translation-batcher",
+)
+
+def translate_word_batched(word, src_lang, tgt_lang, timeout=None):
+    """
+    Translate a word through the micro-batcher, sharing the model call with
+    concurrent requests for the same language pair.
+
+    Returns:
+        dict: "translation", plus the "route" and "hops" of the batch it was part of
+    """
+    src_lang_code = LANGUAGE_CODE_MAP.get(src_lang, src_lang.lower())
+    tgt_lang_code = LANGUAGE_CODE_MAP.get(tgt_lang, tgt_lang.lower())
+    if src_lang_code == tgt_lang_code:
+        return {"translation": word, "route": None, "hops": []}
+    return translation_batcher.submit((src_lang_code, tgt_lang_code), word).result(timeout)
+
 # Example: Translate the word "dog" from English to Vietnamese
 if __name__ == "__main__":
     print(translate_word("dog", "English", "Vietnamese"))
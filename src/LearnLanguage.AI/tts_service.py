@@ -1,64 +1,234 @@
 import torch
-import scipy
-import io
 import os
+import re
 import uuid
+import hashlib
+import unicodedata
+import numpy as np
 from transformers import SpeechT5Processor, SpeechT5ForTextToSpeech, SpeechT5HifiGan
+from audio_cache import AUDIO_DIR, AudioCache
+from audio_codecs import TTS_AUDIO_FORMAT, encode_audio
+from micro_batcher import MicroBatcher
+from inference_executor import inference_executor
+from metrics import stage
+
+TTS_MODEL_NAME = "microsoft/speecht5_tts"
+VOCODER_MODEL_NAME = "microsoft/speecht5_hifigan"
+
+# Bump when anything that changes the generated audio changes (sampling rate, post-processing...)
+TTS_CACHE_VERSION = "3"
+
+TTS_SAMPLING_RATE = 16000
+
+# Longer texts are synthesized sentence by sentence; sentences above this length are cut further
+TTS_MAX_CHUNK_CHARS = int(os.getenv("TTS_MAX_CHUNK_CHARS", "200"))
+# Overlap between consecutive chunks, faded linearly from one to the next
+TTS_CROSSFADE_MS = int(os.getenv("TTS_CROSSFADE_MS", "30"))
+# Chunks (from any request) synthesized together in one batched generate_speech call
+TTS_MAX_BATCH_SIZE = int(os.getenv("TTS_MAX_BATCH_SIZE", "8"))
+TTS_MAX_WAIT_MS = int(os.getenv("TTS_MAX_WAIT_MS", "20"))
+TTS_WORKERS = int(os.getenv("TTS_WORKERS", "1"))
+
+_SENTENCE_PATTERN = re.compile(r"""[^.!?…]+(?:[.!?…]+["'”’)]*|$)""")
+_CLAUSE_PATTERN = re.compile(r"[^,;:]+(?:[,;:]|$)")
+
+
+def normalize_text(text: str) -> str:
+    """Normalize text so that trivially different inputs share a cache entry"""
+    return " ".join(unicodedata.normalize("NFC", text).split())
+
+
+def _pack(pieces, max_chars, separator=" "):
+    # Greedily join consecutive pieces while they fit in max_chars
+    chunks = []
+    for piece in pieces:
+        if chunks and len(chunks[-1]) + len(separator) + len(piece) <= max_chars:
+            chunks[-1] = f"{chunks[-1]}{separator}{piece}"
+        else:
+            chunks.append(piece)
+    return chunks
+
+
+def split_text_for_synthesis(text: str, max_chars: int = TTS_MAX_CHUNK_CHARS) -> list:
+    """
+    Split normalized text into chunks of whole sentences of at most max_chars.
+    Longer sentences are cut at clause punctuation, then between words.
+    """
+    chunks = []
+    for sentence in _SENTENCE_PATTERN.findall(text):
+        sentence = sentence.strip()
+        if not sentence:
+            continue
+        if len(sentence) <= max_chars:
+            chunks.append(sentence)
+            continue
+        for clause in _pack([c.strip() for c in _CLAUSE_PATTERN.findall(sentence) if c.strip()], max_chars):
+            chunks.extend(_pack(clause.split(), max_chars) if len(clause) > max_chars else [clause])
+    return _pack(chunks, max_chars)
+
+
+def crossfade_concat(waveforms: list, crossfade_samples: int) -> np.ndarray:
+    """
+    Concatenate waveforms, overlapping consecutive ones by crossfade_samples
+    with a linear fade so that chunk boundaries do not click
+    """
+    if not waveforms:
+        return np.zeros(0, dtype=np.float32)
+    output = np.asarray(waveforms[0], dtype=np.float32)
+    for waveform in waveforms[1:]:
+        waveform = np.asarray(waveform, dtype=np.float32)
+        n = min(crossfade_samples, len(output), len(waveform))
+        if n == 0:
+            output = np.concatenate([output, waveform])
+            continue
+        fade_in = np.linspace(0.0, 1.0, n, dtype=np.float32)
+        overlap = output[-n:] * (1.0 - fade_in) + waveform[:n] * fade_in
+        output = np.concatenate([output[:-n], overlap, waveform[n:]])
+    return output
 
 
 class TextToSpeechService:
     def __init__(self):
-        self.processor = SpeechT5Processor.from_pretrained("microsoft/speecht5_tts")
-        self.model = SpeechT5ForTextToSpeech.from_pretrained("microsoft/speecht5_tts")
-        self.vocoder = SpeechT5HifiGan.from_pretrained("microsoft/speecht5_hifigan")
+        self.processor = SpeechT5Processor.from_pretrained(TTS_MODEL_NAME)
+        self.model = SpeechT5ForTextToSpeech.from_pretrained(TTS_MODEL_NAME)
+        self.vocoder = SpeechT5HifiGan.from_pretrained(VOCODER_MODEL_NAME)
+        self.model_version = f"{TTS_MODEL_NAME}|{VOCODER_MODEL_NAME}|{TTS_CACHE_VERSION}"
         
-        # Set audio directory to AI/audio and ensure it exists
-        self.audio_dir = os.path.join(os.path.dirname(os.path.abspath(__file__)), "audio")
+        # Set audio directory (AI/audio unless AUDIO_DIR is set) and ensure it exists
+        self.audio_dir = AUDIO_DIR
         os.makedirs(self.audio_dir, exist_ok=True)
+
+        # Generated files are content-addressed so repeated texts skip inference
+        self.cache = AudioCache(
+            self.audio_dir,
+            max_bytes=int(os.getenv("TTS_CACHE_MAX_MB", "512")) * 1024 * 1024,
+            max_entries=int(os.getenv("TTS_CACHE_MAX_ENTRIES")) if os.getenv("TTS_CACHE_MAX_ENTRIES") else None,
+        )
+
+        # Sentence chunks of concurrent requests are synthesized together
+        self.batcher = MicroBatcher(
+            lambda _key, chunks: self.synthesize_batch(chunks),
+            max_batch_size=TTS_MAX_BATCH_SIZE,
+            max_wait_ms=TTS_MAX_WAIT_MS,
+            num_workers=TTS_WORKERS,
+            name="tts-batcher",
+        )
+
+    def cache_key(self, text: str, speaker_embeddings: torch.Tensor, audio_format: str = "wav") -> str:
+        """
+        Build the cache key of an utterance
+
+        Args:
+            text (str): Normalized text to synthesize
+            speaker_embeddings (torch.Tensor): Speaker embedding used for synthesis
+            audio_format (str): Encoding of the audio file
+
+        Returns:
+            str: sha256 hex digest of the text, speaker embedding, encoding and model version
+        """
+        digest = hashlib.sha256()
+        digest.update(self.model_version.encode("utf-8"))
+        digest.update(b"\0")
+        digest.update(audio_format.encode("utf-8"))
+        digest.update(b"\0")
+        digest.update(speaker_embeddings.detach().cpu().numpy().tobytes())
+        digest.update(b"\0")
+        digest.update(text.encode("utf-8"))
+        return digest.hexdigest()
         
-    def generate_speech(self, text: str) -> bytes:
-        inputs = self.processor(text=text, return_tensors="pt")
-        
+    def synthesize_batch(self, chunks: list) -> list:
+        """
+        Synthesize several text chunks in one batched pass: the spectrograms are
+        generated together and the vocoder runs on the padded batch
+
+        Args:
+            chunks (list): Texts to synthesize
+
+        Returns:
+            list: One float32 waveform (numpy array) per chunk
+        """
+        with stage("tokenize", "tts"):
+            inputs = self.processor(text=chunks, padding=True, return_tensors="pt")
+
         # Generate speaker embeddings
-        speaker_embeddings = torch.zeros((1, 512))
-        
-        # Generate speech
-        speech = self.model.generate_speech(inputs["input_ids"], speaker_embeddings, vocoder=self.vocoder)
+        speaker_embeddings = torch.zeros((len(chunks), 512))
+
+        with inference_executor.slot("tts"), torch.inference_mode():
+            with stage("generate", "tts"):
+                spectrograms, frame_counts = self.model.generate_speech(
+                    inputs["input_ids"],
+                    speaker_embeddings,
+                    attention_mask=inputs["attention_mask"],
+                    return_output_lengths=True
+                )
+            with stage("vocoder", "tts"):
+                waveforms = self.vocoder(spectrograms)
+        if waveforms.dim() == 1:
+            waveforms = waveforms.unsqueeze(0)
+
+        # The vocoder turns every spectrogram frame into the same number of samples
+        samples_per_frame = waveforms.size(1) // spectrograms.size(1)
+        return [waveforms[i, :frames * samples_per_frame].numpy() for i, frames in enumerate(frame_counts)]
+
+    def synthesize(self, text: str) -> np.ndarray:
+        """
+        Synthesize text of any length: it is split into sentence chunks that are
+        batched (with chunks of other requests) and joined with short crossfades
+
+        Args:
+            text (str): Normalized text to synthesize
+
+        Returns:
+            np.ndarray: float32 waveform at TTS_SAMPLING_RATE
+        """
+        futures = [self.batcher.submit("speecht5", chunk) for chunk in split_text_for_synthesis(text)]
+        waveforms = [future.result() for future in futures]
+        return crossfade_concat(waveforms, TTS_SAMPLING_RATE * TTS_CROSSFADE_MS // 1000)
+
+    def generate_speech(self, text: str, audio_format: str = TTS_AUDIO_FORMAT) -> bytes:
+        speech = self.synthesize(normalize_text(text))
         
         # Convert to bytes
-        buffer = io.BytesIO()
-        sampling_rate = 16000
-        scipy.io.wavfile.write(buffer, rate=sampling_rate, data=speech.numpy())
-        buffer.seek(0)
-        
-        return buffer.read()
+        with stage("encode", "tts"):
+            return encode_audio(speech, TTS_SAMPLING_RATE, audio_format)
     
-    def generate_speech_file(self, text: str) -> str:
+    def generate_speech_file(self, text: str, audio_format: str = TTS_AUDIO_FORMAT) -> str:
         """
         Generate speech from text and save to a file
         
         Args:
             text (str): The text to convert to speech
+            audio_format (str): Encoding of the file: wav, ogg or mp3
             
         Returns:
             str: The URL path to the generated audio file
         """
-        # Process the input text
-        inputs = self.processor(text=text, return_tensors="pt")
-        
+        text = normalize_text(text)
+
         # Generate speaker embeddings
         speaker_embeddings = torch.zeros((1, 512))
-        
+
+        # Reuse the existing file when this exact utterance was synthesized before
+        key = self.cache_key(text, speaker_embeddings, audio_format)
+        cached_filename = self.cache.get(key)
+        if cached_filename is not None:
+            return f"audio/{cached_filename}"
+
         # Generate speech
-        speech = self.model.generate_speech(inputs["input_ids"], speaker_embeddings, vocoder=self.vocoder)
+        speech = self.synthesize(text)
         
-        # Generate a unique filename
-        filename = f"{uuid.uuid4()}.wav"
-        filepath = os.path.join(self.audio_dir, filename)
+        # Write to a temporary name first so readers never see a partial file
+        filename, filepath = self.cache.path_for(key, ext=audio_format)
+        temp_filepath = f"{filepath}.{uuid.uuid4().hex}.tmp"
         
         # Save to file
-        sampling_rate = 16000
-        scipy.io.wavfile.write(filepath, rate=sampling_rate, data=speech.numpy())
+        with stage("encode", "tts"):
+            encoded = encode_audio(speech, TTS_SAMPLING_RATE, audio_format)
+        with stage("file_write", "tts"):
+            with open(temp_filepath, "wb") as f:
+                f.write(encoded)
+            os.replace(temp_filepath, filepath)
+        self.cache.put(key, filename)
         
         # Return just the path without the protocol
         return f"audio/{filename}"
\ No newline at end of file
@@ -0,0 +1,136 @@
+import asyncio
+import os
+import random
+import threading
+import time
+from dotenv import load_dotenv
+from huggingface_hub import AsyncInferenceClient, InferenceClient
+from openai import AsyncOpenAI, OpenAI
+
+load_dotenv()
+
+# Overridable to point the service at another OpenAI-compatible endpoint (e.g. the benchmark stub)
+OPENROUTER_BASE_URL = os.getenv("OPENROUTER_BASE_URL", "https://openrouter.ai/api/v1")
+
+# Per-request timeout and retry budget for every upstream call
+UPSTREAM_TIMEOUT_SECONDS = float(os.getenv("UPSTREAM_TIMEOUT_SECONDS", "60"))
+UPSTREAM_MAX_RETRIES = int(os.getenv("UPSTREAM_MAX_RETRIES", "2"))
+
+# Backoff between retries: a random delay in [0, min(max, base * 2^attempt)] ("full jitter")
+UPSTREAM_RETRY_BASE_DELAY = 0.5
+UPSTREAM_RETRY_MAX_DELAY = 8.0
+
+_clients = {}
+_clients_lock = threading.Lock()
+
+
+def _shared_client(key, factory):
+    client = _clients.get(key)
+    if client is None:
+        with _clients_lock:
+            client = _clients.get(key)
+            if client is None:
+                client = factory()
+                _clients[key] = client
+    return client
+
+
+def _async_key(name):
+    # Async clients hold a connection pool bound to the event loop that created it
+    return (name, id(asyncio.get_running_loop()))
+
+
+def get_openrouter_client():
+    """
+    Returns:
+        OpenAI: Shared OpenRouter client; its connection pool is reused across threads
+    """
+    return _shared_client("openrouter", lambda: OpenAI(
+        base_url=OPENROUTER_BASE_URL,
+        api_key=os.getenv("OPENROUTER_API_KEY"),
+        timeout=UPSTREAM_TIMEOUT_SECONDS,
+        max_retries=UPSTREAM_MAX_RETRIES,
+    ))
+
+
+def get_async_openrouter_client():
+    """
+    Returns:
+        AsyncOpenAI: OpenRouter client shared by every coroutine of the running event loop.
+        It keeps connections alive and retries failed requests with jittered backoff.
+    """
+    return _shared_client(_async_key("openrouter"), lambda: AsyncOpenAI(
+        base_url=OPENROUTER_BASE_URL,
+        api_key=os.getenv("OPENROUTER_API_KEY"),
+        timeout=UPSTREAM_TIMEOUT_SECONDS,
+        max_retries=UPSTREAM_MAX_RETRIES,
+    ))
+
+
+def get_hf_client():
+    """
+    Returns:
+        InferenceClient: Shared Hugging Face inference client
+    """
+    return _shared_client("huggingface", lambda: InferenceClient(
+        provider="hf-inference",
+        api_key=os.getenv("HUGGINGFACE_API_KEY"),
+        timeout=UPSTREAM_TIMEOUT_SECONDS,
+    ))
+
+
+def get_async_hf_client():
+    """
+    Returns:
+        AsyncInferenceClient: Hugging Face client shared by every coroutine of the running event loop
+    """
+    return _shared_client(_async_key("huggingface"), lambda: AsyncInferenceClient(
+        provider="hf-inference",
+        api_key=os.getenv("HUGGINGFACE_API_KEY"),
+        timeout=UPSTREAM_TIMEOUT_SECONDS,
+    ))
+
+
+def _is_retryable(error):
+    # Client errors other than rate limiting will fail the same way again
+    response = getattr(error, "response", None)
+    status = getattr(response, "status_code", None) or getattr(response, "status", None)
+    return not isinstance(status, int) or status == 429 or status >= 500
+
+
+def _backoff_delay(attempt):
+    return random.uniform(0, min(UPSTREAM_RETRY_MAX_DELAY, UPSTREAM_RETRY_BASE_DELAY * 2 ** attempt))
+
+
+def call_with_retry(call, retries=UPSTREAM_MAX_RETRIES):
+    """
+    Call `call()` and retry it with jittered exponential backoff when it fails
+    with a network error, a 429 or a 5xx response
+
+    Args:
+        call (callable): Zero-argument function performing the upstream request
+        retries (int): Number of retries after the first attempt
+
+    Returns:
+        The value returned by `call`
+    """
+    for attempt in range(retries + 1):
+        try:
+            return call()
+        except Exception as e:
+            if attempt == retries or not _is_retryable(e):
+                raise
+            time.sleep(_backoff_delay(attempt))
+
+
+async def acall_with_retry(call, retries=UPSTREAM_MAX_RETRIES):
+    """
+    Async version of call_with_retry: `call()` must return an awaitable
+    """
+    for attempt in range(retries + 1):
+        try:
+            return await call()
+        except Exception as e:
+            if attempt == retries or not _is_retryable(e):
+                raise
+            await asyncio.sleep(_backoff_delay(attempt))
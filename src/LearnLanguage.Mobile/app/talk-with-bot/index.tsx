@@ -20,6 +20,8 @@ export default function TalkWithBotScreen() {
   const [inputText, setInputText] = useState('');
   const [messages, setMessages] = useState<Message[]>([]);
   const flatListRef = useRef<FlatList>(null);
+  // One conversation per visit of the screen, so the bot remembers the previous turns
+  const sessionIdRef = useRef(chatBotService.createSessionId());
 
   // Audio state
   const [playingAudio, setPlayingAudio] = useState<string | null>(null);
@@ -48,7 +50,7 @@ export default function TalkWithBotScreen() {
 
   const talkingMutation = useMutation({
     mutationFn: ({ message, language }: { message: string; language: string }) =>
-      chatBotService.talkingWithMessage({ message, language }),
+      chatBotService.talkingWithMessage({ message, language, sessionId: sessionIdRef.current }),
     onSuccess: (data) => {
       // Add bot response to messages
       const botMessage: Message = {
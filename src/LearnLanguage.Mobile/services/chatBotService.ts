@@ -3,23 +3,34 @@ import { baseUrl2 } from "@/configs/baseUrl";
 import axios from "axios";
 
 
+// Identifies one conversation: the server keeps its history under this id
+function createSessionId() {
+    return `${Date.now().toString(36)}-${Math.random().toString(36).slice(2, 12)}`;
+}
+
 async function talkingWithMessage({
     message,
     language,
+    sessionId,
 }: {
     message: string;
     language: string;
+    sessionId: string;
 }) {
     const res = await axios.post(`${baseUrl2}/talking-service`, {
         message,
         language,
         topic: 'daily-life', // Default topic, can be changed based on user preference
+        session_id: sessionId,
+    }, {
+        headers: { 'X-Session-Id': sessionId },
     });
     return res.data;
 }
 
 const chatBotService = {
+    createSessionId,
     talkingWithMessage,
 };
 
-export default chatBotService;
\ No newline at end of file
+export default chatBotService;